@@ -0,0 +1,176 @@
+"""Research-level answer cache in front of the graph.
+
+A repeated question skips the whole research and comes back with the answer it
+got the first time. Questions are matched on a canonical form: lowercased,
+punctuation and stopwords dropped and plurals folded, terms kept in order, so
+"What's the best Python web framework in 2024?" and "what is the best python
+web frameworks in 2024" share one entry. Interrogatives and comparison words
+stay in: "When was Python released?" is not "Who released Python?", and "Is
+Rust faster than Go?" is not "Is Go faster than Rust?".
+
+With ANSWER_CACHE_NEAR_DUPLICATES=1, questions whose terms overlap an earlier
+one by at least ANSWER_CACHE_SIMILARITY (Jaccard) reuse its answer too, whatever
+their order. A MinHash
+signature of each stored question is split into LSH bands kept in the
+``answers_lsh`` namespace, so a lookup only compares against the few questions
+that share a band instead of scanning every entry.
+
+Entries live in the shared result cache (``answers`` namespace, 6h by default,
+RESULT_CACHE_TTL_ANSWERS). Only answers built from every source are stored: one
+that dropped a source at the deadline would be served without its note.
+"""
+import hashlib
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from post_ranker import STOPWORDS, tokenize
+from result_cache import ResultCache, get_cache, make_key
+from telemetry import log, metrics
+
+NAMESPACE = "answers"
+INDEX_NAMESPACE = "answers_lsh"
+
+# Words the post ranker drops that change what a question asks: "best X" is not
+# "X", "who" is not "when", "A than B" is not "B than A"
+QUESTION_WORDS = frozenset("best who what when where why how which than vs from to".split())
+# Contraction tails ("what's", "don't") are noise
+QUESTION_STOPWORDS = (STOPWORDS - QUESTION_WORDS) | frozenset("s t d ll re ve m".split())
+# Bumped when question_terms changes, so entries keyed the old way are not matched
+KEY_VERSION = 2
+
+DEFAULT_SIMILARITY = 0.75
+# 16 bands of 4 rows: questions at the default similarity share a band ~99% of the time
+NUM_PERM = 64
+BANDS = 16
+# Questions remembered per LSH bucket (most recent kept)
+MAX_BUCKET = 32
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def question_terms(question: str) -> List[str]:
+    """Content terms of a question, in the order they are asked"""
+    return tokenize(question, QUESTION_STOPWORDS)
+
+
+def question_key(terms: Sequence[str]) -> str:
+    return make_key(KEY_VERSION, list(terms))
+
+
+def canonical_question(question: str) -> str:
+    return " ".join(question_terms(question))
+
+
+def _term_hash(term: str) -> int:
+    return int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), "big")
+
+
+def minhash(terms: Sequence[str]) -> List[int]:
+    """MinHash signature of a term set (NUM_PERM universal hashes of one base hash)"""
+    hashes = [_term_hash(term) for term in terms]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_bands(signature: Sequence[int]) -> List[str]:
+    rows = NUM_PERM // BANDS
+    return [make_key(band, list(signature[band * rows:(band + 1) * rows])) for band in range(BANDS)]
+
+
+def jaccard(a: Sequence[str], b: Sequence[str]) -> float:
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class AnswerCache:
+    """Final answers of earlier researches, looked up by canonical question"""
+
+    def __init__(self, cache: ResultCache, near_duplicates: Optional[bool] = None, similarity: Optional[float] = None):
+        self.cache = cache
+        if near_duplicates is None:
+            near_duplicates = os.getenv("ANSWER_CACHE_NEAR_DUPLICATES", "").lower() in ("1", "true", "yes")
+        self.near_duplicates = near_duplicates
+        self.similarity = similarity or float(os.getenv("ANSWER_CACHE_SIMILARITY", DEFAULT_SIMILARITY))
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """The cached entry for this question plus ``match`` (exact/near) and ``similarity``, or None"""
+        terms = question_terms(question)
+        if not terms:
+            return None
+        entry = self.cache.get(NAMESPACE, question_key(terms))
+        if entry is not None:
+            metrics.inc("answer_cache_lookups_total", outcome="exact")
+            return {**entry, "match": "exact", "similarity": 1.0}
+
+        if self.near_duplicates:
+            match = self._nearest(terms)
+            if match is not None:
+                metrics.inc("answer_cache_lookups_total", outcome="near")
+                return match
+
+        metrics.inc("answer_cache_lookups_total", outcome="miss")
+        return None
+
+    def _nearest(self, terms: List[str]) -> Optional[Dict[str, Any]]:
+        candidates = set()
+        for band in lsh_bands(minhash(terms)):
+            candidates.update(self.cache.get(INDEX_NAMESPACE, band) or ())
+
+        best, best_similarity = None, self.similarity
+        for key in candidates:
+            entry = self.cache.get(NAMESPACE, key)
+            if entry is None:
+                continue  # expired or evicted; its bucket entries age out with it
+            similarity = jaccard(terms, entry["terms"])
+            if similarity >= best_similarity:
+                best, best_similarity = entry, similarity
+        if best is None:
+            return None
+        return {**best, "match": "near", "similarity": best_similarity}
+
+    def store(self, question: str, final_answer: str):
+        terms = question_terms(question)
+        if not terms or not final_answer:
+            return
+        key = question_key(terms)
+        self.cache.set(NAMESPACE, key, {
+            "question": question,
+            "terms": terms,
+            "final_answer": final_answer,
+            "created_at": time.time(),
+        })
+        if not self.near_duplicates:
+            return
+        for band in lsh_bands(minhash(terms)):
+            bucket = [k for k in self.cache.get(INDEX_NAMESPACE, band) or () if k != key]
+            self.cache.set(INDEX_NAMESPACE, band, (bucket + [key])[-MAX_BUCKET:])
+
+    def remember(self, question: str, state: Dict[str, Any]):
+        """Store a finished research's answer, unless a source was dropped, failed or came
+        late, or the synthesis was cut short at the research deadline"""
+        statuses = (state.get("source_status") or {}).values()
+        if any(status in ("dropped", "failed", "late") for status in statuses):
+            log("💾 Answer not cached: a source was missing from it")
+            return
+        if state.get("synthesis_status") == "truncated":
+            log("💾 Answer not cached: the synthesis was cut short at the research deadline")
+            return
+        self.store(question, state.get("final_answer"))
+
+
+def answer_cache_enabled() -> bool:
+    return os.getenv("ANSWER_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Answer cache over the shared result cache, or None when either is disabled"""
+    if not answer_cache_enabled():
+        return None
+    cache = get_cache()
+    return AnswerCache(cache) if cache is not None else None
+
+
+metrics.describe("answer_cache_lookups_total", "Research answer cache lookups, by outcome (exact, near, miss)")
@@ -0,0 +1,127 @@
+"""Thread vs asyncio throughput for the BrightData side of a research session.
+
+    python -m benchmarks.async_load_test --sessions 200 --snapshot-delay 2
+
+Each session does what one research request does against BrightData: Google, Bing
+and Reddit searches in parallel, then a Reddit post retrieval, with both snapshots
+polled until ready. Thread mode runs every session on its own worker thread
+(``parallel_search_all_sources`` adds three more per session); async mode runs all
+of them on one event loop. Runs against the local stub server with the result cache
+disabled, so every session pays its full request and polling cost.
+
+The stub server runs in-process with one handler thread per connection, so the
+"peak threads" column includes those for both modes; the difference between the
+rows is what the client side costs.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import os
+import statistics
+import threading
+import time
+
+os.environ["RESULT_CACHE_DISABLED"] = "1"
+
+from benchmarks.stub_server import StubServer
+from http_client import BrightDataClient, get_client, set_client
+from webOperations import (
+    aparallel_search_all_sources,
+    areddit_post_retrieval,
+    parallel_search_all_sources,
+    reddit_post_retrieval,
+)
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class _ThreadSampler:
+    """Tracks the peak number of live threads while a run is in progress"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _thread_session(question):
+    start = time.perf_counter()
+    results = parallel_search_all_sources(question)
+    posts = results.get("reddit_results", {}).get("parsed_data", [])
+    reddit_post_retrieval([post.url for post in posts])
+    return time.perf_counter() - start
+
+
+async def _async_session(question):
+    start = time.perf_counter()
+    results = await aparallel_search_all_sources(question)
+    posts = results.get("reddit_results", {}).get("parsed_data", [])
+    await areddit_post_retrieval([post.url for post in posts])
+    return time.perf_counter() - start
+
+
+def run_threads(questions):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(questions)) as executor:
+        return list(executor.map(_thread_session, questions))
+
+
+def run_async(questions):
+    async def run_all():
+        try:
+            return await asyncio.gather(*(_async_session(q) for q in questions))
+        finally:
+            await get_client().aclose()
+
+    return asyncio.run(run_all())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub latency per request (s)")
+    parser.add_argument("--snapshot-delay", type=float, default=2.0, help="seconds a snapshot stays 'running'")
+    args = parser.parse_args()
+
+    questions = [f"load test question {i}" for i in range(args.sessions)]
+    rows = []
+
+    with StubServer(latency=args.latency, snapshot_delay=args.snapshot_delay) as server:
+        set_client(BrightDataClient(api_key="stub", base_url=server.base_url, pool_size=args.sessions))
+
+        for name, runner in (("threads", run_threads), ("asyncio", run_async)):
+            with _ThreadSampler() as sampler, contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                latencies = runner(questions)
+                wall = time.perf_counter() - start
+            rows.append((name, wall, latencies, sampler.peak))
+
+    print(f"{args.sessions} concurrent sessions, snapshot delay {args.snapshot_delay}s\n")
+    print(f"{'mode':<9}{'wall (s)':>9}{'sessions/s':>12}{'p50 (s)':>9}{'p95 (s)':>9}{'mean (s)':>10}{'peak threads':>14}")
+    for name, wall, latencies, peak in rows:
+        print(
+            f"{name:<9}{wall:>9.2f}{len(latencies) / wall:>12.1f}"
+            f"{_percentile(latencies, 50):>9.2f}{_percentile(latencies, 95):>9.2f}"
+            f"{statistics.mean(latencies):>10.2f}{peak:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""End-to-end benchmark of the research graph, broken down per pipeline stage.
+
+    python -m benchmarks.e2e_benchmark --concurrency 1 8 32 --output bench.json
+
+Runs the fixed question corpus in ``benchmarks/questions.json`` through
+``main.graph`` at each concurrency level and reports, per level:
+
+  - p50/p95/p99 for every graph node (searches, URL selection, post retrieval,
+    analyses, synthesis), each branch, the critical path and whole sessions
+  - time to the first synthesis token, and to the first complete answer (before
+    any quorum update pass; see ``--quorum``)
+  - input tokens per LLM call
+  - throughput in sessions per second
+  - retry and timeout counts from the telemetry counters
+
+By default it runs against the offline backend (see offline.py) with injected
+latencies, so no keys or network are needed. ``--fixtures DIR`` replays responses
+recorded with ``RESEARCH_BACKEND=record`` instead of the bundled samples. The result
+caches are disabled so every session pays its full cost.
+
+Results are written as JSON (with the git commit) so runs can be compared across
+commits.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import datetime
+import io
+import json
+import os
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+CORPUS_PATH = Path(__file__).resolve().parent / "questions.json"
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _summary(samples):
+    if not samples:
+        return None
+    return {
+        "count": len(samples),
+        "mean": statistics.mean(samples),
+        "p50": _percentile(samples, 50),
+        "p95": _percentile(samples, 95),
+        "p99": _percentile(samples, 99),
+        "max": max(samples),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _configure_backend(args):
+    """Environment for the offline backend; must run before main is imported"""
+    os.environ["RESULT_CACHE_DISABLED"] = "1"
+    if args.quorum:
+        os.environ["SYNTHESIS_QUORUM"] = args.quorum
+        os.environ["SYNTHESIS_LATE_SOURCES"] = args.late
+    if args.live:
+        return
+    os.environ["RESEARCH_BACKEND"] = "offline"
+    if args.fixtures:
+        os.environ["OFFLINE_FIXTURES_DIR"] = str(Path(args.fixtures).resolve())
+    os.environ["OFFLINE_LATENCY"] = str(args.latency)
+    os.environ["OFFLINE_JITTER"] = str(args.jitter)
+    os.environ["OFFLINE_SNAPSHOT_POLLS"] = str(args.snapshot_polls)
+    os.environ["OFFLINE_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["OFFLINE_LLM_TOKEN_LATENCY"] = str(args.token_latency)
+    os.environ["OFFLINE_SEED"] = str(args.seed)
+
+
+def _session_record(main, state, total, first_token, first_answer):
+    timings = state.get("timings") or {}
+    critical = main.report_branch_timings(timings)
+    return {
+        "total": total,
+        "time_to_first_token": first_token,
+        "time_to_first_answer": first_answer,
+        "source_status": state.get("source_status") or {},
+        "timings": timings,
+        "critical_path": critical["critical_path"],
+        "critical_branch": critical["critical_branch"],
+        "input_tokens": state.get("input_tokens") or {},
+    }
+
+
+def _thread_session(main, question):
+    start = time.perf_counter()
+    first = {}
+    for event in main.stream_research(question):
+        if event["type"] == "metric" and event["name"] in ("time_to_first_token", "time_to_first_answer"):
+            first[event["name"]] = event["value"]
+        elif event["type"] == "final":
+            return _session_record(main, event["state"], time.perf_counter() - start,
+                                   first.get("time_to_first_token"), first.get("time_to_first_answer"))
+        elif event["type"] == "error":
+            return {"error": str(event["error"])}
+    return {"error": "no final state"}
+
+
+async def _async_session(main, question):
+    start = time.perf_counter()
+    first = {}
+    async for event in main.astream_research(question):
+        if event["type"] == "metric" and event["name"] in ("time_to_first_token", "time_to_first_answer"):
+            first[event["name"]] = event["value"]
+        elif event["type"] == "final":
+            return _session_record(main, event["state"], time.perf_counter() - start,
+                                   first.get("time_to_first_token"), first.get("time_to_first_answer"))
+        elif event["type"] == "error":
+            return {"error": str(event["error"])}
+    return {"error": "no final state"}
+
+
+def run_level(main, questions, concurrency, mode):
+    """Run every question with at most ``concurrency`` sessions in flight"""
+    if mode == "threads":
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(lambda q: _thread_session(main, q), questions))
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(question):
+            async with semaphore:
+                try:
+                    return await _async_session(main, question)
+                except Exception as e:
+                    return {"error": str(e)}
+
+        try:
+            return await asyncio.gather(*(bounded(q) for q in questions))
+        finally:
+            from http_client import get_client
+
+            await get_client().aclose()
+
+    return asyncio.run(run_all())
+
+
+def summarize_level(concurrency, records, wall):
+    ok = [record for record in records if "error" not in record]
+    nodes = sorted({name for record in ok for name in record["timings"]})
+    token_nodes = sorted({name for record in ok for name in record["input_tokens"]})
+    branch_counts = {}
+    status_counts = {}
+    for record in ok:
+        branch_counts[record["critical_branch"]] = branch_counts.get(record["critical_branch"], 0) + 1
+        for source, status in record["source_status"].items():
+            status_counts.setdefault(source, {}).setdefault(status, 0)
+            status_counts[source][status] += 1
+
+    return {
+        "concurrency": concurrency,
+        "sessions": len(records),
+        "errors": len(records) - len(ok),
+        "wall_seconds": wall,
+        "throughput_sessions_per_s": len(ok) / wall if wall else 0.0,
+        "session": _summary([record["total"] for record in ok]),
+        "time_to_first_token": _summary([record["time_to_first_token"] for record in ok if record["time_to_first_token"] is not None]),
+        "time_to_first_answer": _summary([record["time_to_first_answer"] for record in ok if record["time_to_first_answer"] is not None]),
+        "source_status_counts": status_counts,
+        "critical_path": _summary([record["critical_path"] for record in ok]),
+        "critical_branch_counts": branch_counts,
+        "nodes": {name: _summary([record["timings"][name] for record in ok if name in record["timings"]]) for name in nodes},
+        "input_tokens": {
+            name: _summary([record["input_tokens"][name] for record in ok if name in record["input_tokens"]])
+            for name in token_nodes
+        },
+        "input_tokens_per_session": _summary([sum(record["input_tokens"].values()) for record in ok]),
+    }
+
+
+def print_level(level):
+    print(
+        f"\nconcurrency {level['concurrency']}: {level['sessions']} sessions, {level['errors']} errors, "
+        f"{level['wall_seconds']:.1f}s wall, {level['throughput_sessions_per_s']:.2f} sessions/s"
+    )
+    print(f"  {'stage':<26}{'p50':>8}{'p95':>8}{'p99':>8}")
+    rows = [("session", level["session"]), ("time to first token", level["time_to_first_token"]),
+            ("time to first answer", level["time_to_first_answer"]), ("critical path", level["critical_path"])]
+    rows += sorted(level["nodes"].items())
+    for name, stats in rows:
+        if stats:
+            print(f"  {name:<26}{stats['p50']:>8.2f}{stats['p95']:>8.2f}{stats['p99']:>8.2f}")
+    tokens = level["input_tokens_per_session"]
+    if tokens:
+        print(f"  input tokens/session: mean {tokens['mean']:.0f}, p95 {tokens['p95']:.0f}")
+    print(f"  critical branch: {level['critical_branch_counts']}")
+    if any(status != "complete" for counts in level["source_status_counts"].values() for status in counts):
+        print(f"  source status: {level['source_status_counts']}")
+    print(f"  retries: {level['retries']:.0f}, timeouts: {level['timeouts']:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the corpus per level")
+    parser.add_argument("--mode", choices=("async", "threads"), default="async")
+    parser.add_argument("--corpus", default=str(CORPUS_PATH))
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--live", action="store_true", help="use the real APIs instead of the offline backend")
+    parser.add_argument("--fixtures", help="offline fixture directory, e.g. one recorded with RESEARCH_BACKEND=record")
+    parser.add_argument("--latency", type=float, default=0.3, help="offline BrightData latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="up to this fraction of extra random latency")
+    parser.add_argument("--snapshot-polls", type=int, default=2, help="progress checks before a snapshot is ready")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="offline model time to first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="offline model time per streamed token (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quorum", help="synthesize once these sources are in, e.g. google,bing (SYNTHESIS_QUORUM)")
+    parser.add_argument("--late", choices=("update", "drop"), default="update", help="what happens to sources outside the quorum")
+    args = parser.parse_args()
+
+    _configure_backend(args)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main as research
+        research.get_graph()  # built on first use; keep it out of the first session's time
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    from telemetry import metrics
+
+    levels = []
+    for concurrency in args.concurrency:
+        metrics.reset()
+        questions = corpus * args.repeat
+        # Enough sessions to keep every slot busy at least once
+        while len(questions) < concurrency:
+            questions += corpus
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            records = run_level(research, questions, concurrency, args.mode)
+            wall = time.perf_counter() - start
+        level = summarize_level(concurrency, records, wall)
+        level["retries"] = metrics.total("retries_total")
+        level["timeouts"] = metrics.total("timeouts_total")
+        levels.append(level)
+        print_level(level)
+
+    result = {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "backend": "live" if args.live else "offline",
+        "mode": args.mode,
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "concurrency")},
+        "levels": levels,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Bare requests vs the pooled BrightData client, against a local stub server.
+
+    python -m benchmarks.http_pool_benchmark --requests 200 --concurrency 8
+
+Reports new TCP connections (each one a handshake; the stub sleeps --handshake-latency
+per connection to stand in for the TCP+TLS round trips to api.brightdata.com) and
+p50/p95 request latency for both modes.
+"""
+import argparse
+import concurrent.futures
+import statistics
+import time
+
+import requests
+
+from benchmarks.stub_server import StubServer
+from http_client import BrightDataClient
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _run(call, total, concurrency):
+    def timed_call(_):
+        start = time.perf_counter()
+        call().raise_for_status()
+        return time.perf_counter() - start
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(timed_call, range(total)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.002, help="stub server latency per request (s)")
+    parser.add_argument("--handshake-latency", type=float, default=0.03, help="simulated TCP+TLS setup cost per connection (s)")
+    args = parser.parse_args()
+
+    payload = {"zone": "ai_research_agent", "url": "https://www.google.com/search?q=stub", "format": "raw"}
+
+    with StubServer(latency=args.latency, handshake_latency=args.handshake_latency) as server:
+        headers = {"Authorization": "Bearer stub", "Content-Type": "application/json"}
+        bare = lambda: requests.post(f"{server.base_url}/request", headers=headers, json=payload, timeout=15)
+
+        client = BrightDataClient(api_key="stub", base_url=server.base_url, pool_size=args.concurrency)
+        pooled = lambda: client.post("request", json=payload)
+
+        results = {}
+        for name, call in (("bare requests", bare), ("pooled client", pooled)):
+            server.reset_connections()
+            latencies = _run(call, args.requests, args.concurrency)
+            results[name] = (server.reset_connections(), latencies)
+
+        client.close()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}\n")
+    print(f"{'mode':<15}{'connections':>12}{'p50 (ms)':>10}{'p95 (ms)':>10}{'mean (ms)':>11}")
+    for name, (connections, latencies) in results.items():
+        print(
+            f"{name:<15}{connections:>12}"
+            f"{_percentile(latencies, 50) * 1000:>10.2f}"
+            f"{_percentile(latencies, 95) * 1000:>10.2f}"
+            f"{statistics.mean(latencies) * 1000:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
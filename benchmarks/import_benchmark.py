@@ -0,0 +1,103 @@
+"""Cold-start cost: import time of the entry modules and of the first research's setup.
+
+    python -m benchmarks.import_benchmark --runs 5 --budget-ms 350
+
+Imports each of ``--modules`` in a fresh interpreter under ``python -X importtime``
+(``--runs`` times, reporting the median) and lists its heaviest imports, then times
+what the first research pays on top: building the models and compiling the graph
+(``main.get_graph()``) on the offline backend.
+
+Exits non-zero when a module's median import time is over ``--budget-ms`` or when
+importing it loads one of LAZY_PACKAGES, which must wait for first use. Run it in
+CI to keep Streamlit reruns and server start-up fast.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_MODULES = ["main", "research_client", "webOperations"]
+# Loaded by the first research (models, graph, async HTTP), never by an import
+LAZY_PACKAGES = ["langgraph", "langchain", "langchain_core", "langsmith", "openai", "aiohttp", "pydantic", "dotenv"]
+
+FIRST_USE = """
+import time
+import main
+start = time.perf_counter()
+main.get_graph()
+print(time.perf_counter() - start)
+"""
+
+
+def _run(code, *flags):
+    env = {**os.environ, "RESEARCH_BACKEND": "offline", "TELEMETRY_CONSOLE": "0"}
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from ``-X importtime`` output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        # One space after the bar, then two per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative), depth))
+    return rows
+
+
+def _tree(rows, module):
+    """Rows of ``module``'s own import tree: children are printed just before their parent"""
+    end = next(index for index, row in enumerate(rows) if row[0] == module and row[3] == 0)
+    start = end
+    while start > 0 and rows[start - 1][3] > 0:
+        start -= 1
+    return rows[start:end + 1]
+
+
+def measure(module, runs):
+    totals, tree = [], []
+    for _ in range(runs):
+        tree = _tree(parse_importtime(_run(f"import {module}", "-X", "importtime").stderr), module)
+        totals.append(tree[-1][2] / 1000)
+    loaded = {name.split(".")[0] for name, *_ in tree}
+    return statistics.median(totals), tree, [package for package in LAZY_PACKAGES if package in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=350.0, help="largest median import time allowed per module")
+    parser.add_argument("--top", type=int, default=6, help="heaviest direct imports listed per module")
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.modules:
+        median, tree, lazy = measure(module, args.runs)
+        status = "ok" if median <= args.budget_ms and not lazy else "OVER BUDGET" if median > args.budget_ms else "EAGER"
+        print(f"{module:<16} {median:7.1f} ms (median of {args.runs})  {status}")
+        direct = [row for row in tree if row[3] == 1]
+        for name, _, cumulative, _ in sorted(direct, key=lambda row: -row[2])[:args.top]:
+            print(f"    {name:<28} {cumulative / 1000:7.1f} ms")
+        if lazy:
+            print(f"    loaded at import, should wait for first use: {', '.join(lazy)}")
+        if status != "ok":
+            failures.append(module)
+
+    first_use = [float(_run(FIRST_USE).stdout.strip().splitlines()[-1]) for _ in range(args.runs)]
+    print(f"\nfirst research setup (models + graph, offline): {statistics.median(first_use) * 1000:.0f} ms")
+
+    if failures:
+        print(f"\nover the {args.budget_ms:g} ms budget or importing lazy packages: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Per-session memory footprint of parsed Reddit data.
+
+    python -m benchmarks.memory_benchmark --sessions 200 --comments-per-post 200
+
+Builds realistic snapshot bodies for one research (a Reddit search of ``--posts``
+posts, then comments of three of them) and parses them two ways:
+
+  - dicts + full sort: ``response.json()`` on the whole body, a dict per post and
+    comment, a full sort and a slice to the top 50 (the pipeline before compact
+    records and streaming)
+  - records + top-K: the body streamed through ``snapshot_stream`` with the same
+    reducers ``webOperations`` uses, then ``_parse_reddit_posts`` and
+    ``_parse_reddit_comments`` into ``reddit_records`` objects
+
+For each it reports what ``--sessions`` sessions keep in memory once parsed (what
+sits in the graph state while a research runs), the transient peak of parsing one
+session, and the parse time. Everything is measured with tracemalloc, offline.
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from snapshot_stream import RecordParser
+from webOperations import COMMENT_REDUCER, MAX_COMMENTS, POST_REDUCER, _parse_reddit_comments, _parse_reddit_posts
+
+WORDS = (
+    "the a framework python rust library team production performance docs migration year experience "
+    "scaling database tests deploy async worked great slow issue fixed recommend community version"
+).split()
+CHUNK_SIZE = 64 * 1024
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_session(rng, posts, comments_per_post):
+    """(search body, comments body) as NDJSON bytes, with the fields BrightData returns"""
+    search = []
+    for i in range(posts):
+        search.append({
+            "post_id": f"t3_{i:05x}",
+            "url": f"https://www.reddit.com/r/sample/comments/{i:05x}/post_{i}/",
+            "user_posted": f"user_{rng.randrange(10_000)}",
+            "title": _text(rng, 12),
+            "description": _text(rng, 120),
+            "num_comments": rng.randrange(2_000),
+            "date_posted": "2024-05-01T08:00:00.000Z",
+            "community_name": "sample",
+            "subreddit": "sample",
+            "score": rng.randrange(5_000),
+            "photos": [],
+            "videos": [],
+            "tag": None,
+            "related_posts": [f"https://www.reddit.com/r/sample/comments/{rng.randrange(99_999):05x}/" for _ in range(5)],
+        })
+    comments = []
+    for post in search[:3]:
+        for j in range(comments_per_post):
+            comments.append({
+                "comment_id": f"c_{post['post_id']}_{j}",
+                "post_url": post["url"],
+                "user_posted": f"user_{rng.randrange(10_000)}",
+                "comment": _text(rng, rng.randrange(20, 120)),
+                "date_posted": "2024-05-02T08:00:00.000Z",
+                "score": rng.randrange(-20, 1_500),
+                "replies": [{"user": f"user_{rng.randrange(10_000)}", "reply": _text(rng, 25)} for _ in range(rng.randrange(3))],
+                "community_name": "sample",
+            })
+
+    def ndjson(records):
+        return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+    return ndjson(search), ndjson(comments)
+
+
+def _chunks(body):
+    return (body[start:start + CHUNK_SIZE] for start in range(0, len(body), CHUNK_SIZE))
+
+
+def parse_dicts(search_body, comments_body):
+    """The old pipeline: whole-body parse, dict per item, full sorts"""
+    posts = [
+        {
+            "title": post.get("title"),
+            "url": post.get("url"),
+            "score": post.get("score", 0),
+            "num_comments": post.get("num_comments", 0),
+            "subreddit": post.get("subreddit", ""),
+        }
+        for post in (json.loads(line) for line in search_body.splitlines())
+    ]
+    posts.sort(key=lambda post: post["score"] + post["num_comments"], reverse=True)
+    comments = [
+        {
+            "comment_id": comment.get("comment_id"),
+            "content": comment.get("comment"),
+            "date": comment.get("date_posted"),
+            "score": comment.get("score", 0),
+        }
+        for comment in (json.loads(line) for line in comments_body.splitlines())
+    ]
+    comments.sort(key=lambda comment: comment["score"], reverse=True)
+    return (
+        {"parsed_data": posts, "total_posts": len(posts)},
+        {"parsed_comments": comments[:MAX_COMMENTS], "total_comments": min(len(comments), MAX_COMMENTS)},
+    )
+
+
+def _stream(body, reducer):
+    parser, accumulator = RecordParser(), reducer.accumulator()
+    for chunk in _chunks(body):
+        for record in parser.feed(chunk):
+            accumulator.add(record)
+    for record in parser.close():
+        accumulator.add(record)
+    return accumulator.result()
+
+
+def parse_records(search_body, comments_body):
+    """The current pipeline: streamed, reduced, compact records, top-K"""
+    return (
+        _parse_reddit_posts(_stream(search_body, POST_REDUCER)),
+        _parse_reddit_comments(_stream(comments_body, COMMENT_REDUCER)),
+    )
+
+
+def measure(parse, bodies):
+    # Peak while parsing one session, on top of its bodies
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    parse(*bodies[0])
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    # What every session keeps once parsed; bodies are dropped as they are done
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    kept = [parse(*session) for session in bodies]
+    elapsed = time.perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return {"retained": retained / len(bodies), "peak": peak, "parse": elapsed / len(bodies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=12, help="posts per Reddit search")
+    parser.add_argument("--comments-per-post", type=int, default=200, help="comments downloaded for each of the 3 retrieved posts")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bodies = [make_session(rng, args.posts, args.comments_per_post) for _ in range(args.sessions)]
+    payload = sum(len(search) + len(comments) for search, comments in bodies) / len(bodies)
+    print(f"{args.sessions} sessions, {args.posts} posts + {3 * args.comments_per_post} comments each "
+          f"({payload / 1024:.0f} KB of snapshot data per session)\n")
+
+    results = {"dicts + full sort": measure(parse_dicts, bodies), "records + top-K": measure(parse_records, bodies)}
+    print(f"{'pipeline':<20}{'kept/session':>14}{'parse peak':>12}{'parse time':>12}")
+    for name, result in results.items():
+        print(f"{name:<20}{result['retained'] / 1024:>11.1f} KB{result['peak'] / 1024:>9.0f} KB{result['parse'] * 1000:>9.2f} ms")
+
+    old, new = results["dicts + full sort"], results["records + top-K"]
+    print(f"\nkept per session: {1 - new['retained'] / old['retained']:.0%} smaller, "
+          f"{(old['retained'] - new['retained']) * args.sessions / 2**20:.1f} MB saved across {args.sessions} sessions; "
+          f"parse peak {1 - new['peak'] / old['peak']:.0%} lower")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Agreement between the local post ranker and the LLM URL selector.
+
+Record LLM selections once (real API keys, real Reddit results):
+
+    python -m benchmarks.ranker_agreement --record selections.jsonl
+
+then evaluate the local ranker against them as often as needed, offline:
+
+    python -m benchmarks.ranker_agreement --cases selections.jsonl
+
+Recording runs each corpus question through ``reddit_search_api`` and the LLM
+selector (``main.select_reddit_urls_llm``) and stores the question, the parsed
+posts and the selected URLs, one JSON object per line. Nothing is bundled: a
+recording made with RESEARCH_BACKEND=offline only exercises the plumbing, since
+the offline model just echoes the first URLs it sees.
+
+Evaluation compares the first three URLs of each selector, which is all post
+retrieval uses:
+
+  - top-1: both put the same post first
+  - overlap@3: share of the LLM's picks that the local ranker also picked
+  - exact@3: same set of three posts
+  - for reference, the same numbers for the plain engagement order of the search
+    results (what ``urls[:3]`` would take without any selection)
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from post_ranker import DEFAULT_TOP_K, rank_posts
+from reddit_records import RedditPost
+
+CORPUS_PATH = Path(__file__).resolve().parent / "questions.json"
+
+
+def record(corpus, output):
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main as research
+    from webOperations import reddit_search_api
+
+    with open(output, "w", encoding="utf-8") as f:
+        for question in corpus:
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = reddit_search_api(question)
+                urls, _ = research.select_reddit_urls_llm(question, results)
+            f.write(json.dumps({
+                "question": question,
+                "posts": [post.to_dict() for post in results.get("parsed_data") or []],
+                "llm_urls": urls,
+                "model": research.model_name(research.fast_llm),
+            }) + "\n")
+            print(f"{len(results.get('parsed_data') or []):>3} posts, {len(urls)} selected  {question}")
+    print(f"\nRecorded {len(corpus)} selections to {output}")
+
+
+def _agreement(picks, reference):
+    picks, reference = picks[:DEFAULT_TOP_K], reference[:DEFAULT_TOP_K]
+    return {
+        "top1": float(bool(picks and reference and picks[0] == reference[0])),
+        "overlap": len(set(picks) & set(reference)) / len(reference),
+        "exact": float(set(picks) == set(reference)),
+    }
+
+
+def evaluate(cases):
+    rows = {"local ranker": [], "engagement order": []}
+    timings = []
+    for case in cases:
+        reference = [url for url in case["llm_urls"] if url]
+        if not reference or not case["posts"]:
+            continue
+        start = time.perf_counter()
+        ranked = [post.url for post in rank_posts(case["question"], [RedditPost.from_dict(post) for post in case["posts"]])]
+        timings.append(time.perf_counter() - start)
+        rows["local ranker"].append(_agreement(ranked, reference))
+        rows["engagement order"].append(_agreement([post["url"] for post in case["posts"]], reference))
+
+    if not timings:
+        sys.exit("No cases with both posts and an LLM selection to compare")
+
+    print(f"{len(timings)} cases, local ranking {statistics.mean(timings) * 1e6:.0f}µs mean\n")
+    print(f"{'selector':<18}{'top-1':>8}{'overlap@3':>11}{'exact@3':>9}")
+    for name, scores in rows.items():
+        print(
+            f"{name:<18}{statistics.mean(s['top1'] for s in scores):>8.2f}"
+            f"{statistics.mean(s['overlap'] for s in scores):>11.2f}{statistics.mean(s['exact'] for s in scores):>9.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--record", metavar="OUT", help="run the LLM selector over the corpus and write its selections here")
+    mode.add_argument("--cases", metavar="FILE", help="recorded selections to evaluate the local ranker against")
+    parser.add_argument("--corpus", default=str(CORPUS_PATH))
+    args = parser.parse_args()
+
+    if args.record:
+        with open(args.corpus, encoding="utf-8") as f:
+            record(json.load(f), args.record)
+        return
+
+    with open(args.cases, encoding="utf-8") as f:
+        evaluate([json.loads(line) for line in f if line.strip()])
+
+
+if __name__ == "__main__":
+    main()
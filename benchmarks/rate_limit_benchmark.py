@@ -0,0 +1,147 @@
+"""A burst of sessions against a provider quota, with and without the rate limiter.
+
+    python -m benchmarks.rate_limit_benchmark --sessions 60 --provider-rpm 300
+
+Runs ``--sessions`` researches at once on the offline backend, whose SERP
+endpoint here enforces a quota like the real provider: past ``--provider-rpm``
+(with ten seconds' worth of burst) searches are answered 429 with a Retry-After.
+Two runs:
+
+  - ``unlimited``: RATE_LIMITS_DISABLED=1, so every session fires its searches
+    straight away and relies on retries once throttled
+  - ``limited``: the SERP limiter set just under the quota, so sessions queue
+    for it instead of being throttled
+
+For each it reports sources lost to throttling (answered without Google/Bing),
+429s received, retries, session p50/p95 and the mean SERP rate-limit wait.
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+
+os.environ["RESEARCH_BACKEND"] = "offline"
+os.environ["RESULT_CACHE_DISABLED"] = "1"
+os.environ["ANSWER_CACHE_DISABLED"] = "1"
+os.environ.setdefault("TELEMETRY_CONSOLE", "0")
+
+from benchmarks.e2e_benchmark import CORPUS_PATH, _percentile
+
+ZONE_LIMIT = "RATE_LIMIT_BRIGHTDATA_SERP"
+
+
+def _quota_client(provider_rpm, retry_after):
+    from http_client import AsyncResponse
+    from offline import OfflineBrightDataClient
+    from rate_limiter import TokenBucket
+
+    class QuotaClient(OfflineBrightDataClient):
+        """Offline client whose SERP endpoint throttles like a provider with a per-minute quota"""
+
+        def __init__(self):
+            super().__init__()
+            self.throttled = 0
+            self._quota = TokenBucket(provider_rpm)
+            self._quota_lock = threading.Lock()
+
+        def _over_quota(self):
+            with self._quota_lock:
+                if self._quota.wait_time(1, time.monotonic()) > 0:
+                    self.throttled += 1
+                    return True
+                self._quota.take(1)
+                return False
+
+        async def _asend(self, method, endpoint, timeout=None, snapshot_id=None, **kwargs):
+            if endpoint == "request" and self._over_quota():
+                headers = {"Content-Type": "application/json", "Retry-After": str(retry_after)}
+                return AsyncResponse(self.url(endpoint), 429, headers, b'{"error": "quota exceeded"}')
+            return await super()._asend(method, endpoint, timeout=timeout, snapshot_id=snapshot_id, **kwargs)
+
+    return QuotaClient()
+
+
+async def _session(research, question, deadline):
+    start = time.perf_counter()
+    state = {}
+    async for event in research.astream_research(question, deadline=deadline):
+        if event["type"] == "final":
+            state = event["state"]
+    return time.perf_counter() - start, state
+
+
+def run(research, questions, args, limited):
+    import rate_limiter
+    from http_client import set_client
+    from telemetry import metrics
+
+    if limited:
+        os.environ.pop("RATE_LIMITS_DISABLED", None)
+        os.environ[ZONE_LIMIT] = str(args.provider_rpm * args.headroom)
+    else:
+        os.environ["RATE_LIMITS_DISABLED"] = "1"
+    rate_limiter._scheduler = None  # limiters pick up the new limits
+    metrics.reset()
+    client = _quota_client(args.provider_rpm, args.retry_after)
+    set_client(client)
+
+    async def burst():
+        return await asyncio.gather(*(_session(research, question, args.deadline) for question in questions))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = asyncio.run(burst())
+
+    durations = [duration for duration, _ in results]
+    statuses = collections.Counter(
+        status for _, state in results for source, status in (state.get("source_status") or {}).items()
+        if source in ("google", "bing")
+    )
+    waits = metrics._histograms.get("rate_limit_wait_seconds", {})
+    wait_count = sum(state[-2] for key, state in waits.items() if dict(key).get("limit", "").startswith("brightdata.serp"))
+    wait_sum = sum(state[-1] for key, state in waits.items() if dict(key).get("limit", "").startswith("brightdata.serp"))
+    return {
+        "failed": statuses.get("failed", 0) + statuses.get("dropped", 0),
+        "throttled": client.throttled,
+        "retries": metrics.total("retries_total"),
+        "p50": _percentile(durations, 50),
+        "p95": _percentile(durations, 95),
+        "wait": wait_sum / wait_count if wait_count else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=60)
+    parser.add_argument("--provider-rpm", type=int, default=300, help="SERP requests per minute before the stub answers 429")
+    parser.add_argument("--headroom", type=float, default=0.9, help="limiter rate as a share of the provider quota")
+    parser.add_argument("--retry-after", type=float, default=2.0, help="Retry-After the stub sends (s)")
+    parser.add_argument("--deadline", type=float, default=60.0, help="research deadline per session (s)")
+    parser.add_argument("--latency", type=float, default=0.1, help="offline BrightData latency per call (s)")
+    args = parser.parse_args()
+
+    os.environ["OFFLINE_LATENCY"] = str(args.latency)
+    os.environ["OFFLINE_SNAPSHOT_POLLS"] = "1"
+    os.environ.setdefault("OFFLINE_LLM_LATENCY", "0.05")
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main as research
+        research.get_graph()
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+    questions = [corpus[i % len(corpus)] for i in range(args.sessions)]
+
+    print(f"{args.sessions} concurrent sessions, {2 * args.sessions} SERP searches, provider quota {args.provider_rpm}/min, "
+          f"Retry-After {args.retry_after:g}s\n")
+    print(f"{'run':<11}{'sources lost':>13}{'429s':>7}{'retries':>9}{'p50':>8}{'p95':>8}{'SERP wait':>11}")
+    for name, limited in (("unlimited", False), ("limited", True)):
+        result = run(research, questions, args, limited)
+        print(f"{name:<11}{result['failed']:>13}{result['throttled']:>7}{result['retries']:>9.0f}"
+              f"{result['p50']:>7.1f}s{result['p95']:>7.1f}s{result['wait']:>10.2f}s")
+
+
+if __name__ == "__main__":
+    main()
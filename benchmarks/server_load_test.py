@@ -0,0 +1,161 @@
+"""Load test of the research server: many concurrent client sessions, offline.
+
+    python -m benchmarks.server_load_test --sessions 120 --tenants 8
+
+Starts ``research_server`` in-process on a free port, against the offline backend
+with injected latencies and the result caches disabled, then opens ``--sessions``
+concurrent ``POST /research`` streams spread over ``--tenants`` tenants. The
+admission limits are set from the command line, so the run exercises queueing
+(more sessions than slots), per-tenant limits and, with small ``--max-queue`` or
+``--tenant-queue`` values, explicit rejection.
+
+Reports completed and rejected sessions (by status and reason), p50/p95 of total
+time, queue wait and time to first token, throughput, and the peak running and
+queued counts sampled from ``/health``.
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import io
+import json
+import os
+import time
+
+from benchmarks.e2e_benchmark import CORPUS_PATH
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _configure_backend(args):
+    """Environment for the offline backend; must run before main is imported"""
+    os.environ["RESEARCH_BACKEND"] = "offline"
+    os.environ["RESULT_CACHE_DISABLED"] = "1"
+    os.environ["ANSWER_CACHE_DISABLED"] = "1"
+    os.environ.setdefault("TELEMETRY_CONSOLE", "0")
+    os.environ["OFFLINE_LATENCY"] = str(args.latency)
+    os.environ["OFFLINE_SNAPSHOT_POLLS"] = str(args.snapshot_polls)
+    os.environ["OFFLINE_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["OFFLINE_LLM_TOKEN_LATENCY"] = str(args.token_latency)
+
+
+async def _session(http, url, question, tenant):
+    start = time.perf_counter()
+    record = {"tenant": tenant, "status": None, "queue_wait": None, "time_to_first_token": None, "final": False}
+    async with http.post(f"{url}/research", json={"question": question}, headers={"X-Tenant": tenant}) as response:
+        record["status"] = response.status
+        if response.status != 200:
+            record["reason"] = (await response.json()).get("error")
+        else:
+            async for line in response.content:
+                event = json.loads(line)
+                if event["type"] == "metric" and event["name"] in ("queue_wait", "time_to_first_token"):
+                    record[event["name"]] = event["value"]
+                elif event["type"] == "final":
+                    record["final"] = bool(event["state"].get("final_answer"))
+                elif event["type"] == "error":
+                    record["error"] = event["error"]
+    record["total"] = time.perf_counter() - start
+    return record
+
+
+async def _sample_health(http, url, peaks, stop):
+    while not stop.is_set():
+        async with http.get(f"{url}/health") as response:
+            health = await response.json()
+        peaks["running"] = max(peaks["running"], health["running"])
+        peaks["queued"] = max(peaks["queued"], health["queued"])
+        await asyncio.sleep(0.05)
+
+
+async def run(url, questions, tenants):
+    import aiohttp
+
+    peaks = {"running": 0, "queued": 0}
+    stop = asyncio.Event()
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=300)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        sampler = asyncio.create_task(_sample_health(http, url, peaks, stop))
+        start = time.perf_counter()
+        records = await asyncio.gather(*(
+            _session(http, url, question, f"tenant-{i % tenants}") for i, question in enumerate(questions)
+        ))
+        wall = time.perf_counter() - start
+        stop.set()
+        await sampler
+    return records, wall, peaks
+
+
+def _line(name, samples, unit="s"):
+    if not samples:
+        return f"  {name:<22} -"
+    return (f"  {name:<22} p50 {_percentile(samples, 50):6.2f}{unit}  p95 {_percentile(samples, 95):6.2f}{unit}  "
+            f"max {max(samples):6.2f}{unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=120, help="concurrent client sessions")
+    parser.add_argument("--tenants", type=int, default=8)
+    parser.add_argument("--max-sessions", type=int, default=32, help="RESEARCH_SERVER_MAX_SESSIONS")
+    parser.add_argument("--tenant-limit", type=int, default=6, help="RESEARCH_SERVER_TENANT_LIMIT")
+    parser.add_argument("--max-queue", type=int, default=256, help="RESEARCH_SERVER_MAX_QUEUE")
+    parser.add_argument("--tenant-queue", type=int, default=32, help="RESEARCH_SERVER_TENANT_QUEUE")
+    parser.add_argument("--queue-timeout", type=float, default=60.0, help="RESEARCH_SERVER_QUEUE_TIMEOUT (s)")
+    parser.add_argument("--latency", type=float, default=0.2, help="offline BrightData latency per call (s)")
+    parser.add_argument("--snapshot-polls", type=int, default=2, help="progress checks before a snapshot is ready")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="offline model time to first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="offline model time per streamed token (s)")
+    args = parser.parse_args()
+
+    _configure_backend(args)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+
+        main.get_graph()  # build the graph before the clock starts
+    from research_server import AdmissionController, start_background_server
+
+    admission = AdmissionController(
+        max_sessions=args.max_sessions,
+        max_queue=args.max_queue,
+        tenant_limit=args.tenant_limit,
+        tenant_queue=args.tenant_queue,
+        queue_timeout=args.queue_timeout,
+    )
+    url, _ = start_background_server(admission=admission)
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+    questions = [corpus[i % len(corpus)] for i in range(args.sessions)]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        records, wall, peaks = asyncio.run(run(url, questions, args.tenants))
+
+    completed = [record for record in records if record["status"] == 200 and record["final"]]
+    failed = [record for record in records if record["status"] == 200 and not record["final"]]
+    rejected = collections.Counter(
+        f"{record['status']} {record.get('reason')}" for record in records if record["status"] != 200
+    )
+    print(f"{args.sessions} sessions over {args.tenants} tenants; server limits: {args.max_sessions} running, "
+          f"{args.tenant_limit} per tenant, queue {args.max_queue} ({args.tenant_queue} per tenant)\n")
+    print(f"  completed              {len(completed)}")
+    print(f"  failed                 {len(failed)}")
+    for reason, count in sorted(rejected.items()):
+        print(f"  rejected {reason:<13} {count}")
+    print(_line("total", [record["total"] for record in completed]))
+    print(_line("queue wait", [record["queue_wait"] for record in completed]))
+    print(_line("time to first token", [record["time_to_first_token"] for record in completed if record["time_to_first_token"]]))
+    print(f"  throughput             {len(completed) / wall:.2f} sessions/s over {wall:.1f}s")
+    print(f"  peak running / queued  {peaks['running']} / {peaks['queued']}")
+    per_tenant = collections.Counter(record["tenant"] for record in completed)
+    if per_tenant:
+        print(f"  completed per tenant   min {min(per_tenant.values())}, max {max(per_tenant.values())}")
+
+
+if __name__ == "__main__":
+    main()
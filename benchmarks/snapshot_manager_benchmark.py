@@ -0,0 +1,91 @@
+"""Per-request polling loops vs the shared snapshot manager.
+
+    python -m benchmarks.snapshot_manager_benchmark --sessions 50 --duplicates 0.3
+
+Each session runs a Reddit keyword search and a post retrieval on the async path
+against the local stub server, whose snapshots stay "running" for
+``--snapshot-delay`` seconds. ``--duplicates`` is the share of sessions that repeat
+another session's keyword, the way popular questions do. Reports trigger and
+progress request counts and session latency with the manager off and on.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import time
+
+os.environ["RESULT_CACHE_DISABLED"] = "1"
+
+from benchmarks.stub_server import StubServer
+from http_client import BrightDataClient, get_client, set_client
+from telemetry import metrics
+from webOperations import areddit_post_retrieval, areddit_search_api
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _session(keyword):
+    start = time.perf_counter()
+    results = await areddit_search_api(keyword)
+    await areddit_post_retrieval([post.url for post in results.get("parsed_data", [])])
+    return time.perf_counter() - start
+
+
+def run(keywords, manager):
+    os.environ["SNAPSHOT_MANAGER_DISABLED"] = "0" if manager else "1"
+    metrics.reset()
+
+    async def run_all():
+        try:
+            return await asyncio.gather(*(_session(keyword) for keyword in keywords))
+        finally:
+            await get_client().aclose()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        latencies = asyncio.run(run_all())
+        wall = time.perf_counter() - start
+    return {
+        "wall": wall,
+        "latencies": latencies,
+        "triggers": metrics.value("brightdata_requests_total", endpoint="trigger", outcome="200"),
+        "progress": metrics.value("brightdata_requests_total", endpoint="progress", outcome="200"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="share of sessions repeating another keyword")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub latency per request (s)")
+    parser.add_argument("--snapshot-delay", type=float, default=3.0, help="seconds a snapshot stays 'running'")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    unique = max(1, round(args.sessions * (1 - args.duplicates)))
+    keywords = [f"benchmark keyword {i}" for i in range(unique)]
+    keywords += [rng.choice(keywords[:unique]) for _ in range(args.sessions - unique)]
+    rng.shuffle(keywords)
+
+    with StubServer(latency=args.latency, snapshot_delay=args.snapshot_delay) as server:
+        set_client(BrightDataClient(api_key="stub", base_url=server.base_url, pool_size=args.sessions))
+        rows = [("per-request", run(keywords, manager=False)), ("manager", run(keywords, manager=True))]
+
+    print(f"{args.sessions} sessions ({unique} distinct keywords), snapshot delay {args.snapshot_delay}s\n")
+    print(f"{'mode':<13}{'triggers':>9}{'progress':>10}{'p50 (s)':>9}{'p95 (s)':>9}{'wall (s)':>10}")
+    for name, row in rows:
+        print(
+            f"{name:<13}{row['triggers']:>9.0f}{row['progress']:>10.0f}"
+            f"{_percentile(row['latencies'], 50):>9.2f}{_percentile(row['latencies'], 95):>9.2f}{row['wall']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Local stand-in for the BrightData API, used by the benchmarks.
+
+Speaks HTTP/1.1 with keep-alive and counts accepted TCP connections, so a benchmark
+can tell how many handshakes a client paid for.
+"""
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SERP_RESPONSE = {
+    "knowledge": {"description": "Stub knowledge panel"},
+    "organic": [
+        {"title": f"Result {i}", "link": f"https://example.com/{i}", "description": "Stub result"}
+        for i in range(10)
+    ],
+}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.count_connection()
+        # Stand-in for the TCP+TLS round trips a real remote connection costs
+        time.sleep(self.server.handshake_latency)
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        time.sleep(self.server.latency)
+
+        if self.path.startswith("/request"):
+            self._send_json(SERP_RESPONSE)
+        elif self.path.startswith("/datasets/v3/trigger"):
+            self._send_json({"snapshot_id": self.server.new_snapshot()})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+
+        match = re.match(r"^/datasets/v3/progress/([^/?]+)", self.path)
+        if match:
+            self._send_json({"status": self.server.snapshot_status(match.group(1))})
+        elif re.match(r"^/datasets/v3/snapshot/", self.path):
+            self._send_json([
+                {"title": f"Post {i}", "url": f"https://www.reddit.com/r/stub/comments/{i}", "score": i}
+                for i in range(12)
+            ])
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The socketserver default backlog of 5 resets connections under load tests
+    request_queue_size = 1024
+
+    def __init__(self, latency: float = 0.0, handshake_latency: float = 0.0, snapshot_delay: float = 0.0, port: int = 0):
+        super().__init__(("127.0.0.1", port), _StubHandler)
+        self.latency = latency
+        self.handshake_latency = handshake_latency
+        self.snapshot_delay = snapshot_delay
+        self.connections = 0
+        self.snapshot_ids = itertools.count(1)
+        self.snapshots = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def new_snapshot(self) -> str:
+        """Register a triggered snapshot; it reports "running" for snapshot_delay seconds"""
+        snapshot_id = f"s_{next(self.snapshot_ids)}"
+        with self._lock:
+            self.snapshots[snapshot_id] = time.monotonic() + self.snapshot_delay
+        return snapshot_id
+
+    def snapshot_status(self, snapshot_id: str) -> str:
+        ready_at = self.snapshots.get(snapshot_id)
+        if ready_at is None:
+            return "failed"
+        return "ready" if time.monotonic() >= ready_at else "running"
+
+    def reset_connections(self) -> int:
+        with self._lock:
+            count, self.connections = self.connections, 0
+        return count
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,84 @@
+import asyncio
+import contextlib
+import contextvars
+import time
+from typing import Iterator, Optional
+
+
+class Deadline:
+    """A fixed point in time that a chain of calls must finish by.
+
+    Create one per operation and pass it down: every step asks for the remaining
+    budget instead of starting its own fresh timeout.
+    """
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """A deadline ending ``seconds`` before this one (never before now)"""
+        return Deadline(max(0.0, self.remaining() - seconds))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return self.budget - (self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cap(self, timeout: Optional[float]) -> float:
+        """Clamp a per-call timeout to what is left of the budget"""
+        if timeout is None:
+            return self.remaining()
+        return min(timeout, self.remaining())
+
+    def sleep(self, seconds: float) -> bool:
+        """Sleep without overshooting the deadline; returns False if no budget is left"""
+        time.sleep(self.cap(seconds))
+        return not self.expired()
+
+    async def asleep(self, seconds: float) -> bool:
+        """Non-blocking ``sleep`` for the async path"""
+        await asyncio.sleep(self.cap(seconds))
+        return not self.expired()
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.1f}s of {self.budget:.1f}s)"
+
+
+# The deadline of the research (or stage of it) running in this context. Like the
+# telemetry spans it follows LangGraph's worker threads and asyncio tasks, so HTTP
+# calls deep inside a node see the budget of the research that made them.
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def set_current_deadline(deadline: Optional[Deadline]):
+    """Set the context's deadline for good, e.g. None in a context copied for shared work"""
+    _current.set(deadline)
+
+
+@contextlib.contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Make ``deadline`` the budget of everything called inside the block"""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Exited in another context (an abandoned generator); nothing to restore there
+            pass
+
+
+def stage_deadline(default: float) -> Deadline:
+    """Budget for one stage: what is left of the current research, or ``default``
+    seconds when called outside a research"""
+    return current_deadline() or Deadline(default)
@@ -0,0 +1,24 @@
+"""The .env file, loaded once per process when the first setting is needed.
+
+Modules read their settings with os.getenv when they are used, not at import, so
+the file is loaded by whatever needs configuration first (the BrightData client,
+the result cache, the models, the research server and client) instead of by every
+module as it is imported.
+"""
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env():
+    """Load .env into os.environ (existing variables win); later calls are no-ops"""
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _loaded = True
@@ -0,0 +1,382 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from deadline import Deadline, current_deadline
+from environment import load_env
+from rate_limiter import MAX_RETRIES, RateLimiter, RateLimitExceeded, limiter_for, parse_retry_after, retry_delay
+from telemetry import metrics, span
+
+BRIGHTDATA_BASE_URL = "https://api.brightdata.com"
+
+# Every BrightData endpoint we talk to, relative to the base URL
+ENDPOINTS = {
+    "request": "/request",
+    "trigger": "/datasets/v3/trigger",
+    "progress": "/datasets/v3/progress/{snapshot_id}",
+    "snapshot": "/datasets/v3/snapshot/{snapshot_id}",
+}
+
+# (connect, read) timeouts in seconds, overridable with BRIGHTDATA_TIMEOUT_<ENDPOINT>=connect,read
+DEFAULT_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    "request": (5, 15),
+    "trigger": (5, 20),
+    "progress": (5, 10),
+    "snapshot": (5, 30),
+}
+
+# Answers worth retrying: throttled everywhere, unavailable only where a repeat is harmless
+# (a trigger that failed with a 5xx may still have started a snapshot)
+RETRY_STATUSES = {
+    "request": (429, 502, 503, 504),
+    "trigger": (429,),
+    "progress": (429, 502, 503, 504),
+    "snapshot": (429, 502, 503, 504),
+}
+
+# 3 searches per research plus snapshot polls/downloads, for a handful of concurrent sessions
+DEFAULT_POOL_SIZE = 32
+# The async path multiplexes many sessions on one event loop, so it gets a bigger pool
+DEFAULT_ASYNC_POOL_SIZE = 100
+
+
+def _timeouts_from_env() -> Dict[str, Tuple[float, float]]:
+    timeouts = dict(DEFAULT_TIMEOUTS)
+    for endpoint in ENDPOINTS:
+        value = os.getenv(f"BRIGHTDATA_TIMEOUT_{endpoint.upper()}")
+        if not value:
+            continue
+        connect, _, read = value.partition(",")
+        timeouts[endpoint] = (float(connect), float(read or connect))
+    return timeouts
+
+
+# Bytes read at a time from a streamed body
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class AsyncResponse:
+    """An aiohttp response exposing the bits of the requests API we use.
+
+    Fully read unless requested with ``stream=True``: then ``content`` is None and
+    the body comes from ``aiter_content`` until ``close()``.
+    """
+
+    def __init__(self, url: str, status_code: int, headers: Dict[str, str], content: Optional[bytes], stream: Any = None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self._stream = stream
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int = STREAM_CHUNK_SIZE):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    async def aiter_content(self, chunk_size: int = STREAM_CHUNK_SIZE):
+        if self._stream is None:
+            for chunk in self.iter_content(chunk_size):
+                yield chunk
+            return
+        async for chunk in self._stream.content.iter_chunked(chunk_size):
+            yield chunk
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.release()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class BrightDataClient:
+    """Thread-safe, keep-alive HTTP client shared by every BrightData call.
+
+    A single ``requests.Session`` owns a connection pool sized to our concurrency, so
+    searches, progress polls and downloads reuse warm TCP+TLS connections instead of
+    paying a fresh handshake each time. Auth headers are built once.
+
+    The ``a``-prefixed methods do the same over an ``aiohttp.ClientSession``. An async
+    session is tied to the event loop it was created on, so one is kept per running loop.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        timeouts: Optional[Dict[str, Tuple[float, float]]] = None,
+    ):
+        load_env()
+        self.api_key = api_key or os.getenv("BRIGHTDATA_API_KEY")
+        self.base_url = (base_url or os.getenv("BRIGHTDATA_BASE_URL") or BRIGHTDATA_BASE_URL).rstrip("/")
+        self.pool_size = pool_size or int(os.getenv("BRIGHTDATA_POOL_SIZE", DEFAULT_POOL_SIZE))
+        self.async_pool_size = int(os.getenv("BRIGHTDATA_ASYNC_POOL_SIZE", max(self.pool_size, DEFAULT_ASYNC_POOL_SIZE)))
+        self.timeouts = timeouts or _timeouts_from_env()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        self.session.headers.update(self.headers)
+
+        self._async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def url(self, endpoint: str, **path_params) -> str:
+        return self.base_url + ENDPOINTS[endpoint].format(**path_params)
+
+    def timeout_for(self, endpoint: str, timeout: Optional[float] = None) -> Tuple[float, float]:
+        """Endpoint (connect, read) timeout, with the read part capped by an explicit timeout"""
+        connect, read = self.timeouts[endpoint]
+        if timeout is None:
+            return (connect, read)
+        return (min(connect, timeout), timeout)
+
+    def request(
+        self, method: str, endpoint: str, timeout: Optional[float] = None, snapshot_id: Optional[str] = None, **kwargs
+    ) -> requests.Response:
+        """One call within the endpoint's rate limit, retried with jittered backoff when
+        throttled or unavailable (see RETRY_STATUSES) while its budget allows"""
+        limiter = limiter_for(rate_limit_key(endpoint, kwargs))
+        budget = Deadline(timeout) if timeout is not None else None
+        for attempt in range(MAX_RETRIES + 1):
+            response = self._request_once(method, endpoint, limiter, _attempt_timeout(budget), snapshot_id, **kwargs)
+            delay = _retry_delay(endpoint, response, attempt, limiter, budget)
+            if delay is None:
+                break
+            response.close()
+            time.sleep(delay)
+        return response
+
+    def _request_once(
+        self, method: str, endpoint: str, limiter: Optional[RateLimiter], timeout: Optional[float],
+        snapshot_id: Optional[str], **kwargs
+    ) -> requests.Response:
+        """One traced call: a client span plus request/timeout counters per endpoint"""
+        with span(f"http {endpoint}", kind="client", **{"http.method": method, "brightdata.endpoint": endpoint,
+                                                        "snapshot_id": snapshot_id}) as current:
+            try:
+                timeout = _research_timeout(timeout)
+                if limiter is not None:
+                    timeout = _after_wait(current, timeout, limiter.acquire(timeout=timeout))
+                if timeout is not None and timeout <= 0:
+                    raise requests.exceptions.Timeout(f"research deadline reached before {endpoint} request")
+                response = self._send(method, endpoint, timeout=timeout, snapshot_id=snapshot_id, **kwargs)
+            except RateLimitExceeded as e:
+                _count_failure(endpoint, "rate_limited")
+                raise requests.exceptions.Timeout(str(e)) from e
+            except requests.exceptions.Timeout:
+                _count_failure(endpoint, "timeout")
+                raise
+            except Exception:
+                _count_failure(endpoint, "error")
+                raise
+            _count_response(current, endpoint, response.status_code)
+            return response
+
+    def _send(
+        self, method: str, endpoint: str, timeout: Optional[float] = None, snapshot_id: Optional[str] = None, **kwargs
+    ) -> requests.Response:
+        path_params = {"snapshot_id": snapshot_id} if snapshot_id else {}
+        return self.session.request(
+            method,
+            self.url(endpoint, **path_params),
+            timeout=self.timeout_for(endpoint, timeout),
+            **kwargs,
+        )
+
+    def post(self, endpoint: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, timeout=timeout, **kwargs)
+
+    def get(self, endpoint: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        return self.request("GET", endpoint, timeout=timeout, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def _async_session(self) -> "aiohttp.ClientSession":
+        # aiohttp is only imported by the first async call, so sync callers never pay for it
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        session = self._async_sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.async_pool_size),
+            )
+            self._async_sessions[loop] = session
+        return session
+
+    async def arequest(
+        self, method: str, endpoint: str, timeout: Optional[float] = None, snapshot_id: Optional[str] = None, **kwargs
+    ) -> AsyncResponse:
+        limiter = limiter_for(rate_limit_key(endpoint, kwargs))
+        budget = Deadline(timeout) if timeout is not None else None
+        for attempt in range(MAX_RETRIES + 1):
+            response = await self._arequest_once(method, endpoint, limiter, _attempt_timeout(budget), snapshot_id, **kwargs)
+            delay = _retry_delay(endpoint, response, attempt, limiter, budget)
+            if delay is None:
+                break
+            response.close()
+            await asyncio.sleep(delay)
+        return response
+
+    async def _arequest_once(
+        self, method: str, endpoint: str, limiter: Optional[RateLimiter], timeout: Optional[float],
+        snapshot_id: Optional[str], **kwargs
+    ) -> AsyncResponse:
+        with span(f"http {endpoint}", kind="client", **{"http.method": method, "brightdata.endpoint": endpoint,
+                                                        "snapshot_id": snapshot_id}) as current:
+            try:
+                timeout = _research_timeout(timeout)
+                if limiter is not None:
+                    timeout = _after_wait(current, timeout, await limiter.aacquire(timeout=timeout))
+                if timeout is not None and timeout <= 0:
+                    raise asyncio.TimeoutError(f"research deadline reached before {endpoint} request")
+                response = await self._asend(method, endpoint, timeout=timeout, snapshot_id=snapshot_id, **kwargs)
+            except RateLimitExceeded as e:
+                _count_failure(endpoint, "rate_limited")
+                raise asyncio.TimeoutError(str(e)) from e
+            except asyncio.TimeoutError:
+                _count_failure(endpoint, "timeout")
+                raise
+            except Exception:
+                _count_failure(endpoint, "error")
+                raise
+            _count_response(current, endpoint, response.status_code)
+            return response
+
+    async def _asend(
+        self, method: str, endpoint: str, timeout: Optional[float] = None, snapshot_id: Optional[str] = None, **kwargs
+    ) -> AsyncResponse:
+        path_params = {"snapshot_id": snapshot_id} if snapshot_id else {}
+        url = self.url(endpoint, **path_params)
+        import aiohttp
+
+        connect, read = self.timeout_for(endpoint, timeout)
+        client_timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        if kwargs.pop("stream", False):
+            response = await self._async_session().request(method, url, timeout=client_timeout, **kwargs)
+            return AsyncResponse(url, response.status, dict(response.headers), None, stream=response)
+        async with self._async_session().request(method, url, timeout=client_timeout, **kwargs) as response:
+            content = await response.read()
+            return AsyncResponse(url, response.status, dict(response.headers), content)
+
+    async def apost(self, endpoint: str, timeout: Optional[float] = None, **kwargs) -> AsyncResponse:
+        return await self.arequest("POST", endpoint, timeout=timeout, **kwargs)
+
+    async def aget(self, endpoint: str, timeout: Optional[float] = None, **kwargs) -> AsyncResponse:
+        return await self.arequest("GET", endpoint, timeout=timeout, **kwargs)
+
+    async def aclose(self):
+        """Close the async session bound to the running loop"""
+        session = self._async_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+
+def rate_limit_key(endpoint: str, kwargs: Dict[str, Any]) -> str:
+    """Limiter of a call: SERP requests per zone, triggers per dataset, the rest per endpoint"""
+    if endpoint == "request":
+        return f"brightdata.serp.{(kwargs.get('json') or {}).get('zone', 'default')}"
+    if endpoint == "trigger":
+        return f"brightdata.trigger.{(kwargs.get('params') or {}).get('dataset_id', 'default')}"
+    return f"brightdata.{endpoint}"
+
+
+def _attempt_timeout(budget: Optional[Deadline]) -> Optional[float]:
+    return None if budget is None else budget.remaining()
+
+
+def _after_wait(current, timeout: Optional[float], waited: float) -> Optional[float]:
+    """Record a rate-limit wait on the call's span; the wait comes out of its timeout"""
+    if waited:
+        current.set_attribute("ratelimit.wait", waited)
+    return None if timeout is None else timeout - waited
+
+
+def _header(headers, name: str) -> Optional[str]:
+    # requests' headers ignore case, the dict copied from aiohttp does not
+    return headers.get(name) or headers.get(name.lower())
+
+
+def _retry_delay(
+    endpoint: str, response, attempt: int, limiter: Optional[RateLimiter], budget: Optional[Deadline]
+) -> Optional[float]:
+    """Seconds to wait before retrying ``response``, or None to hand it back as it is"""
+    status = response.status_code
+    if status not in RETRY_STATUSES.get(endpoint, ()) or attempt >= MAX_RETRIES:
+        return None
+    retry_after = parse_retry_after(_header(response.headers, "Retry-After"))
+    if status == 429 and limiter is not None:
+        delay = limiter.throttled(retry_after, attempt)
+    else:
+        delay = retry_delay(attempt, retry_after)
+    # Only retry when the call, and the research making it, can still afford the wait
+    left = [deadline.remaining() for deadline in (budget, current_deadline()) if deadline is not None]
+    if left and delay >= min(left):
+        return None
+    metrics.inc("retries_total", operation=f"http_{endpoint}")
+    return delay
+
+
+def _research_timeout(timeout: Optional[float]) -> Optional[float]:
+    """A call's timeout capped by the deadline of the research that makes it"""
+    deadline = current_deadline()
+    return timeout if deadline is None else deadline.cap(timeout)
+
+
+def _count_response(current, endpoint: str, status_code: int):
+    current.set_attribute("http.status_code", status_code)
+    if status_code >= 400:
+        current.set_error(f"HTTP {status_code}")
+    metrics.inc("brightdata_requests_total", endpoint=endpoint, outcome=str(status_code))
+
+
+def _count_failure(endpoint: str, outcome: str):
+    metrics.inc("brightdata_requests_total", endpoint=endpoint, outcome=outcome)
+    if outcome == "timeout":
+        metrics.inc("timeouts_total", operation=f"http_{endpoint}")
+
+
+_client: Optional[BrightDataClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> BrightDataClient:
+    """Process-wide BrightData client, created on first use for the configured
+    backend (RESEARCH_BACKEND=live|offline|record, see offline.py)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from offline import default_client
+
+                _client = default_client()
+    return _client
+
+
+def set_client(client: Optional[BrightDataClient]) -> Optional[BrightDataClient]:
+    """Swap the process-wide client (e.g. to point at a stub server); returns the previous one"""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    return previous
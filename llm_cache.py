@@ -0,0 +1,261 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from deadline import current_deadline
+from prompt_serialization import count_message_tokens, count_tokens
+from rate_limiter import MAX_RETRIES, RateLimiter, limiter_for, parse_retry_after
+from result_cache import get_cache
+from telemetry import log, metrics, span
+
+NAMESPACE = "llm"
+
+
+def model_name(llm) -> str:
+    """Best-effort model identifier for a LangChain chat model"""
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+
+def messages_hash(messages: List[Dict[str, Any]]) -> str:
+    """Content hash of a message list as produced by the prompts.py helpers"""
+    raw = json.dumps(messages, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cache_key(llm, messages: List[Dict[str, Any]]) -> str:
+    return f"{model_name(llm)}:{messages_hash(messages)}"
+
+
+def node_cache_enabled(node: str) -> bool:
+    """Per-node opt-out: LLM_CACHE_DISABLED=1 turns it off everywhere,
+    LLM_CACHE_SKIP_NODES=synthesize_results_fast,... only for those nodes"""
+    if os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return False
+    skipped = {name.strip() for name in os.getenv("LLM_CACHE_SKIP_NODES", "").split(",") if name.strip()}
+    return node not in skipped
+
+
+def _cache_for(node: str):
+    return get_cache() if node_cache_enabled(node) else None
+
+
+def _llm_span(llm, node: str, streaming: bool):
+    return span("llm.call", kind="client", **{"llm.model": model_name(llm), "graph.node": node, "llm.streaming": streaming})
+
+
+def _hit(current, llm, node: str):
+    current.set_attribute("llm.cache_hit", True)
+    metrics.inc("llm_calls_total", model=model_name(llm), node=node, cache="hit")
+    log(f"💾 {node}: LLM cache hit")
+
+
+def _miss(current, llm, node: str):
+    current.set_attribute("llm.cache_hit", False)
+    metrics.inc("llm_calls_total", model=model_name(llm), node=node, cache="miss")
+
+
+def _limiter(llm) -> Optional[RateLimiter]:
+    # The offline backend's models have no provider quota; they stay unlimited unless RATE_LIMIT_OFFLINE is set
+    provider = "offline" if getattr(llm, "_llm_type", None) == "offline" else "openai"
+    return limiter_for(f"{provider}.{model_name(llm)}")
+
+
+def _budget() -> Optional[float]:
+    deadline = current_deadline()
+    return None if deadline is None else deadline.remaining()
+
+
+def _charge(limiter: Optional[RateLimiter], output) -> None:
+    """Bill the output tokens once known; the prompt was reserved up front"""
+    if limiter is not None and isinstance(output, str):
+        limiter.charge(count_tokens(output))
+
+
+def _throttled(limiter: Optional[RateLimiter], error: Exception, attempt: int) -> Optional[float]:
+    """Delay before retrying a call the provider answered 429, or None to let the error through"""
+    if limiter is None or getattr(error, "status_code", None) != 429 or attempt >= MAX_RETRIES:
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    delay = limiter.throttled(parse_retry_after(headers.get("retry-after")), attempt)
+    budget = _budget()
+    if budget is not None and delay >= budget:
+        return None
+    log(f"🚦 {limiter.key} throttled, retrying in {delay:.1f}s", level="warning")
+    metrics.inc("retries_total", operation="llm_throttled")
+    return delay
+
+
+def limited_call(llm, messages: List[Dict[str, Any]], call: Callable[[], Any]) -> Any:
+    """Run ``call`` (a request to ``llm`` with ``messages``) within the model's rate limit,
+    retrying it with jittered backoff while the provider throttles it"""
+    limiter = _limiter(llm)
+    for attempt in itertools.count():
+        if limiter is not None:
+            limiter.acquire(tokens=count_message_tokens(messages), timeout=_budget())
+        try:
+            result = call()
+        except Exception as e:
+            delay = _throttled(limiter, e, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        _charge(limiter, getattr(result, "content", None))
+        return result
+
+
+async def alimited_call(llm, messages: List[Dict[str, Any]], call: Callable[[], Any]) -> Any:
+    """Async ``limited_call``: ``call`` returns an awaitable"""
+    limiter = _limiter(llm)
+    for attempt in itertools.count():
+        if limiter is not None:
+            await limiter.aacquire(tokens=count_message_tokens(messages), timeout=_budget())
+        try:
+            result = await call()
+        except Exception as e:
+            delay = _throttled(limiter, e, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        _charge(limiter, getattr(result, "content", None))
+        return result
+
+
+def _limited_stream(llm, messages: List[Dict[str, Any]]) -> Iterator[str]:
+    """Non-empty content chunks of ``llm.stream``; retried only while nothing was yielded"""
+    limiter = _limiter(llm)
+    for attempt in itertools.count():
+        if limiter is not None:
+            limiter.acquire(tokens=count_message_tokens(messages), timeout=_budget())
+        parts = []
+        try:
+            for chunk in llm.stream(messages):
+                if hasattr(chunk, "content") and chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except Exception as e:
+            delay = None if parts else _throttled(limiter, e, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        _charge(limiter, "".join(parts))
+        return
+
+
+async def _alimited_stream(llm, messages: List[Dict[str, Any]]) -> AsyncIterator[str]:
+    limiter = _limiter(llm)
+    for attempt in itertools.count():
+        if limiter is not None:
+            await limiter.aacquire(tokens=count_message_tokens(messages), timeout=_budget())
+        parts = []
+        try:
+            async for chunk in llm.astream(messages):
+                if hasattr(chunk, "content") and chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except Exception as e:
+            delay = None if parts else _throttled(limiter, e, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        _charge(limiter, "".join(parts))
+        return
+
+
+def cached_invoke(llm, messages: List[Dict[str, Any]], node: str) -> str:
+    """``llm.invoke(messages).content``, answered from the cache for identical inputs"""
+    cache = _cache_for(node)
+    key = cache_key(llm, messages)
+
+    with _llm_span(llm, node, streaming=False) as current:
+        if cache is not None:
+            cached = cache.get(NAMESPACE, key)
+            if cached is not None:
+                _hit(current, llm, node)
+                return cached
+
+        _miss(current, llm, node)
+        content = limited_call(llm, messages, lambda: llm.invoke(messages)).content
+        if cache is not None and content:
+            cache.set(NAMESPACE, key, content)
+        return content
+
+
+def cached_stream(llm, messages: List[Dict[str, Any]], node: str) -> Iterator[str]:
+    """Stream content chunks; a cache hit comes back as a single chunk.
+
+    The full text is only stored once the stream finished, so an interrupted
+    stream never leaves a truncated answer in the cache.
+    """
+    cache = _cache_for(node)
+    key = cache_key(llm, messages)
+
+    with _llm_span(llm, node, streaming=True) as current:
+        if cache is not None:
+            cached = cache.get(NAMESPACE, key)
+            if cached is not None:
+                _hit(current, llm, node)
+                yield cached
+                return
+
+        _miss(current, llm, node)
+        parts = []
+        for content in _limited_stream(llm, messages):
+            if not parts:
+                current.add_event("first_token")
+            parts.append(content)
+            yield content
+
+        if cache is not None and parts:
+            cache.set(NAMESPACE, key, "".join(parts))
+
+
+async def cached_ainvoke(llm, messages: List[Dict[str, Any]], node: str) -> str:
+    """Async ``cached_invoke``; the cache is read and written off the event loop"""
+    cache = _cache_for(node)
+    key = cache_key(llm, messages)
+
+    with _llm_span(llm, node, streaming=False) as current:
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, NAMESPACE, key)
+            if cached is not None:
+                _hit(current, llm, node)
+                return cached
+
+        _miss(current, llm, node)
+        content = (await alimited_call(llm, messages, lambda: llm.ainvoke(messages))).content
+        if cache is not None and content:
+            await asyncio.to_thread(cache.set, NAMESPACE, key, content)
+        return content
+
+
+async def cached_astream(llm, messages: List[Dict[str, Any]], node: str) -> AsyncIterator[str]:
+    """Async ``cached_stream``"""
+    cache = _cache_for(node)
+    key = cache_key(llm, messages)
+
+    with _llm_span(llm, node, streaming=True) as current:
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, NAMESPACE, key)
+            if cached is not None:
+                _hit(current, llm, node)
+                yield cached
+                return
+
+        _miss(current, llm, node)
+        parts = []
+        async for content in _alimited_stream(llm, messages):
+            if not parts:
+                current.add_event("first_token")
+            parts.append(content)
+            yield content
+
+        if cache is not None and parts:
+            await asyncio.to_thread(cache.set, NAMESPACE, key, "".join(parts))
@@ -1,32 +1,116 @@
-from dotenv import load_dotenv
+from __future__ import annotations
+
 import os
+import asyncio
 import concurrent.futures
+import contextvars
+import functools
+import inspect
+import json
+import queue
+import sys
+import threading
 import time
-from typing import Annotated, List
-from langgraph.graph import StateGraph, START, END 
-from langgraph.graph.message import add_messages
-from langchain.chat_models import init_chat_model
+from typing import TYPE_CHECKING, Annotated, Any, List, NamedTuple
 from typing_extensions import TypedDict
-from pydantic import BaseModel, Field
-from webOperations import serp_search, reddit_search_api, reddit_post_retrieval, parallel_search_all_sources
+from answer_cache import get_answer_cache
+from deadline import Deadline, current_deadline, deadline_scope
+from environment import load_env
+from telemetry import configure_from_env, log, metrics, new_trace, span
+from prompt_serialization import count_message_tokens, serialize
+from post_ranker import llm_selection_enabled, select_post_urls
+from post_speculation import speculation_enabled
+from quorum import quorum_from_env, quorum_of
+from llm_cache import model_name, cached_invoke, cached_stream, cached_ainvoke, cached_astream, limited_call, alimited_call
+from rate_limiter import DEFAULT_PRIORITY, RateLimitExceeded, request_priority
+from webOperations import (
+     serp_search,
+     reddit_search_api,
+     reddit_post_retrieval,
+     parallel_search_all_sources,
+     aparallel_search_all_sources,
+     aserp_search,
+     areddit_search_api,
+     areddit_post_retrieval,
+     speculate_post_retrieval,
+     )
 from prompts import (
      get_google_analysis_messages, 
      get_bing_analysis_messages, 
      get_reddit_analysis_messages, 
      get_synthesis_messages,
-     get_reddit_url_analysis_messages
+     get_reddit_url_analysis_messages,
+     get_synthesis_update_messages,
      )
 
-load_dotenv()
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
+
+# ⚡ Importing this module stays cheap (Streamlit and the research server import it):
+# the models, the compiled graph and the langchain/langgraph stack behind them are
+# created on first use and shared by the whole process. `main.graph`, `main.fast_llm`
+# and `main.main_llm` still work through the module __getattr__ below.
+
+class Models(NamedTuple):
+    fast: Any  # analyses and URL selection
+    main: Any  # synthesis
+
+_models: Models | None = None
+_models_lock = threading.Lock()
+
+def get_models() -> Models:
+    """The process's chat models, created on first use"""
+    global _models
+    if _models is None:
+        with _models_lock:
+            if _models is None:
+                _models = _create_models()
+    return _models
+
+def _create_models() -> Models:
+    load_env()
+    configure_from_env()
+    from offline import offline_enabled, chat_models as offline_chat_models
+
+    if offline_enabled():
+        # 🧪 RESEARCH_BACKEND=offline: deterministic local models, no API key needed
+        return Models(*offline_chat_models())
+
+    # API key setup
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment variables (or set RESEARCH_BACKEND=offline)")
+
+    from langchain.chat_models import init_chat_model
+
+    # Use faster models for analysis, keep GPT-4 for synthesis
+    return Models(
+        fast=init_chat_model("gpt-4o-mini", api_key=api_key),  # 3x faster, 15x cheaper
+        main=init_chat_model("gpt-4o", api_key=api_key),       # For final synthesis
+    )
+
+# ⏱️ One end-to-end budget per research. Branches stop RESEARCH_SYNTHESIS_RESERVE seconds
+# (at most a quarter of the budget) before it, so synthesis always has time to answer
+# with the sources that made it.
+DEFAULT_RESEARCH_DEADLINE = 60
+DEFAULT_SYNTHESIS_RESERVE = 15
+
+def research_deadline(seconds: float | None = None) -> Deadline:
+    return Deadline(seconds or float(os.getenv("RESEARCH_DEADLINE", DEFAULT_RESEARCH_DEADLINE)))
 
-# API key setup
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not found in environment variables")
+def synthesis_reserve(deadline: Deadline) -> float:
+    return min(float(os.getenv("RESEARCH_SYNTHESIS_RESERVE", DEFAULT_SYNTHESIS_RESERVE)), deadline.budget / 4)
 
-# Use faster models for analysis, keep GPT-4 for synthesis
-fast_llm = init_chat_model("gpt-4o-mini", api_key=api_key)  # 3x faster, 15x cheaper
-main_llm = init_chat_model("gpt-4o", api_key=api_key)       # For final synthesis
+def add_messages(left, right):
+    """langgraph's message reducer, imported when the graph first merges messages"""
+    from langgraph.graph.message import add_messages as reducer
+    return reducer(left, right)
+
+def _merge_timings(left: dict | None, right: dict | None) -> dict:
+    """Reducer so parallel branches can each report their own node timings"""
+    merged = dict(left or {})
+    merged.update(right or {})
+    return merged
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
@@ -34,190 +118,1081 @@ class State(TypedDict):
     google_results: str | None
     bing_results: str | None
     reddit_results: str | None 
+    reddit_speculation: object | None  # post_speculation.Speculation, stays inside the Reddit branch
     selected_reddit_urls: List[str] | None
     reddit_post_data: List | None 
     google_analysis: str | None 
     bing_analysis: str | None
     reddit_analysis: str | None
     final_answer: str | None
+    timings: Annotated[dict, _merge_timings]
+    input_tokens: Annotated[dict, _merge_timings]
+    source_status: Annotated[dict, _merge_timings]  # source -> "complete" | "dropped"
+    source_errors: Annotated[dict, _merge_timings]  # source -> why it failed, for the notes in the answer
+    synthesis_status: str | None  # "complete" | "truncated" (cut short at the research deadline)
+
+@functools.lru_cache(maxsize=None)
+def reddit_url_analysis_schema():
+    """Structured output of the LLM URL selection (a pydantic model, defined on first use)"""
+    from pydantic import BaseModel, Field
+
+    class RedditURLAnalysis(BaseModel):
+        selected_reddit_urls: List[str] = Field(description="List of Reddit URLs that contain valuable information for answering the user's question")
+
+    return RedditURLAnalysis
+
+def _emit(config: RunnableConfig | None, event_type: str, **payload):
+    """Send an event to the caller's sink (config["configurable"]["on_event"]), if any"""
+    sink = ((config or {}).get("configurable") or {}).get("on_event")
+    if sink is not None:
+        sink({"type": event_type, **payload})
+
+def _streams(config: RunnableConfig | None, source: str) -> bool:
+    """Whether the caller wants tokens for this source; synthesis streams whenever someone listens"""
+    configurable = (config or {}).get("configurable") or {}
+    if configurable.get("on_event") is None:
+        return False
+    return source == "synthesis" or bool(configurable.get("stream_analyses"))
+
+def _payload_bytes(update: dict) -> int:
+    """Approximate size of what a node added to the state"""
+    payload = {key: value for key, value in update.items() if key != "timings"}
+    return len(json.dumps(payload, default=str))
+
+def _input_tokens(config: RunnableConfig | None, node: str, messages) -> dict:
+    """Count a call's prompt tokens and report them; returns the state update"""
+    tokens = count_message_tokens(messages)
+    metrics.inc("llm_input_tokens_total", tokens, node=node)
+    log(f"🧮 {node}: {tokens} input tokens", input_tokens=tokens)
+    _emit(config, "metric", name="input_tokens", node=node, value=tokens)
+    return {node: tokens}
+
+# Provider calls made by these nodes queue ahead of searches and speculative work
+# when a rate limit is reached (see rate_limiter); every other node uses the default
+NODE_PRIORITIES = {
+    "analyze_google_results": "analysis",
+    "analyze_bing_results": "analysis",
+    "analyze_reddit_posts": "analysis",
+    "analyze_reddit_results": "analysis",
+    "synthesize_results_fast": "synthesis",
+    "update_synthesis": "synthesis",
+}
+
+def _timed(node_name):
+    """Time a node (sync or async) and report its progress.
+
+    Runs the node inside a "node <name>" span, records the elapsed time under
+    state["timings"][node_name] and emits
+    "progress" events (status "start", then "end" or "error", with elapsed seconds
+    and the size of the node's output) to the caller's event sink. The wrapper
+    always accepts the run config and hands it on to nodes that take one, and runs
+    the node at its NODE_PRIORITIES rate-limit priority.
+    """
+    priority = NODE_PRIORITIES.get(node_name, DEFAULT_PRIORITY)
+
+    def decorator(node):
+        takes_config = "config" in inspect.signature(node).parameters
 
-class RedditURLAnalysis(BaseModel):
-    selected_reddit_urls: List[str] = Field(description="List of Reddit URLs that contain valuable information for answering the user's question")
+        def _started(config):
+            _emit(config, "progress", node=node_name, status="start")
+            return time.time()
 
+        def _finished(config, update, start_time, current):
+            elapsed = time.time() - start_time
+            update["timings"] = {**update.get("timings", {}), node_name: elapsed}
+            payload_bytes = _payload_bytes(update)
+            current.set_attribute("payload_bytes", payload_bytes)
+            _emit(config, "progress", node=node_name, status="end", elapsed=elapsed, payload_bytes=payload_bytes)
+            return update
+
+        def _failed(config, start_time, error):
+            _emit(config, "progress", node=node_name, status="error", elapsed=time.time() - start_time, error=str(error))
+
+        if inspect.iscoroutinefunction(node):
+            async def async_wrapper(state: State, config: RunnableConfig = None) -> State:
+                with span(f"node {node_name}", **{"graph.node": node_name}) as current, request_priority(priority):
+                    start_time = _started(config)
+                    try:
+                        update = dict(await (node(state, config) if takes_config else node(state)) or {})
+                    except Exception as e:
+                        _failed(config, start_time, e)
+                        raise
+                    return _finished(config, update, start_time, current)
+            wrapper = async_wrapper
+        else:
+            def sync_wrapper(state: State, config: RunnableConfig = None) -> State:
+                with span(f"node {node_name}", **{"graph.node": node_name}) as current, request_priority(priority):
+                    start_time = _started(config)
+                    try:
+                        update = dict((node(state, config) if takes_config else node(state)) or {})
+                    except Exception as e:
+                        _failed(config, start_time, e)
+                        raise
+                    return _finished(config, update, start_time, current)
+            wrapper = sync_wrapper
+
+        functools.update_wrapper(wrapper, node)
+        # Keep our own (state, config) signature visible to LangGraph
+        del wrapper.__wrapped__
+        return wrapper
+    return decorator
+
+def _llm_text(llm, messages, node: str, source: str, config: RunnableConfig | None) -> str:
+    """Cached LLM call that streams tokens to the event sink when the caller wants them"""
+    if not _streams(config, source):
+        return cached_invoke(llm, messages, node=node)
+
+    parts = []
+    for chunk in cached_stream(llm, messages, node=node):
+        parts.append(chunk)
+        _emit(config, "token", node=node, source=source, text=chunk)
+    return "".join(parts)
+
+async def _allm_text(llm, messages, node: str, source: str, config: RunnableConfig | None) -> str:
+    if not _streams(config, source):
+        return await cached_ainvoke(llm, messages, node=node)
+
+    parts = []
+    async for chunk in cached_astream(llm, messages, node=node):
+        parts.append(chunk)
+        _emit(config, "token", node=node, source=source, text=chunk)
+    return "".join(parts)
+
+@_timed("google_search")
 def google_search(state: State) -> State:
     user_question = state.get("user_question", "")
     google_results = serp_search(user_question, engine="google")
     return {"google_results": google_results}
 
+@_timed("google_search")
+async def agoogle_search(state: State) -> State:
+    user_question = state.get("user_question", "")
+    google_results = await aserp_search(user_question, engine="google")
+    return {"google_results": google_results}
+
+@_timed("bing_search")
 def bing_search(state: State) -> State:
     user_question = state.get("user_question", "")
     bing_results = serp_search(user_question, engine="bing")
     return {"bing_results": bing_results}
 
+@_timed("bing_search")
+async def abing_search(state: State) -> State:
+    user_question = state.get("user_question", "")
+    bing_results = await aserp_search(user_question, engine="bing")
+    return {"bing_results": bing_results}
+
+def _with_speculation(reddit_results) -> State:
+    """Search results plus, when enabled, a head start on retrieving their top posts"""
+    update = {"reddit_results": reddit_results}
+    if speculation_enabled(llm_selection_enabled()):
+        update["reddit_speculation"] = speculate_post_retrieval(reddit_results)
+    return update
+
+@_timed("reddit_search")
 def reddit_search(state: State) -> State:
     user_question = state.get("user_question", "")
     reddit_results = reddit_search_api(user_question)
-    return {"reddit_results": reddit_results}
+    return _with_speculation(reddit_results)
 
-def analyze_reddit_posts(state: State) -> State:
+@_timed("reddit_search")
+async def areddit_search(state: State) -> State:
+    user_question = state.get("user_question", "")
+    reddit_results = await areddit_search_api(user_question)
+    return _with_speculation(reddit_results)
+
+def _local_url_selection(user_question, reddit_results) -> State:
+    start = time.perf_counter()
+    selected_urls = select_post_urls(user_question, reddit_results)
+    log(f"🎯 Ranked {len(reddit_results.get('parsed_data') or [])} Reddit posts locally in {(time.perf_counter() - start) * 1e6:.0f}µs")
+    return {"selected_reddit_urls": selected_urls}
+
+def select_reddit_urls_llm(user_question, reddit_results, config: RunnableConfig | None = None):
+    """Ask the fast model which posts are worth retrieving; returns (urls, input_tokens update)"""
+    fast_llm = get_models().fast
+    structured_llm = fast_llm.with_structured_output(reddit_url_analysis_schema())  # Use fast model
+    messages = get_reddit_url_analysis_messages(user_question, serialize("reddit_posts", reddit_results))
+    input_tokens = _input_tokens(config, "analyze_reddit_posts", messages)
+
+    with span("llm.call", kind="client", **{"llm.model": model_name(fast_llm), "graph.node": "analyze_reddit_posts", "llm.structured": True}):
+        metrics.inc("llm_calls_total", model=model_name(fast_llm), node="analyze_reddit_posts", cache="none")
+        try:
+            return limited_call(fast_llm, messages, lambda: structured_llm.invoke(messages)).selected_reddit_urls, input_tokens
+        except Exception as e:
+            log(f"❌ Reddit URL selection failed: {e}", level="error")
+            return [], input_tokens
+
+async def aselect_reddit_urls_llm(user_question, reddit_results, config: RunnableConfig | None = None):
+    fast_llm = get_models().fast
+    structured_llm = fast_llm.with_structured_output(reddit_url_analysis_schema())
+    messages = get_reddit_url_analysis_messages(user_question, serialize("reddit_posts", reddit_results))
+    input_tokens = _input_tokens(config, "analyze_reddit_posts", messages)
+
+    with span("llm.call", kind="client", **{"llm.model": model_name(fast_llm), "graph.node": "analyze_reddit_posts", "llm.structured": True}):
+        metrics.inc("llm_calls_total", model=model_name(fast_llm), node="analyze_reddit_posts", cache="none")
+        try:
+            return (await alimited_call(fast_llm, messages, lambda: structured_llm.ainvoke(messages))).selected_reddit_urls, input_tokens
+        except Exception as e:
+            log(f"❌ Reddit URL selection failed: {e}", level="error")
+            return [], input_tokens
+
+# 🚀 OPTIMIZED: Local BM25 + engagement ranking by default, LLM selection with REDDIT_URL_SELECTOR=llm
+@_timed("analyze_reddit_posts")
+def analyze_reddit_posts(state: State, config: RunnableConfig) -> State:
     user_question = state.get("user_question", "")
     reddit_results = state.get("reddit_results", "")
 
     if not reddit_results:
         return {"selected_reddit_urls": []}
-    
-    structured_llm = fast_llm.with_structured_output(RedditURLAnalysis)  # Use fast model
-    messages = get_reddit_url_analysis_messages(user_question, reddit_results)
+    if not llm_selection_enabled():
+        return _local_url_selection(user_question, reddit_results)
 
-    try:
-        analysis = structured_llm.invoke(messages)
-        selected_urls = analysis.selected_reddit_urls
-    except Exception as e:
-        selected_urls = []
+    selected_urls, input_tokens = select_reddit_urls_llm(user_question, reddit_results, config)
+    return {"selected_reddit_urls": selected_urls, "input_tokens": input_tokens}
 
-    return {"selected_reddit_urls": selected_urls}
+@_timed("analyze_reddit_posts")
+async def aanalyze_reddit_posts(state: State, config: RunnableConfig) -> State:
+    user_question = state.get("user_question", "")
+    reddit_results = state.get("reddit_results", "")
+
+    if not reddit_results:
+        return {"selected_reddit_urls": []}
+    if not llm_selection_enabled():
+        return _local_url_selection(user_question, reddit_results)
+
+    selected_urls, input_tokens = await aselect_reddit_urls_llm(user_question, reddit_results, config)
+    return {"selected_reddit_urls": selected_urls, "input_tokens": input_tokens}
 
+@_timed("retrieve_reddit_posts")
 def retrieve_reddit_posts(state: State) -> State:
     selected_urls = state.get("selected_reddit_urls", [])
+    speculation = state.get("reddit_speculation")
 
-    if not selected_urls:
+    if not selected_urls and speculation is None:
         return {"reddit_post_data": []}
     
-    reddit_post_data = reddit_post_retrieval(selected_urls)
+    reddit_post_data = reddit_post_retrieval(selected_urls, speculation=speculation)
 
     if not reddit_post_data:
         reddit_post_data = []
     
     return {"reddit_post_data": reddit_post_data}
 
-# 🚀 OPTIMIZED: Parallel Analysis Function
-def fast_parallel_analysis(state: State) -> State:
-    """Run all analysis tasks in parallel - 3x speed improvement"""
-    
-    def analyze_google():
-        user_question = state.get("user_question", "")
-        google_results = state.get("google_results", "")
-        if not google_results:
-            return ("google_analysis", "No Google results available")
-        messages = get_google_analysis_messages(user_question, google_results)
-        reply = fast_llm.invoke(messages)  # Use fast model
-        return ("google_analysis", reply.content)
-    
-    def analyze_bing():
-        user_question = state.get("user_question", "")
-        bing_results = state.get("bing_results", "")
-        if not bing_results:
-            return ("bing_analysis", "No Bing results available")
-        messages = get_bing_analysis_messages(user_question, bing_results)
-        reply = fast_llm.invoke(messages)  # Use fast model
-        return ("bing_analysis", reply.content)
-    
-    def analyze_reddit():
-        user_question = state.get("user_question", "")
-        reddit_results = state.get("reddit_results", "")
-        reddit_post_data = state.get("reddit_post_data", [])
-        if not reddit_results and not reddit_post_data:
-            return ("reddit_analysis", "No Reddit results available")
-        messages = get_reddit_analysis_messages(user_question, reddit_results, reddit_post_data)
-        reply = fast_llm.invoke(messages)  # Use fast model
-        return ("reddit_analysis", reply.content)
-    
-    # 🚀 Run all analysis in parallel
-    start_time = time.time()
-    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-        futures = [
-            executor.submit(analyze_google),
-            executor.submit(analyze_bing),
-            executor.submit(analyze_reddit)
-        ]
-        
-        results = {}
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                key, value = future.result()
-                results[key] = value
-            except Exception as e:
-                print(f"Analysis error: {e}")
-    
-    analysis_time = time.time() - start_time
-    print(f"⚡ Parallel analysis completed in {analysis_time:.1f}s")
-    
-    return results
+@_timed("retrieve_reddit_posts")
+async def aretrieve_reddit_posts(state: State) -> State:
+    selected_urls = state.get("selected_reddit_urls", [])
+    speculation = state.get("reddit_speculation")
 
-# 🚀 OPTIMIZED: Streaming Synthesis
-def synthesize_results_fast(state: State) -> State:
-    """Fast synthesis with streaming response"""
+    if not selected_urls and speculation is None:
+        return {"reddit_post_data": []}
+
+    reddit_post_data = await areddit_post_retrieval(selected_urls, speculation=speculation)
+    return {"reddit_post_data": reddit_post_data or []}
+
+def _search_error(source, state):
+    """Why a source's search failed (e.g. throttled after retries), or None"""
+    results = state.get(f"{source}_results")
+    return results.get("error") if isinstance(results, dict) else None
+
+def _failed_analysis(source, error):
+    return f"Not available: the {source.capitalize()} search failed ({error})."
+
+def _branch_error(error: Exception) -> str:
+    if isinstance(error, RateLimitExceeded):
+        # The model's rate limit had no slot before the deadline, like a search throttled after retries
+        return f"rate limited ({error.key} had no free slot within the research deadline)"
+    return f"it stopped on an error ({type(error).__name__}: {error})"
+
+def _source_error(source, state):
+    """Why a source failed, phrased for the answer's notes: its branch raised, or its search came back with an error"""
+    reason = (state.get("source_errors") or {}).get(source)
+    if reason:
+        return reason
+    error = _search_error(source, state)
+    return f"the search failed ({error})" if error else None
+
+# 🚀 OPTIMIZED: One analysis node per source, each fires as soon as its own branch is ready
+@_timed("analyze_google_results")
+def analyze_google_results(state: State, config: RunnableConfig) -> State:
+    user_question = state.get("user_question", "")
+    google_results = state.get("google_results", "")
+    if not google_results:
+        return {"google_analysis": "No Google results available"}
+    if _search_error("google", state):
+        return {"google_analysis": _failed_analysis("google", _search_error("google", state))}
+    messages = get_google_analysis_messages(user_question, serialize("google", google_results))
+    input_tokens = _input_tokens(config, "analyze_google_results", messages)
+    content = _llm_text(get_models().fast, messages, "analyze_google_results", "google", config)  # Use fast model
+    return {"google_analysis": content, "input_tokens": input_tokens}
+
+@_timed("analyze_google_results")
+async def aanalyze_google_results(state: State, config: RunnableConfig) -> State:
+    user_question = state.get("user_question", "")
+    google_results = state.get("google_results", "")
+    if not google_results:
+        return {"google_analysis": "No Google results available"}
+    if _search_error("google", state):
+        return {"google_analysis": _failed_analysis("google", _search_error("google", state))}
+    messages = get_google_analysis_messages(user_question, serialize("google", google_results))
+    input_tokens = _input_tokens(config, "analyze_google_results", messages)
+    content = await _allm_text(get_models().fast, messages, "analyze_google_results", "google", config)
+    return {"google_analysis": content, "input_tokens": input_tokens}
+
+@_timed("analyze_bing_results")
+def analyze_bing_results(state: State, config: RunnableConfig) -> State:
+    user_question = state.get("user_question", "")
+    bing_results = state.get("bing_results", "")
+    if not bing_results:
+        return {"bing_analysis": "No Bing results available"}
+    if _search_error("bing", state):
+        return {"bing_analysis": _failed_analysis("bing", _search_error("bing", state))}
+    messages = get_bing_analysis_messages(user_question, serialize("bing", bing_results))
+    input_tokens = _input_tokens(config, "analyze_bing_results", messages)
+    content = _llm_text(get_models().fast, messages, "analyze_bing_results", "bing", config)  # Use fast model
+    return {"bing_analysis": content, "input_tokens": input_tokens}
+
+@_timed("analyze_bing_results")
+async def aanalyze_bing_results(state: State, config: RunnableConfig) -> State:
+    user_question = state.get("user_question", "")
+    bing_results = state.get("bing_results", "")
+    if not bing_results:
+        return {"bing_analysis": "No Bing results available"}
+    if _search_error("bing", state):
+        return {"bing_analysis": _failed_analysis("bing", _search_error("bing", state))}
+    messages = get_bing_analysis_messages(user_question, serialize("bing", bing_results))
+    input_tokens = _input_tokens(config, "analyze_bing_results", messages)
+    content = await _allm_text(get_models().fast, messages, "analyze_bing_results", "bing", config)
+    return {"bing_analysis": content, "input_tokens": input_tokens}
+
+@_timed("analyze_reddit_results")
+def analyze_reddit_results(state: State, config: RunnableConfig) -> State:
     user_question = state.get("user_question", "")
-    google_analysis = state.get("google_analysis", "")
-    bing_analysis = state.get("bing_analysis", "")
-    reddit_analysis = state.get("reddit_analysis", "")
+    reddit_results = state.get("reddit_results", "")
+    reddit_post_data = state.get("reddit_post_data", [])
+    if not reddit_results and not reddit_post_data:
+        return {"reddit_analysis": "No Reddit results available"}
+    messages = get_reddit_analysis_messages(
+        user_question, serialize("reddit_posts", reddit_results), serialize("reddit_comments", reddit_post_data)
+    )
+    input_tokens = _input_tokens(config, "analyze_reddit_results", messages)
+    content = _llm_text(get_models().fast, messages, "analyze_reddit_results", "reddit", config)  # Use fast model
+    return {"reddit_analysis": content, "input_tokens": input_tokens}
+
+@_timed("analyze_reddit_results")
+async def aanalyze_reddit_results(state: State, config: RunnableConfig) -> State:
+    user_question = state.get("user_question", "")
+    reddit_results = state.get("reddit_results", "")
+    reddit_post_data = state.get("reddit_post_data", [])
+    if not reddit_results and not reddit_post_data:
+        return {"reddit_analysis": "No Reddit results available"}
+    messages = get_reddit_analysis_messages(
+        user_question, serialize("reddit_posts", reddit_results), serialize("reddit_comments", reddit_post_data)
+    )
+    input_tokens = _input_tokens(config, "analyze_reddit_results", messages)
+    content = await _allm_text(get_models().fast, messages, "analyze_reddit_results", "reddit", config)
+    return {"reddit_analysis": content, "input_tokens": input_tokens}
+
+# 🚀 OPTIMIZED: Streaming Synthesis
+def _synthesis_messages(state: State):
+    """Synthesis prompt from the analyses that arrived; returns (messages, dropped sources, failed sources -> reason)"""
+    status = state.get("source_status") or {}
+    dropped = [source for source in BRANCHES if status.get(source) == "dropped"]
+    failed = {source: _source_error(source, state) for source in BRANCHES if status.get(source) == "failed"}
+    analyses = {source: state.get(f"{source}_analysis", "") for source in BRANCHES}
+    for source in BRANCHES:
+        if source in dropped:
+            analyses[source] = f"Not available: the {source.capitalize()} source did not finish within the research deadline."
+        elif source in failed:
+            analyses[source] = f"Not available from {source.capitalize()}: {failed[source]}."
+        elif status.get(source) == "late":
+            analyses[source] = f"Not available yet: the {source.capitalize()} source is still being researched."
+    messages = get_synthesis_messages(state.get("user_question", ""), analyses["google"], analyses["bing"], analyses["reddit"])
+    return messages, dropped, failed
+
+def _truncated_note(config) -> str:
+    note = "\n\n[Answer cut short at the research deadline]"
+    log("⏰ Synthesis stopped at the research deadline", level="warning")
+    _emit(config, "token", node="synthesize_results_fast", source="synthesis", text=note)
+    return note
+
+def _missing_note(config, node: str, sources, reason: str) -> str:
+    """Say which sources the answer is missing, in the answer itself"""
+    note = f"\n\n---\n⚠️ Answered without {', '.join(source.capitalize() for source in sources)}: {reason}."
+    _emit(config, "token", node=node, source="synthesis", text=note)
+    return note
+
+def _synthesis_update(config, final_answer, dropped, failed, start_time, first_token_time, input_tokens, truncated=False) -> State:
+    if dropped:
+        final_answer += _missing_note(config, "synthesize_results_fast", dropped, "no results within the research deadline")
+    for source, reason in failed.items():
+        final_answer += _missing_note(config, "synthesize_results_fast", [source], reason)
+
+    synthesis_time = time.time() - start_time
+    log(f"🎯 Synthesis completed in {synthesis_time:.1f}s (first token after {first_token_time or 0:.1f}s)")
+
+    return {
+        "final_answer": final_answer,
+        "synthesis_status": "truncated" if truncated else "complete",
+        'messages': [{"role": "assistant", "content": final_answer}],
+        "timings": {"synthesis_first_token": first_token_time or synthesis_time},
+        "input_tokens": input_tokens,
+    }
+
+@_timed("synthesize_results_fast")
+def synthesize_results_fast(state: State, config: RunnableConfig) -> State:
+    """Fast synthesis, streaming each token to the caller's event sink as it arrives"""
+    messages, dropped, failed = _synthesis_messages(state)
+    input_tokens = _input_tokens(config, "synthesize_results_fast", messages)
+    deadline = current_deadline()
 
     start_time = time.time()
-    messages = get_synthesis_messages(user_question, google_analysis, bing_analysis, reddit_analysis)
-    
-    # Use streaming for faster perceived response
+    # Use streaming for faster perceived response; identical inputs come from the LLM cache
     final_answer_parts = []
+    first_token_time = None
+    truncated = False
     try:
-        for chunk in main_llm.stream(messages):  # Use streaming
-            if hasattr(chunk, 'content') and chunk.content:
-                final_answer_parts.append(chunk.content)
+        for chunk in cached_stream(get_models().main, messages, node="synthesize_results_fast"):  # Use streaming
+            if first_token_time is None:
+                first_token_time = time.time() - start_time
+            final_answer_parts.append(chunk)
+            _emit(config, "token", node="synthesize_results_fast", source="synthesis", text=chunk)
+            if deadline is not None and deadline.expired():
+                final_answer_parts.append(_truncated_note(config))
+                truncated = True
+                break
         
         final_answer = ''.join(final_answer_parts)
     except Exception as e:
-        # Fallback to regular invoke if streaming fails
-        final_answer_response = main_llm.invoke(messages)
-        final_answer = final_answer_response.content
-    
-    synthesis_time = time.time() - start_time
-    print(f"🎯 Synthesis completed in {synthesis_time:.1f}s")
+        # Fallback to regular invoke if streaming fails (only if nothing was streamed yet)
+        if final_answer_parts:
+            raise
+        metrics.inc("retries_total", operation="synthesis_invoke_fallback")
+        final_answer = cached_invoke(get_models().main, messages, node="synthesize_results_fast")
+        first_token_time = time.time() - start_time
+        _emit(config, "token", node="synthesize_results_fast", source="synthesis", text=final_answer)
     
+    return _synthesis_update(config, final_answer, dropped, failed, start_time, first_token_time, input_tokens, truncated)
+
+@_timed("synthesize_results_fast")
+async def asynthesize_results_fast(state: State, config: RunnableConfig) -> State:
+    """Async streaming synthesis"""
+    messages, dropped, failed = _synthesis_messages(state)
+    input_tokens = _input_tokens(config, "synthesize_results_fast", messages)
+    deadline = current_deadline()
+
+    start_time = time.time()
+    final_answer_parts = []
+    first_token_time = None
+    truncated = False
+    try:
+        async for chunk in cached_astream(get_models().main, messages, node="synthesize_results_fast"):
+            if first_token_time is None:
+                first_token_time = time.time() - start_time
+            final_answer_parts.append(chunk)
+            _emit(config, "token", node="synthesize_results_fast", source="synthesis", text=chunk)
+            if deadline is not None and deadline.expired():
+                final_answer_parts.append(_truncated_note(config))
+                truncated = True
+                break
+
+        final_answer = ''.join(final_answer_parts)
+    except Exception as e:
+        if final_answer_parts:
+            raise
+        metrics.inc("retries_total", operation="synthesis_invoke_fallback")
+        final_answer = await cached_ainvoke(get_models().main, messages, node="synthesize_results_fast")
+        first_token_time = time.time() - start_time
+        _emit(config, "token", node="synthesize_results_fast", source="synthesis", text=final_answer)
+
+    return _synthesis_update(config, final_answer, dropped, failed, start_time, first_token_time, input_tokens, truncated)
+
+def _late_sources(state: State, config: RunnableConfig):
+    status = state.get("source_status") or {}
+    late = [source for source in BRANCHES if status.get(source) == "late"]
+    return late, quorum_of(config)
+
+def _late_deadline():
+    """Late branches are waited for until the gather deadline, like any other branch"""
+    research_deadline = current_deadline()
+    if research_deadline is None:
+        return None
+    return research_deadline.reserve(synthesis_reserve(research_deadline))
+
+def _update_header(config, source: str) -> str:
+    header = f"\n\n### 🔄 Update: {source.capitalize()}\n"
+    _emit(config, "token", node="update_synthesis", source="synthesis", text=header)
+    return header
+
+def _late_arrival(source: str, future, arrived_in_time: bool) -> tuple[State, bool]:
+    """State update for a late branch's finished future, and whether it has anything to add"""
+    if future.cancelled():
+        # Stopped before it finished: nothing arrived, the answer notes it as missing
+        return {"source_status": {source: "dropped"}}, False
+    error = future.exception()
+    result = {} if error is not None else future.result()
+    update = {key: result.get(key) for key in BRANCH_OUTPUTS[source]}
+    update["timings"] = result.get("timings", {})
+    update["input_tokens"] = result.get("input_tokens", {})
+    reason = _branch_error(error) if error is not None else _source_error(source, result)
+    status = "dropped" if not arrived_in_time else "failed" if reason else "updated"
+    update["source_status"] = {source: status}
+    update["source_errors"] = {source: reason} if status == "failed" else {}
+    return update, status == "updated" and bool(result.get(f"{source}_analysis"))
+
+def _failed_notes(config, updates: list) -> list:
+    """A note for each late source that failed"""
+    return [
+        _missing_note(config, "update_synthesis", [source], update["source_errors"][source])
+        for update in updates for source, status in update.get("source_status", {}).items() if status == "failed"
+    ]
+
+def _merge_updates(updates: list) -> State:
+    merged = {"timings": {}, "input_tokens": {}, "source_status": {}, "source_errors": {}}
+    for update in updates:
+        for key, value in update.items():
+            if key in merged:
+                merged[key].update(value or {})
+            else:
+                merged[key] = value
+    return merged
+
+# 🔄 Quorum mode: sources that missed the quorum are appended as updates (or noted as missing)
+@_timed("update_synthesis")
+def update_synthesis(state: State, config: RunnableConfig) -> State:
+    late, quorum = _late_sources(state, config)
+    if not late:
+        return {}
+    final_answer = state.get("final_answer") or ""
+    if quorum.late_policy == "drop":
+        note = _missing_note(config, "update_synthesis", late, "still running when the answer was written")
+        return {"final_answer": final_answer + note, "source_status": {source: "dropped" for source in late}}
+
+    deadline = _late_deadline()
+    futures = {quorum.late[source]: source for source in late}
+    updates, arrived, addenda = [], set(), []
+    try:
+        for future in concurrent.futures.as_completed(futures, timeout=deadline.remaining() if deadline else None):
+            source = futures[future]
+            arrived.add(source)
+            update, useful = _late_arrival(source, future, not (deadline and deadline.expired()))
+            updates.append(update)
+            if not useful:
+                continue
+            messages = get_synthesis_update_messages(
+                state.get("user_question", ""), final_answer, source.capitalize(), update[f"{source}_analysis"]
+            )
+            updates.append({"input_tokens": _input_tokens(config, f"update_synthesis_{source}", messages)})
+            addenda.append(_update_header(config, source) + _llm_text(get_models().main, messages, "update_synthesis", "synthesis", config))
+    except concurrent.futures.TimeoutError:
+        pass
+
+    missing = [source for source in late if source not in arrived]
+    missing += [source for update in updates for source, status in update.get("source_status", {}).items() if status == "dropped"]
+    if missing:
+        addenda.append(_missing_note(config, "update_synthesis", missing, "no results within the research deadline"))
+    addenda += _failed_notes(config, updates)
+    merged = _merge_updates(updates)
+    merged["source_status"].update({source: "dropped" for source in missing})
+    final_answer += "".join(addenda)
+    return {**merged, "final_answer": final_answer, "messages": [{"role": "assistant", "content": "".join(addenda)}] if addenda else []}
+
+@_timed("update_synthesis")
+async def aupdate_synthesis(state: State, config: RunnableConfig) -> State:
+    late, quorum = _late_sources(state, config)
+    if not late:
+        return {}
+    final_answer = state.get("final_answer") or ""
+    if quorum.late_policy == "drop":
+        note = _missing_note(config, "update_synthesis", late, "still running when the answer was written")
+        return {"final_answer": final_answer + note, "source_status": {source: "dropped" for source in late}}
+
+    deadline = _late_deadline()
+    futures = {asyncio.wrap_future(quorum.late[source]): source for source in late}
+    updates, arrived, addenda = [], set(), []
+    pending = set(futures)
+    while pending:
+        done, pending = await asyncio.wait(pending, timeout=deadline.remaining() if deadline else None, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            source = futures[future]
+            arrived.add(source)
+            update, useful = _late_arrival(source, future, not (deadline and deadline.expired()))
+            updates.append(update)
+            if not useful:
+                continue
+            messages = get_synthesis_update_messages(
+                state.get("user_question", ""), final_answer, source.capitalize(), update[f"{source}_analysis"]
+            )
+            updates.append({"input_tokens": _input_tokens(config, f"update_synthesis_{source}", messages)})
+            addenda.append(_update_header(config, source) + await _allm_text(get_models().main, messages, "update_synthesis", "synthesis", config))
+
+    missing = [source for source in late if source not in arrived]
+    missing += [source for update in updates for source, status in update.get("source_status", {}).items() if status == "dropped"]
+    if missing:
+        addenda.append(_missing_note(config, "update_synthesis", missing, "no results within the research deadline"))
+    addenda += _failed_notes(config, updates)
+    merged = _merge_updates(updates)
+    merged["source_status"].update({source: "dropped" for source in missing})
+    final_answer += "".join(addenda)
+    return {**merged, "final_answer": final_answer, "messages": [{"role": "assistant", "content": "".join(addenda)}] if addenda else []}
+
+# 🚀 OPTIMIZED: Dependency-driven topology.
+# Each source is its own branch subgraph, so a branch only waits on its own inputs:
+#   google: google_search -> analyze_google_results
+#   bing:   bing_search -> analyze_bing_results
+#   reddit: reddit_search -> analyze_reddit_posts -> retrieve_reddit_posts -> analyze_reddit_results
+# Synthesis is the only join. Branches run as single nodes of the outer graph because
+# LangGraph steps are barriers: as flat nodes, Google analysis would still wait for the
+# slowest node of every earlier step (the Reddit snapshot round-trips).
+BRANCHES = {
+    "google": ["google_search", "analyze_google_results"],
+    "bing": ["bing_search", "analyze_bing_results"],
+    "reddit": ["reddit_search", "analyze_reddit_posts", "retrieve_reddit_posts", "analyze_reddit_results"],
+}
+
+BRANCH_OUTPUTS = {
+    "google": ["google_results", "google_analysis"],
+    "bing": ["bing_results", "bing_analysis"],
+    "reddit": ["reddit_results", "selected_reddit_urls", "reddit_post_data", "reddit_analysis"],
+}
+
+# Every node has a sync and an async implementation: graph.invoke runs the first,
+# graph.ainvoke the second, so many research sessions can share one event loop.
+NODES = {
+    "google_search": (google_search, agoogle_search),
+    "analyze_google_results": (analyze_google_results, aanalyze_google_results),
+    "bing_search": (bing_search, abing_search),
+    "analyze_bing_results": (analyze_bing_results, aanalyze_bing_results),
+    "reddit_search": (reddit_search, areddit_search),
+    "analyze_reddit_posts": (analyze_reddit_posts, aanalyze_reddit_posts),
+    "retrieve_reddit_posts": (retrieve_reddit_posts, aretrieve_reddit_posts),
+    "analyze_reddit_results": (analyze_reddit_results, aanalyze_reddit_results),
+    "synthesize_results_fast": (synthesize_results_fast, asynthesize_results_fast),
+    "update_synthesis": (update_synthesis, aupdate_synthesis),
+}
+
+def _node(node_name):
+    from langchain_core.runnables import RunnableLambda
+
+    func, afunc = NODES[node_name]
+    return RunnableLambda(func, afunc=afunc, name=node_name)
+
+def _build_branch(source):
+    """Compile one source's chain of nodes into its own subgraph"""
+    from langgraph.graph import StateGraph, START, END
+
+    branch_builder = StateGraph(State)
+    previous = START
+    for node_name in BRANCHES[source]:
+        branch_builder.add_node(node_name, _node(node_name))
+        branch_builder.add_edge(previous, node_name)
+        previous = node_name
+    branch_builder.add_edge(previous, END)
+    return branch_builder.compile()
+
+def _branch_node(source):
+    """Run a branch subgraph and hand back only the keys that branch owns.
+
+    Under a research deadline the branch stops being waited for at the gather
+    deadline ("dropped"); under a quorum, a branch outside it stops being waited for
+    once the quorum is in ("late"), and keeps running for the update pass. Either
+    way the state the branch had reached so far is handed on.
+
+    A branch nobody will read stops at its next node: a dropped one (or a late one
+    with SYNTHESIS_LATE_SOURCES=drop) right away, any other once the gather deadline
+    has passed, since the update pass stops waiting then too. The node already
+    running finishes, its calls capped by the same deadline.
+    """
+    branch_graph = _build_branch(source)
+
+    def _branch_update(result, elapsed, config, status="complete", error=None):
+        """The branch's outputs for the outer state; a branch that raised ``error`` is "failed"
+        with whatever it had produced, so synthesis still answers from the other sources"""
+        reason = None
+        if error is not None:
+            status, reason = "failed", _branch_error(error)
+        elif status == "complete":
+            reason = _source_error(source, result)
+            status = "failed" if reason else status
+        if status == "complete":
+            log(f"🧵 {source.capitalize()} branch finished in {elapsed:.1f}s")
+        elif status == "failed":
+            log(f"❌ {source.capitalize()} branch failed after {elapsed:.1f}s: {reason}", level="warning")
+            metrics.inc("sources_failed_total", source=source)
+        elif status == "late":
+            log(f"🐢 {source.capitalize()} branch still running after {elapsed:.1f}s, synthesis starts without it")
+            metrics.inc("sources_late_total", source=source)
+            _emit(config, "progress", node=f"{source}_branch", status="late", elapsed=elapsed)
+        else:
+            log(f"⏰ {source.capitalize()} branch dropped at the research deadline after {elapsed:.1f}s", level="warning")
+            metrics.inc("sources_dropped_total", source=source)
+            _emit(config, "progress", node=f"{source}_branch", status="dropped", elapsed=elapsed)
+        update = {key: result.get(key) for key in BRANCH_OUTPUTS[source]}
+        update["timings"] = {**result.get("timings", {}), f"{source}_branch": elapsed}
+        update["input_tokens"] = result.get("input_tokens", {})
+        update["source_status"] = {source: status}
+        update["source_errors"] = {source: reason} if status == "failed" else {}
+        return update
+
+    def _abandon(done):
+        """Cancel a branch's future, notifying waiters in as_completed/wait too"""
+        if done.cancel():
+            done.set_running_or_notify_cancel()
+        metrics.inc("branches_abandoned_total", source=source)
+
+    def _settle(latest, done, gather, quorum, start_time, config, handle=None):
+        """Status of a branch once we stop waiting for it"""
+        if quorum is not None:
+            quorum.resolve(source)
+        if done.done() and not done.cancelled():
+            error = done.exception()
+            if error is not None:
+                # Keep what the branch had produced before the failure
+                return _branch_update(latest[0], time.time() - start_time, config, error=error), "failed"
+            result = done.result()
+            # Finishing only at the deadline means its calls were cut short: count it as dropped too
+            status = "dropped" if gather is not None and gather.expired() else "complete"
+        elif quorum is not None and quorum.reached.done() and not (gather is not None and gather.expired()):
+            result, status = latest[0], "late"
+            quorum.mark_late(source, done, handle)
+        else:
+            result, status = latest[0], "dropped"
+        return _branch_update(result, time.time() - start_time, config, status), status
+
+    def run_branch(state: State, config: RunnableConfig) -> State:
+        inputs = {"user_question": state.get("user_question")}
+        with span(f"branch {source}", **{"graph.branch": source}):
+            start_time = time.time()
+            research_deadline = current_deadline()
+            quorum = quorum_of(config)
+            if research_deadline is None and quorum is None:
+                try:
+                    result = branch_graph.invoke(inputs, config)
+                except Exception as e:
+                    return _branch_update({}, time.time() - start_time, config, error=e)
+                return _branch_update(result, time.time() - start_time, config)
+
+            # Stream the branch on its own thread and stop waiting at the gather deadline
+            # (or once the quorum is in), keeping whatever state it had reached by then
+            gather = research_deadline.reserve(synthesis_reserve(research_deadline)) if research_deadline else None
+            latest, done, stop = [{}], concurrent.futures.Future(), threading.Event()
+
+            def consume():
+                try:
+                    with deadline_scope(gather):
+                        for values in branch_graph.stream(inputs, config, stream_mode="values"):
+                            latest[0] = values
+                            if stop.is_set() or (gather is not None and gather.expired()):
+                                _abandon(done)
+                                return
+                    done.set_result(latest[0])
+                except Exception as e:
+                    done.set_exception(e)
+
+            threading.Thread(target=contextvars.copy_context().run, args=(consume,), name=f"{source}-branch", daemon=True).start()
+            waits = [done] + ([quorum.reached] if quorum is not None and quorum.optional(source) else [])
+            concurrent.futures.wait(waits, timeout=gather.remaining() if gather else None, return_when=concurrent.futures.FIRST_COMPLETED)
+            update, status = _settle(latest, done, gather, quorum, start_time, config)
+            if status == "dropped" or (status == "late" and quorum.late_policy == "drop"):
+                stop.set()
+            return update
+
+    async def arun_branch(state: State, config: RunnableConfig) -> State:
+        inputs = {"user_question": state.get("user_question")}
+        with span(f"branch {source}", **{"graph.branch": source}):
+            start_time = time.time()
+            research_deadline = current_deadline()
+            quorum = quorum_of(config)
+            if research_deadline is None and quorum is None:
+                try:
+                    result = await branch_graph.ainvoke(inputs, config)
+                except Exception as e:
+                    return _branch_update({}, time.time() - start_time, config, error=e)
+                return _branch_update(result, time.time() - start_time, config)
+
+            gather = research_deadline.reserve(synthesis_reserve(research_deadline)) if research_deadline else None
+            latest, done = [{}], concurrent.futures.Future()
+
+            async def consume():
+                try:
+                    with deadline_scope(gather):
+                        async for values in branch_graph.astream(inputs, config, stream_mode="values"):
+                            latest[0] = values
+                            if gather is not None and gather.expired():
+                                _abandon(done)
+                                return
+                    done.set_result(latest[0])
+                except asyncio.CancelledError:
+                    _abandon(done)
+                    raise
+                except Exception as e:
+                    done.set_exception(e)
+
+            task = asyncio.ensure_future(consume())
+            waits = [asyncio.wrap_future(done)]
+            # A branch that fails after we stopped waiting for it was already reported as dropped
+            waits[0].add_done_callback(lambda future: future.cancelled() or future.exception())
+            if quorum is not None and quorum.optional(source):
+                waits.append(asyncio.wrap_future(quorum.reached))
+            await asyncio.wait(waits, timeout=gather.remaining() if gather else None, return_when=asyncio.FIRST_COMPLETED)
+            update, status = _settle(latest, done, gather, quorum, start_time, config, handle=task)
+            if status == "dropped" or (status == "late" and quorum.late_policy == "drop"):
+                task.cancel()
+            return update
+
+    from langchain_core.runnables import RunnableLambda
+
+    return RunnableLambda(run_branch, afunc=arun_branch, name=f"{source}_branch")
+
+def report_branch_timings(timings: dict) -> dict:
+    """Summarize per-branch timings and the critical path of a research run.
+
+    The serialized estimate is what the old topology would have cost, where every
+    analysis waited for all searches plus the whole Reddit URL selection/retrieval chain.
+    """
+    branch_times = {source: timings.get(f"{source}_branch", 0.0) for source in BRANCHES}
+    synthesis_time = timings.get("synthesize_results_fast", 0.0)
+    critical_branch = max(branch_times, key=branch_times.get)
+    critical_path = branch_times[critical_branch] + synthesis_time
+
+    serialized_estimate = (
+        max(timings.get(f"{source}_search", 0.0) for source in BRANCHES)
+        + timings.get("analyze_reddit_posts", 0.0)
+        + timings.get("retrieve_reddit_posts", 0.0)
+        + max(timings.get(f"analyze_{source}_results", 0.0) for source in BRANCHES)
+        + synthesis_time
+    )
+
+    for source, elapsed in branch_times.items():
+        marker = " ← critical path" if source == critical_branch else ""
+        print(f"   {source.capitalize():<7} branch: {elapsed:.1f}s{marker}")
+    print(f"   Critical path: {critical_path:.1f}s (serialized join would be ~{serialized_estimate:.1f}s)")
+
     return {
-        "final_answer": final_answer,
-        'messages': [{"role": "assistant", "content": final_answer}]
+        "branches": branch_times,
+        "critical_branch": critical_branch,
+        "critical_path": critical_path,
+        "serialized_estimate": serialized_estimate,
     }
 
 # 🚀 OPTIMIZED: Build faster graph
-graph_builder = StateGraph(State)
+def _build_graph():
+    from langgraph.graph import StateGraph, START, END
+
+    graph_builder = StateGraph(State)
 
-# Search nodes (parallel from start)
-graph_builder.add_node("google_search", google_search)
-graph_builder.add_node("bing_search", bing_search)
-graph_builder.add_node("reddit_search", reddit_search)
+    # One node per source branch (parallel from start)
+    for source in BRANCHES:
+        graph_builder.add_node(f"{source}_branch", _branch_node(source))
+        graph_builder.add_edge(START, f"{source}_branch")
 
-# Reddit processing
-graph_builder.add_node("analyze_reddit_posts", analyze_reddit_posts)
-graph_builder.add_node("retrieve_reddit_posts", retrieve_reddit_posts)
+    # 🚀 NEW: Fast streaming synthesis
+    graph_builder.add_node("synthesize_results_fast", _node("synthesize_results_fast"))
 
-# 🚀 NEW: Single parallel analysis node instead of 3 sequential ones
-graph_builder.add_node("fast_parallel_analysis", fast_parallel_analysis)
+    # Synthesis is the only join: it waits for all three branch nodes (in quorum mode a
+    # branch outside the quorum returns as soon as the quorum is in)
+    graph_builder.add_edge([f"{source}_branch" for source in BRANCHES], "synthesize_results_fast")
 
-# 🚀 NEW: Fast streaming synthesis
-graph_builder.add_node("synthesize_results_fast", synthesize_results_fast)
+    # 🔄 Appends sources that missed the quorum; a no-op otherwise
+    graph_builder.add_node("update_synthesis", _node("update_synthesis"))
+    graph_builder.add_edge("synthesize_results_fast", "update_synthesis")
+    graph_builder.add_edge("update_synthesis", END)
 
-# Edges - optimized flow
-graph_builder.add_edge(START, "google_search")
-graph_builder.add_edge(START, "bing_search")
-graph_builder.add_edge(START, "reddit_search")
+    return graph_builder.compile()
 
-graph_builder.add_edge("google_search", "analyze_reddit_posts")
-graph_builder.add_edge("bing_search", "analyze_reddit_posts")
-graph_builder.add_edge("reddit_search", "analyze_reddit_posts")
-graph_builder.add_edge("analyze_reddit_posts", "retrieve_reddit_posts")
+_graph = None
+_graph_lock = threading.Lock()
 
-# 🚀 NEW: Direct to parallel analysis
-graph_builder.add_edge("retrieve_reddit_posts", "fast_parallel_analysis")
+def get_graph():
+    """The compiled research graph, built on first use (models included, so a
+    missing API key shows up here rather than in the middle of a research)"""
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                get_models()
+                _graph = _build_graph()
+    return _graph
 
-# 🚀 NEW: Direct to fast synthesis
-graph_builder.add_edge("fast_parallel_analysis", "synthesize_results_fast")
-graph_builder.add_edge("synthesize_results_fast", END)
+def __getattr__(name):
+    if name == "graph":
+        return get_graph()
+    if name == "fast_llm":
+        return get_models().fast
+    if name == "main_llm":
+        return get_models().main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def initial_state(question: str) -> State:
+    """Fresh graph input for one research question"""
+    return {
+        "messages": [{"role": "user", "content": question}],
+        "user_question": question,
+        "google_results": None,
+        "bing_results": None,
+        "reddit_results": None,
+        "selected_reddit_urls": None,
+        "reddit_speculation": None,
+        "reddit_post_data": None,
+        "google_analysis": None,
+        "bing_analysis": None,
+        "reddit_analysis": None,
+        "final_answer": None,
+        "timings": {},
+        "input_tokens": {},
+        "source_status": {},
+        "source_errors": {},
+        "synthesis_status": None
+    }
+
+def _first_answer(event: dict) -> bool:
+    """The first complete answer is out: synthesis finished (updates may still follow)"""
+    return event["type"] == "progress" and event["node"] == "synthesize_results_fast" and event["status"] == "end"
+
+def _first_answer_metric(start_time: float) -> dict:
+    elapsed = time.time() - start_time
+    metrics.observe("research_time_to_first_answer_seconds", elapsed)
+    return {"type": "metric", "name": "time_to_first_answer", "value": elapsed}
+
+def _cached_research(question: str, hit: dict, start_time: float) -> List[dict]:
+    """Events of a research answered from the answer cache: the stored answer as one token"""
+    with new_trace("research", question=question) as root:
+        root.set_attribute("research.answer_cache", hit["match"])
+        trace_id = root.trace_id
+    log(f"💾 Answer cache hit ({hit['match']}, similarity {hit['similarity']:.2f}): {hit['question']}")
+    state = initial_state(question)
+    state["final_answer"] = hit["final_answer"]
+    state["answer_cache"] = {key: hit[key] for key in ("match", "similarity", "question", "created_at")}
+    return [
+        {"type": "trace", "trace_id": trace_id},
+        {"type": "metric", "name": "time_to_first_token", "value": time.time() - start_time},
+        {"type": "token", "node": "answer_cache", "source": "synthesis", "text": hit["final_answer"]},
+        _first_answer_metric(start_time),
+        {"type": "final", "state": state},
+    ]
+
+def stream_research(question: str, stream_analyses: bool = False, deadline: float | None = None, use_cache: bool = True):
+    """Run the graph on a worker thread and yield its events as they happen.
+
+    The whole research gets one ``deadline`` in seconds (RESEARCH_DEADLINE by
+    default): every node and BrightData call works with what is left of it, and
+    sources still running when it nears are dropped from the synthesis.
+
+    A question answered before (see answer_cache) skips the graph: its stored
+    answer comes back as a single token, and the final state carries an
+    ``answer_cache`` entry with the match. ``use_cache=False`` always researches.
+
+    Yields dicts with a "type" of:
+      - "trace": the ``trace_id`` every span of this research is recorded under
+      - "progress": a graph node started or finished (``node``, ``status``, and on
+        completion ``elapsed`` seconds and ``payload_bytes``); status "dropped" when a
+        branch missed the deadline, "late" when synthesis started without it (quorum mode)
+      - "token": a chunk of text (``source`` is "synthesis", or a source name when
+        ``stream_analyses`` is on)
+      - "metric": ``name``/``value`` pairs, e.g. time_to_first_token or time_to_first_answer
+        (synthesis done, before any quorum updates) in seconds since the call, or
+        input_tokens of one LLM call (with its ``node``)
+      - "final": the final graph ``state``
+      - "error": the ``error`` that stopped the run
+    Consuming the generator from the caller's thread keeps UI updates (Streamlit) on
+    the thread that owns the UI.
+    """
+    start_time = time.time()
+    load_env()
+    answers = get_answer_cache() if use_cache else None
+    hit = answers.lookup(question) if answers else None
+    if hit is not None:
+        yield from _cached_research(question, hit, start_time)
+        return
+
+    events = queue.Queue()
+    config = {"configurable": {"on_event": events.put, "stream_analyses": stream_analyses, "quorum": quorum_from_env(BRANCHES)}}
+
+    def run():
+        try:
+            # Built before the deadline starts: the first research's setup is not the user's budget
+            graph = get_graph()
+            with new_trace("research", question=question) as root, deadline_scope(research_deadline(deadline)) as budget:
+                root.set_attribute("research.deadline", budget.budget)
+                events.put({"type": "trace", "trace_id": root.trace_id})
+                state = graph.invoke(initial_state(question), config)
+                if answers:
+                    answers.remember(question, state)
+                events.put({"type": "final", "state": state})
+        except Exception as e:
+            events.put({"type": "error", "error": e})
+        finally:
+            events.put(None)
 
-graph = graph_builder.compile()
+    threading.Thread(target=run, name="research", daemon=True).start()
+
+    first_token_time = None
+    while (event := events.get()) is not None:
+        if event["type"] == "token" and event["source"] == "synthesis" and first_token_time is None:
+            first_token_time = time.time() - start_time
+            yield {"type": "metric", "name": "time_to_first_token", "value": first_token_time}
+        yield event
+        if _first_answer(event):
+            yield _first_answer_metric(start_time)
+
+async def astream_research(question: str, stream_analyses: bool = False, deadline: float | None = None, use_cache: bool = True):
+    """Async ``stream_research``: runs graph.ainvoke on the current event loop"""
+    start_time = time.time()
+    load_env()
+    # The answer cache blocks on SQLite: look it up off the event loop
+    answers = await asyncio.to_thread(get_answer_cache) if use_cache else None
+    hit = await asyncio.to_thread(answers.lookup, question) if answers else None
+    if hit is not None:
+        for event in _cached_research(question, hit, start_time):
+            yield event
+        return
+
+    events = asyncio.Queue()
+    config = {"configurable": {"on_event": events.put_nowait, "stream_analyses": stream_analyses, "quorum": quorum_from_env(BRANCHES)}}
+
+    async def run():
+        try:
+            # The first research of the process builds the graph off the event loop, before its deadline starts
+            graph = _graph or await asyncio.to_thread(get_graph)
+            with new_trace("research", question=question) as root, deadline_scope(research_deadline(deadline)) as budget:
+                root.set_attribute("research.deadline", budget.budget)
+                events.put_nowait({"type": "trace", "trace_id": root.trace_id})
+                state = await graph.ainvoke(initial_state(question), config)
+                if answers:
+                    await asyncio.to_thread(answers.remember, question, state)
+                events.put_nowait({"type": "final", "state": state})
+        except Exception as e:
+            events.put_nowait({"type": "error", "error": e})
+        finally:
+            events.put_nowait(None)
+
+    task = asyncio.create_task(run())
+
+    try:
+        first_token_time = None
+        while (event := await events.get()) is not None:
+            if event["type"] == "token" and event["source"] == "synthesis" and first_token_time is None:
+                first_token_time = time.time() - start_time
+                yield {"type": "metric", "name": "time_to_first_token", "value": first_token_time}
+            yield event
+            if _first_answer(event):
+                yield _first_answer_metric(start_time)
+        await task
+    finally:
+        # The consumer went away (e.g. a research server client disconnected): stop the research too
+        if not task.done():
+            task.cancel()
 
 def run_chatbot():
+    # The CLI is a client of the research server (an embedded one unless RESEARCH_SERVER_URL is set)
+    import research_client
+
     print("Welcome to the Multi-Source Chatbot! ⚡ OPTIMIZED VERSION")
     print("Type exit to quit \n")
 
     research_times = []  # Track performance
+    first_token_times = []
 
     while True:
         user_input = input("Ask me anything: ")
@@ -225,40 +1200,52 @@ def run_chatbot():
             if research_times:
                 avg_time = sum(research_times) / len(research_times)
                 print(f"\n📊 Average research time: {avg_time:.1f}s")
+            if first_token_times:
+                avg_ttft = sum(first_token_times) / len(first_token_times)
+                print(f"📊 Average time to first token: {avg_ttft:.1f}s")
             print("Bye!")
             break 
 
-        state = {
-            "messages": [{"role": "user", "content": user_input}],
-            "user_question": user_input,
-            "google_results": None,
-            "bing_results": None,
-            "reddit_results": None,
-            "selected_reddit_urls": None,
-            "reddit_post_data": None,
-            "google_analysis": None,
-            "bing_analysis": None,
-            "reddit_analysis": None,
-            "final_answer": None
-        }
-
         print("\n🔍 Researching your question...")
         start_time = time.time()
         
-        try:
-            final_state = graph.invoke(state)
+        final_state = None
+        trace_id = None
+        for event in research_client.stream_research(user_input, tenant="cli"):
+            if event["type"] == "metric" and event["name"] == "queue_wait" and event["value"] > 0.5:
+                print(f"   ⏳ Queued for {event['value']:.1f}s on the research server")
+            elif event["type"] == "metric" and event["name"] == "time_to_first_token":
+                first_token_times.append(event["value"])
+                print(f"\n⚡ First token after {event['value']:.1f}s\n")
+            elif event["type"] == "progress" and event["status"] == "end" and event["node"] not in ("synthesize_results_fast", "update_synthesis"):
+                print(f"   ✔ {event['node']} ({event['elapsed']:.1f}s, {event['payload_bytes'] / 1024:.1f} KB)")
+            elif event["type"] == "token":
+                # 🚀 Print the answer as it is generated
+                print(event["text"], end="", flush=True)
+            elif event["type"] == "trace":
+                trace_id = event["trace_id"]
+            elif event["type"] == "final":
+                final_state = event["state"]
+            elif event["type"] == "error":
+                print(f"\n❌ Research failed: {event['error']}")
+
+        if final_state is not None:
             total_time = time.time() - start_time
             research_times.append(total_time)
             
-            print(f"\n⚡ Research completed in {total_time:.1f}s")
-            
-            if final_state["final_answer"]:
-                print(f"\n{final_state['final_answer']}")
+            print(f"\n\n⚡ Research completed in {total_time:.1f}s")
+            cached = final_state.get("answer_cache")
+            if cached:
+                print(f"   💾 Answered from cache ({cached['match']} match): {cached['question']}")
             else:
+                report_branch_timings(final_state.get("timings", {}))
+            input_tokens = final_state.get("input_tokens") or {}
+            if input_tokens:
+                print(f"   Input tokens: {sum(input_tokens.values())} across {len(input_tokens)} LLM calls")
+            print(f"   Trace: {trace_id}")
+            
+            if not final_state["final_answer"]:
                 print("\n❌ No answer generated")
-                
-        except Exception as e:
-            print(f"\n❌ Research failed: {e}")
         
         print("-" * 80)
 
@@ -276,5 +1263,18 @@ def ultra_fast_search(state: State) -> State:
         "reddit_results": results.get("reddit_results")
     }
 
+async def aultra_fast_search(state: State) -> State:
+    """Async ultra-fast parallel search"""
+    user_question = state.get("user_question", "")
+    results = await aparallel_search_all_sources(user_question)
+
+    return {
+        "google_results": results.get("google_results"),
+        "bing_results": results.get("bing_results"),
+        "reddit_results": results.get("reddit_results")
+    }
+
 if __name__ == "__main__":
+    # The embedded research server imports ``main``: let it find this module instead of loading a second copy
+    sys.modules.setdefault("main", sys.modules[__name__])
     run_chatbot()
@@ -0,0 +1,411 @@
+"""Offline backend: local fakes for BrightData and the chat models.
+
+Set ``RESEARCH_BACKEND=offline`` and every BrightData call (SERP request, dataset
+trigger, progress, snapshot download) is answered in-process from the JSON
+fixtures in ``fixtures/offline`` (or ``OFFLINE_FIXTURES_DIR``), and the chat models
+become deterministic fakes. The whole graph then runs without network or API keys.
+
+``RESEARCH_BACKEND=record`` talks to the real API and writes every successful
+BrightData response back into the fixture directory, so a live run can be
+replayed offline later.
+
+Latency and failures can be injected per endpoint; everything is seeded so the
+same configuration gives the same run.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, AsyncIterator, List, Optional, Tuple
+
+import requests
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from http_client import AsyncResponse, BrightDataClient
+from snapshot_stream import RecordParser
+
+DEFAULT_FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "offline"
+
+REDDIT_SEARCH_DATASET = "gd_lvz8ah06191smkebj4"
+REDDIT_POSTS_DATASET = "gd_lvzdpsdlw09j6t702"
+
+# Which fixture a dataset snapshot replays
+DATASET_FIXTURES = {
+    REDDIT_SEARCH_DATASET: "reddit_search",
+    REDDIT_POSTS_DATASET: "reddit_posts",
+}
+# Download formats served one JSON record per line
+NDJSON_FORMATS = ("ndjson", "jsonl")
+
+
+def backend() -> str:
+    """"live" (default), "offline" or "record", from RESEARCH_BACKEND"""
+    return os.getenv("RESEARCH_BACKEND", "live").strip().lower() or "live"
+
+
+def offline_enabled() -> bool:
+    return backend() == "offline"
+
+
+def fixtures_dir() -> Path:
+    return Path(os.getenv("OFFLINE_FIXTURES_DIR") or DEFAULT_FIXTURES_DIR)
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _serp_engine(json_body: Optional[Dict[str, Any]]) -> str:
+    url = (json_body or {}).get("url", "")
+    return "bing" if "bing.com" in url else "google"
+
+
+class FaultInjector:
+    """Seeded latency and failure injection, configurable per endpoint.
+
+    Base values come from OFFLINE_LATENCY / OFFLINE_FAILURE_RATE / OFFLINE_THROTTLE_RATE
+    and can be overridden per endpoint with an _<ENDPOINT> suffix (e.g.
+    OFFLINE_LATENCY_TRIGGER=0.8). OFFLINE_JITTER adds up to that fraction of random
+    extra latency. Each call draws from its own seeded RNG, so a run is reproducible
+    regardless of thread scheduling.
+    """
+
+    def __init__(
+        self,
+        latency: Optional[float] = None,
+        failure_rate: Optional[float] = None,
+        jitter: Optional[float] = None,
+        seed: Optional[int] = None,
+        prefix: str = "OFFLINE",
+    ):
+        self.prefix = prefix
+        self.latency = _env_float(f"{prefix}_LATENCY", 0.0) if latency is None else latency
+        self.failure_rate = _env_float(f"{prefix}_FAILURE_RATE", 0.0) if failure_rate is None else failure_rate
+        self.jitter = _env_float(f"{prefix}_JITTER", 0.0) if jitter is None else jitter
+        self.throttle_rate = _env_float(f"{prefix}_THROTTLE_RATE", 0.0)
+        self.seed = int(os.getenv("OFFLINE_SEED", 0)) if seed is None else seed
+        self._counters: Dict[str, Iterator[int]] = {}
+        self._lock = threading.Lock()
+
+    def _rng(self, endpoint: str) -> random.Random:
+        with self._lock:
+            counter = self._counters.setdefault(endpoint, itertools.count())
+            call = next(counter)
+        return random.Random(f"{self.seed}:{endpoint}:{call}")
+
+    def plan(self, endpoint: str) -> Tuple[float, bool]:
+        """(delay in seconds, whether this call fails) for the next call to ``endpoint``"""
+        delay, fail, _ = self.plan_throttled(endpoint)
+        return delay, fail
+
+    def plan_throttled(self, endpoint: str) -> Tuple[float, bool, bool]:
+        """``plan`` plus whether the call is throttled (answered 429)"""
+        name = endpoint.upper()
+        latency = _env_float(f"{self.prefix}_LATENCY_{name}", self.latency)
+        failure_rate = _env_float(f"{self.prefix}_FAILURE_RATE_{name}", self.failure_rate)
+        throttle_rate = _env_float(f"{self.prefix}_THROTTLE_RATE_{name}", self.throttle_rate)
+        rng = self._rng(endpoint)
+        delay = latency * (1 + self.jitter * rng.random())
+        fail = rng.random() < failure_rate
+        return delay, fail, not fail and rng.random() < throttle_rate
+
+
+class OfflineBrightDataClient(BrightDataClient):
+    """Drop-in ``BrightDataClient`` answering every endpoint from fixtures.
+
+    Snapshots report "running" for ``snapshot_polls`` progress checks before turning
+    "ready" (OFFLINE_SNAPSHOT_POLLS, default 1). Injected failures come back as HTTP 503,
+    throttled calls as HTTP 429 with a Retry-After of OFFLINE_RETRY_AFTER seconds;
+    an injected delay longer than the call's read timeout raises a timeout, like the
+    real client would.
+    """
+
+    def __init__(
+        self,
+        fixtures: Optional[Path] = None,
+        faults: Optional[FaultInjector] = None,
+        snapshot_polls: Optional[int] = None,
+    ):
+        super().__init__(api_key="offline", base_url="http://offline.invalid")
+        self.fixtures = Path(fixtures or fixtures_dir())
+        self.faults = faults or FaultInjector()
+        self.snapshot_polls = int(os.getenv("OFFLINE_SNAPSHOT_POLLS", 1)) if snapshot_polls is None else snapshot_polls
+        self.calls: Dict[str, int] = {}
+        self._fixture_cache: Dict[str, Any] = {}
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._snapshot_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def fixture(self, name: str) -> Any:
+        if name not in self._fixture_cache:
+            with open(self.fixtures / f"{name}.json", encoding="utf-8") as f:
+                self._fixture_cache[name] = json.load(f)
+        return self._fixture_cache[name]
+
+    def _snapshot_payload(self, snapshot: Dict[str, Any]) -> Any:
+        data = self.fixture(DATASET_FIXTURES.get(snapshot["dataset_id"], "reddit_search"))
+        urls = snapshot["urls"]
+        if urls and snapshot["dataset_id"] == REDDIT_POSTS_DATASET:
+            # Only the comments of the requested posts, if the fixture has them
+            matching = [item for item in data if item.get("post_url") in urls]
+            return matching or data
+        return data
+
+    def respond(self, method: str, endpoint: str, snapshot_id: Optional[str] = None, **kwargs) -> Tuple[int, Any]:
+        """(status code, JSON payload) for one call, without latency or failures"""
+        if endpoint == "request":
+            return 200, self.fixture(f"serp_{_serp_engine(kwargs.get('json'))}")
+
+        if endpoint == "trigger":
+            dataset_id = (kwargs.get("params") or {}).get("dataset_id")
+            inputs = kwargs.get("json") or []
+            with self._lock:
+                snapshot_id = f"offline_{next(self._snapshot_ids)}"
+                self._snapshots[snapshot_id] = {
+                    "dataset_id": dataset_id,
+                    "urls": [item.get("url") for item in inputs if isinstance(item, dict) and item.get("url")],
+                    "polls": 0,
+                }
+            return 200, {"snapshot_id": snapshot_id}
+
+        snapshot = self._snapshots.get(snapshot_id)
+        if snapshot is None:
+            return 404, {"error": f"unknown snapshot {snapshot_id}"}
+
+        if endpoint == "progress":
+            with self._lock:
+                snapshot["polls"] += 1
+                ready = snapshot["polls"] > self.snapshot_polls
+            return 200, {"status": "ready" if ready else "running"}
+
+        if endpoint == "snapshot":
+            return 200, self._snapshot_payload(snapshot)
+
+        return 404, {"error": f"unknown endpoint {endpoint}"}
+
+    def _prepare(self, endpoint: str, timeout: Optional[float]) -> Tuple[float, Optional[int], float]:
+        """(delay, injected error status or None, read timeout) for one call"""
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        delay, fail, throttled = self.faults.plan_throttled(endpoint)
+        _, read_timeout = self.timeout_for(endpoint, timeout)
+        return delay, 503 if fail else 429 if throttled else None, read_timeout
+
+    def _response(self, method, endpoint, fail, snapshot_id, kwargs) -> AsyncResponse:
+        path_params = {"snapshot_id": snapshot_id} if snapshot_id else {}
+        url = self.url(endpoint, **path_params)
+        if fail == 429:
+            headers = {"Content-Type": "application/json", "Retry-After": os.getenv("OFFLINE_RETRY_AFTER", "1")}
+            return AsyncResponse(url, 429, headers, json.dumps({"error": "injected throttling"}).encode())
+        if fail:
+            status, payload = 503, {"error": "injected failure"}
+        else:
+            status, payload = self.respond(method, endpoint, snapshot_id=snapshot_id, **kwargs)
+        if endpoint == "snapshot" and status == 200 and (kwargs.get("params") or {}).get("format") in NDJSON_FORMATS:
+            body = "".join(json.dumps(record) + "\n" for record in payload)
+            return AsyncResponse(url, status, {"Content-Type": "application/x-ndjson"}, body.encode())
+        return AsyncResponse(url, status, {"Content-Type": "application/json"}, json.dumps(payload).encode())
+
+    def _send(self, method: str, endpoint: str, timeout: Optional[float] = None, snapshot_id: Optional[str] = None, **kwargs):
+        delay, fail, read_timeout = self._prepare(endpoint, timeout)
+        if delay > read_timeout:
+            time.sleep(read_timeout)
+            raise requests.exceptions.ReadTimeout(f"offline {endpoint} timed out after {read_timeout:.1f}s")
+        time.sleep(delay)
+        return self._response(method, endpoint, fail, snapshot_id, kwargs)
+
+    async def _asend(self, method: str, endpoint: str, timeout: Optional[float] = None, snapshot_id: Optional[str] = None, **kwargs):
+        delay, fail, read_timeout = self._prepare(endpoint, timeout)
+        if delay > read_timeout:
+            await asyncio.sleep(read_timeout)
+            raise asyncio.TimeoutError(f"offline {endpoint} timed out after {read_timeout:.1f}s")
+        await asyncio.sleep(delay)
+        return self._response(method, endpoint, fail, snapshot_id, kwargs)
+
+    async def aclose(self):
+        pass
+
+
+class RecordingBrightDataClient(BrightDataClient):
+    """Live client that saves successful responses as offline fixtures.
+
+    SERP responses go to serp_<engine>.json and snapshot downloads to the fixture of
+    their dataset; the last response of each kind wins.
+    """
+
+    def __init__(self, fixtures: Optional[Path] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.fixtures = Path(fixtures or fixtures_dir())
+        self._datasets: Dict[str, str] = {}
+
+    def _record(self, endpoint: str, response, snapshot_id: Optional[str], kwargs: Dict[str, Any]):
+        if response.status_code >= 400:
+            return
+        try:
+            payload = response.json()
+        except ValueError:
+            if endpoint != "snapshot":
+                return
+            parser = RecordParser()  # NDJSON download: fixtures are stored as JSON arrays
+            payload = parser.feed(response.content) + parser.close()
+
+        if endpoint == "request":
+            name = f"serp_{_serp_engine(kwargs.get('json'))}"
+        elif endpoint == "trigger":
+            dataset_id = (kwargs.get("params") or {}).get("dataset_id")
+            if isinstance(payload, dict) and payload.get("snapshot_id"):
+                self._datasets[payload["snapshot_id"]] = dataset_id
+            return
+        elif endpoint == "snapshot" and snapshot_id in self._datasets:
+            name = DATASET_FIXTURES.get(self._datasets.pop(snapshot_id))
+        else:
+            return
+
+        if name:
+            self.fixtures.mkdir(parents=True, exist_ok=True)
+            with open(self.fixtures / f"{name}.json", "w", encoding="utf-8") as f:
+                json.dump(payload, f, indent=2, ensure_ascii=False)
+            print(f"📼 Recorded {name} fixture")
+
+    def _send(self, method: str, endpoint: str, timeout: Optional[float] = None, snapshot_id: Optional[str] = None, **kwargs):
+        kwargs.pop("stream", None)  # read recorded bodies in full
+        response = super()._send(method, endpoint, timeout=timeout, snapshot_id=snapshot_id, **kwargs)
+        self._record(endpoint, response, snapshot_id, kwargs)
+        return response
+
+    async def _asend(self, method: str, endpoint: str, timeout: Optional[float] = None, snapshot_id: Optional[str] = None, **kwargs):
+        kwargs.pop("stream", None)
+        response = await super()._asend(method, endpoint, timeout=timeout, snapshot_id=snapshot_id, **kwargs)
+        self._record(endpoint, response, snapshot_id, kwargs)
+        return response
+
+
+def _message_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+
+
+class OfflineChatModel(BaseChatModel):
+    """Deterministic stand-in for a chat model.
+
+    The answer is built from the prompt itself (question plus a digest of the source
+    lines it was given), so the same input always yields the same output. Supports
+    invoke/stream in sync and async form and ``with_structured_output`` for the
+    Reddit URL selection. Latency: OFFLINE_LLM_LATENCY before the first token,
+    OFFLINE_LLM_TOKEN_LATENCY per streamed token; OFFLINE_LLM_FAILURE_RATE makes calls
+    raise.
+    """
+
+    model_name: str = "offline"
+    first_token_latency: Optional[float] = None
+    token_latency: Optional[float] = None
+    faults: Any = None
+
+    def model_post_init(self, __context: Any) -> None:
+        if self.first_token_latency is None:
+            self.first_token_latency = _env_float("OFFLINE_LLM_LATENCY", 0.0)
+        if self.token_latency is None:
+            self.token_latency = _env_float("OFFLINE_LLM_TOKEN_LATENCY", 0.0)
+        if self.faults is None:
+            self.faults = FaultInjector(latency=0.0, prefix="OFFLINE_LLM")
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        prompt = _message_text(messages[-1]) if messages else ""
+        question = next(
+            (line.split(":", 1)[1].strip() for line in prompt.splitlines() if line.startswith(("Question:", "User Question:"))),
+            "",
+        )
+        lines = [line.strip() for line in prompt.splitlines() if line.strip().startswith(("-", "1.", "2.", "3."))]
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:8]
+        highlights = "\n".join(f"- {line.lstrip('-0123456789. ')[:120]}" for line in lines[:3])
+        return (
+            f"Offline {self.model_name} response ({digest}) to: {question or 'the request'}\n"
+            f"Drawing on {len(lines)} source lines.\n{highlights}"
+        ).strip()
+
+    def _check_failure(self):
+        _, fail = self.faults.plan(self.model_name)
+        if fail:
+            raise RuntimeError(f"injected {self.model_name} failure")
+
+    def _tokens(self, text: str) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", text)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        self._check_failure()
+        text = self._answer(messages)
+        time.sleep(self.first_token_latency + self.token_latency * len(self._tokens(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        self._check_failure()
+        text = self._answer(messages)
+        await asyncio.sleep(self.first_token_latency + self.token_latency * len(self._tokens(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        self._check_failure()
+        time.sleep(self.first_token_latency)
+        for token in self._tokens(self._answer(messages)):
+            time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        self._check_failure()
+        await asyncio.sleep(self.first_token_latency)
+        for token in self._tokens(self._answer(messages)):
+            await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    def with_structured_output(self, schema, **kwargs):
+        """Fill every list field of ``schema`` with the first three URLs found in the prompt"""
+        list_fields = [name for name, field in schema.model_fields.items() if getattr(field.annotation, "__origin__", None) is list]
+
+        def _structured(messages) -> Any:
+            self._check_failure()
+            prompt = "\n".join(
+                message["content"] if isinstance(message, dict) else _message_text(message) for message in messages
+            )
+            urls = list(dict.fromkeys(re.findall(r"https?://[^\s'\",)\]]+", prompt)))[:3]
+            return schema(**{name: urls for name in list_fields})
+
+        def invoke(messages) -> Any:
+            time.sleep(self.first_token_latency)
+            return _structured(messages)
+
+        async def ainvoke(messages) -> Any:
+            await asyncio.sleep(self.first_token_latency)
+            return _structured(messages)
+
+        return RunnableLambda(invoke, afunc=ainvoke, name=f"{self.model_name}_structured")
+
+
+def chat_models() -> Tuple[OfflineChatModel, OfflineChatModel]:
+    """(fast, main) offline chat models mirroring gpt-4o-mini / gpt-4o"""
+    return OfflineChatModel(model_name="offline-gpt-4o-mini"), OfflineChatModel(model_name="offline-gpt-4o")
+
+
+def default_client() -> BrightDataClient:
+    """The BrightData client for the configured backend"""
+    mode = backend()
+    if mode == "offline":
+        print("🧪 Offline backend: BrightData calls are answered from fixtures")
+        return OfflineBrightDataClient()
+    if mode == "record":
+        print(f"📼 Record backend: saving BrightData responses to {fixtures_dir()}")
+        return RecordingBrightDataClient()
+    return BrightDataClient()
@@ -0,0 +1,171 @@
+"""Micro-batching of Reddit post retrieval across concurrent sessions.
+
+Every research session that wants comments for a few post URLs joins the open
+batch instead of triggering the comments dataset on its own. A batch is flushed
+REDDIT_BATCH_WINDOW seconds after its first request, or as soon as it holds
+REDDIT_BATCH_MAX distinct URLs. One trigger then covers all of them (duplicates
+removed), and the downloaded comments are handed back to each requester by post
+URL.
+
+Batches only mix requests with the same retrieval options (days_ago, replies,
+comment limit), since those apply per input. The trigger itself goes through the
+snapshot manager, so batching is on whenever the manager is, unless
+REDDIT_BATCH_DISABLED=1.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from deadline import Deadline
+from rate_limiter import DEFAULT_PRIORITY, request_priority
+from snapshot_manager import get_snapshot_manager, snapshot_manager_enabled
+from snapshot_stream import RecordReducer
+from telemetry import log, metrics
+
+DEFAULT_WINDOW = 0.15
+DEFAULT_MAX_BATCH = 20
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_post_url(url: Optional[str]) -> str:
+    """Comparable form of a post URL: no scheme, www/old prefix, query or trailing slash"""
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    for prefix in ("www.", "old.", "new."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return f"{host}{parts.path.rstrip('/')}".lower()
+
+
+def post_url_of(item: Dict[str, Any]) -> str:
+    """Which post a downloaded comment belongs to, as a normalized URL ("" if unknown)"""
+    source = item.get("input") if isinstance(item.get("input"), dict) else {}
+    return normalize_post_url(source.get("url") or item.get("post_url"))
+
+
+class _Request:
+    def __init__(self, urls: List[str], deadline: Deadline):
+        self.urls = urls
+        self.deadline = deadline
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+
+
+class _Batch:
+    def __init__(self, options: Tuple):
+        self.options = options
+        self.requests: List[_Request] = []
+        self.urls: Dict[str, str] = {}  # normalized -> first spelling seen
+        self.timer: Optional[threading.Timer] = None
+        self.opened = time.monotonic()
+
+
+class PostBatcher:
+    """Collects post URL requests for a short window and retrieves them with one trigger"""
+
+    def __init__(
+        self,
+        build_request: Callable[[List[str], int, bool, int], Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+        window: Optional[float] = None,
+        max_batch: Optional[int] = None,
+        reducer: Optional[RecordReducer] = None,
+    ):
+        self.build_request = build_request
+        self.reducer = reducer
+        self.window = float(os.getenv("REDDIT_BATCH_WINDOW", DEFAULT_WINDOW)) if window is None else window
+        self.max_batch = max_batch or int(os.getenv("REDDIT_BATCH_MAX", DEFAULT_MAX_BATCH))
+        self._open: Dict[Tuple, _Batch] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, urls: List[str], days_ago: int, load_all_replies: bool, comment_limit: int, deadline: Deadline) -> concurrent.futures.Future:
+        """Future of the raw comments for ``urls`` (None if the retrieval failed)"""
+        options = (days_ago, load_all_replies, comment_limit)
+        request = _Request(list(urls), deadline)
+        with self._lock:
+            batch = self._open.get(options)
+            if batch is None:
+                batch = self._open[options] = _Batch(options)
+                batch.timer = threading.Timer(self.window, self._flush, args=(batch,))
+                batch.timer.daemon = True
+                batch.timer.start()
+            batch.requests.append(request)
+            for url in urls:
+                key = normalize_post_url(url)
+                if key in batch.urls:
+                    metrics.inc("reddit_post_urls_deduplicated_total")
+                else:
+                    batch.urls[key] = url
+            full = len(batch.urls) >= self.max_batch
+
+        if full:
+            self._flush(batch)
+        return request.future
+
+    def fetch(self, urls, days_ago, load_all_replies, comment_limit, deadline: Deadline) -> Optional[List[Dict[str, Any]]]:
+        future = self.submit(urls, days_ago, load_all_replies, comment_limit, deadline)
+        try:
+            return future.result(timeout=deadline.remaining())
+        except concurrent.futures.TimeoutError:
+            log("⏰ Batched Reddit post retrieval timed out", level="warning")
+            return None
+
+    async def afetch(self, urls, days_ago, load_all_replies, comment_limit, deadline: Deadline) -> Optional[List[Dict[str, Any]]]:
+        future = self.submit(urls, days_ago, load_all_replies, comment_limit, deadline)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), deadline.remaining())
+        except asyncio.TimeoutError:
+            log("⏰ Batched Reddit post retrieval timed out", level="warning")
+            return None
+
+    def _flush(self, batch: _Batch):
+        with self._lock:
+            if self._open.get(batch.options) is not batch:
+                return  # already flushed (timer and max size raced)
+            del self._open[batch.options]
+        if batch.timer is not None:
+            batch.timer.cancel()
+
+        urls = list(batch.urls.values())
+        metrics.inc("reddit_post_batches_total")
+        metrics.observe("reddit_post_batch_urls", len(urls))
+        metrics.observe("reddit_post_batch_requesters", len(batch.requests))
+        log(f"📦 Batched {len(batch.requests)} post requests into one trigger for {len(urls)} URLs")
+
+        params, data = self.build_request(urls, *batch.options)
+        deadline = Deadline(max(request.deadline.remaining() for request in batch.requests))
+        # A batch mixes requesters, so it never inherits a speculative flusher's priority
+        with request_priority(DEFAULT_PRIORITY):
+            future = get_snapshot_manager().submit(params, data, deadline, operation_name="Reddit posts (batched)", reducer=self.reducer)
+        future.add_done_callback(lambda done: self._fan_out(batch, done))
+
+    def _fan_out(self, batch: _Batch, done: concurrent.futures.Future):
+        """Give each requester the comments of its own posts"""
+        raw_data = done.result() if not done.exception() else None
+        if raw_data is None:
+            for request in batch.requests:
+                request.future.set_result(None)
+            return
+
+        by_post: Dict[str, List[Dict[str, Any]]] = {}
+        for item in raw_data:
+            if isinstance(item, dict):
+                by_post.setdefault(post_url_of(item), []).append(item)
+
+        attributable = any(key for key in by_post)
+        for request in batch.requests:
+            if not attributable or len(batch.requests) == 1:
+                # Comments carry no post URL (or nobody to share with): everything goes to everyone
+                request.future.set_result(raw_data)
+                continue
+            wanted = {normalize_post_url(url) for url in request.urls}
+            request.future.set_result([item for key in wanted for item in by_post.get(key, [])])
+
+
+def post_batching_enabled() -> bool:
+    return snapshot_manager_enabled() and os.getenv("REDDIT_BATCH_DISABLED", "").lower() not in ("1", "true", "yes")
@@ -0,0 +1,104 @@
+"""Local relevance ranking of Reddit search results.
+
+Picks the posts worth retrieving comments for without an LLM round-trip: BM25
+over each post's title and subreddit, blended with an engagement prior
+(log of score + comments). Twelve posts rank in well under a millisecond.
+
+The LLM selector is still available with REDDIT_URL_SELECTOR=llm;
+``benchmarks/ranker_agreement.py`` measures how often the two agree.
+"""
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+from reddit_records import RedditPost
+
+# Only the first three selected posts are retrieved downstream
+DEFAULT_TOP_K = 3
+# Share of the final score that comes from engagement rather than text match
+DEFAULT_ENGAGEMENT_WEIGHT = 0.3
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset(
+    """a about an and are as at be best by can do does for from how i in is it me my of on or
+    should so than that the their there these this to vs was what when where which who why will
+    with would you your""".split()
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str, stopwords: frozenset = STOPWORDS) -> List[str]:
+    """Lowercased word tokens without stopwords, with a plural 's' stripped"""
+    tokens = []
+    for token in _TOKEN.findall((text or "").lower()):
+        if token in stopwords:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _document(post: RedditPost) -> List[str]:
+    subreddit = (post.subreddit or "").replace("_", " ")
+    return tokenize(post.title or "") + tokenize(subreddit)
+
+
+def _engagement(post: RedditPost) -> float:
+    return math.log1p(max(0, post.score) + max(0, post.num_comments))
+
+
+def bm25_scores(query: Sequence[str], documents: Sequence[Sequence[str]]) -> List[float]:
+    """Okapi BM25 of ``query`` against each tokenized document, IDF taken from the documents themselves"""
+    if not documents:
+        return []
+    average_length = sum(len(document) for document in documents) / len(documents) or 1.0
+    frequencies = Counter(term for document in documents for term in set(document))
+    scores = []
+    for document in documents:
+        counts = Counter(document)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(document) / average_length)
+        score = 0.0
+        for term in set(query):
+            tf = counts.get(term)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(documents) - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def rank_posts(question: str, posts: Sequence[RedditPost], engagement_weight: Optional[float] = None) -> List[RedditPost]:
+    """Posts ordered by blended text relevance and engagement, best first"""
+    posts = [post for post in posts if post.url]
+    if not posts:
+        return []
+    if engagement_weight is None:
+        engagement_weight = float(os.getenv("REDDIT_RANKER_ENGAGEMENT_WEIGHT", DEFAULT_ENGAGEMENT_WEIGHT))
+
+    relevance = bm25_scores(tokenize(question), [_document(post) for post in posts])
+    engagement = [_engagement(post) for post in posts]
+    top_relevance = max(relevance) or 1.0
+    top_engagement = max(engagement) or 1.0
+
+    scored = [
+        ((1 - engagement_weight) * rel / top_relevance + engagement_weight * eng / top_engagement, -index, post)
+        for index, (rel, eng, post) in enumerate(zip(relevance, engagement, posts))
+    ]
+    scored.sort(key=lambda item: item[:2], reverse=True)
+    return [post for _, _, post in scored]
+
+
+def select_post_urls(question: str, reddit_results: Dict[str, Any], k: int = DEFAULT_TOP_K) -> List[str]:
+    """URLs of the ``k`` posts most worth retrieving for ``question``"""
+    posts = (reddit_results or {}).get("parsed_data") or []
+    return [post.url for post in rank_posts(question, posts)[:k]]
+
+
+def llm_selection_enabled() -> bool:
+    return os.getenv("REDDIT_URL_SELECTOR", "local").lower() == "llm"
@@ -0,0 +1,178 @@
+"""Speculative Reddit post retrieval.
+
+Post retrieval normally waits for the keyword search and then for URL selection,
+so the Reddit branch is two snapshot latencies deep plus a selector call. With
+speculation, the top REDDIT_SPECULATION_K posts by engagement (the order
+``reddit_search_api`` already returns them in) are submitted for retrieval as
+soon as the search returns, while the selector is still choosing. Retrieval then
+keeps the speculated comments for the posts the selector confirmed, fetches only
+the posts it did not guess, and drops the rest.
+
+Waste is capped two ways: at most REDDIT_SPECULATION_MAX_INFLIGHT speculative
+retrievals run at once, and when more than REDDIT_SPECULATION_MAX_WASTE of the
+recently speculated URLs went unused, only one session in PROBE_EVERY speculates
+until the hit rate recovers.
+
+REDDIT_SPECULATION=auto (the default) speculates only with the LLM selector,
+whose round-trip it hides; the local ranker picks in microseconds, so speculating
+ahead of it would only add triggers. ``on``/``off`` force it either way.
+Speculation needs the snapshot manager, which lets a trigger start without
+blocking the caller.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from deadline import Deadline
+from post_batcher import normalize_post_url, post_url_of
+from reddit_records import RedditPost
+from telemetry import log, metrics
+
+DEFAULT_K = 3
+DEFAULT_MAX_INFLIGHT = 8
+DEFAULT_MAX_WASTE = 0.5
+# Speculated URLs the hit rate is computed over
+WINDOW = 100
+# Fewer samples than this and the waste cap does not apply yet
+MIN_SAMPLES = 20
+# While over the waste cap, every PROBE_EVERY-th session still speculates
+PROBE_EVERY = 10
+
+
+def speculation_enabled(llm_selection: bool) -> bool:
+    mode = os.getenv("REDDIT_SPECULATION", "auto").lower()
+    if mode in ("1", "on", "true", "yes"):
+        return True
+    if mode in ("0", "off", "false", "no"):
+        return False
+    return llm_selection
+
+
+class Speculation:
+    """One session's speculative retrieval, waiting to be confirmed by the selector"""
+
+    def __init__(self, urls: List[str], future: concurrent.futures.Future, speculator: "PostSpeculator"):
+        self.urls = urls
+        self.future = future
+        self.keys = {normalize_post_url(url) for url in urls}
+        self._speculator = speculator
+        self._settled = False
+
+    def split(self, urls: List[str]) -> Tuple[List[str], List[str]]:
+        """(URLs the speculation covers, URLs that still need their own retrieval)"""
+        confirmed = [url for url in urls if normalize_post_url(url) in self.keys]
+        return confirmed, [url for url in urls if normalize_post_url(url) not in self.keys]
+
+    def settle(self, selected_urls: List[str]):
+        """Count hits and waste against what the selector actually picked (once)"""
+        if self._settled:
+            return
+        self._settled = True
+        selected = {normalize_post_url(url) for url in selected_urls}
+        hits = len(self.keys & selected)
+        self._speculator.record(hits, len(self.keys) - hits, len(selected - self.keys))
+
+    def _keep(self, raw_data: Optional[List[Dict[str, Any]]], confirmed: List[str]) -> Optional[List[Dict[str, Any]]]:
+        if raw_data is None:
+            return None
+        wanted = {normalize_post_url(url) for url in confirmed}
+        by_post = [(post_url_of(item), item) for item in raw_data if isinstance(item, dict)]
+        if not any(key for key, _ in by_post):
+            return raw_data  # comments carry no post URL: nothing to filter on
+        return [item for key, item in by_post if key in wanted]
+
+    def result(self, confirmed: List[str], deadline: Deadline) -> Optional[List[Dict[str, Any]]]:
+        """Speculated comments of the confirmed posts (None if the retrieval failed or ran out of time)"""
+        try:
+            return self._keep(self.future.result(timeout=deadline.remaining()), confirmed)
+        except concurrent.futures.TimeoutError:
+            log("⏰ Speculative post retrieval not ready in time", level="warning")
+            return None
+
+    async def aresult(self, confirmed: List[str], deadline: Deadline) -> Optional[List[Dict[str, Any]]]:
+        try:
+            raw_data = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self.future)), deadline.remaining())
+        except asyncio.TimeoutError:
+            log("⏰ Speculative post retrieval not ready in time", level="warning")
+            return None
+        return self._keep(raw_data, confirmed)
+
+
+class PostSpeculator:
+    """Starts speculative retrievals within the in-flight and waste caps, and keeps the hit statistics"""
+
+    def __init__(
+        self,
+        submit: Callable[..., concurrent.futures.Future],
+        k: Optional[int] = None,
+        max_inflight: Optional[int] = None,
+        max_waste: Optional[float] = None,
+    ):
+        self.submit = submit
+        self.k = k or int(os.getenv("REDDIT_SPECULATION_K", DEFAULT_K))
+        self.max_inflight = max_inflight or int(os.getenv("REDDIT_SPECULATION_MAX_INFLIGHT", DEFAULT_MAX_INFLIGHT))
+        self.max_waste = float(os.getenv("REDDIT_SPECULATION_MAX_WASTE", DEFAULT_MAX_WASTE)) if max_waste is None else max_waste
+        self._outcomes: collections.deque = collections.deque(maxlen=WINDOW)  # True = speculated URL was used
+        self._inflight = 0
+        self._skipped = 0
+        self._lock = threading.Lock()
+
+    def waste_ratio(self) -> float:
+        with self._lock:
+            return self._waste_ratio()
+
+    def _waste_ratio(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return 1 - sum(self._outcomes) / len(self._outcomes)
+
+    def _admit(self) -> Optional[str]:
+        """None if a speculation may start, else the reason it may not"""
+        with self._lock:
+            if self._inflight >= self.max_inflight:
+                return "skipped_inflight"
+            if len(self._outcomes) >= MIN_SAMPLES and self._waste_ratio() > self.max_waste:
+                self._skipped += 1
+                if self._skipped % PROBE_EVERY:
+                    return "skipped_waste"
+            self._inflight += 1
+            return None
+
+    def _done(self, _future):
+        with self._lock:
+            self._inflight -= 1
+
+    def start(self, posts: List[RedditPost], *options: Any, deadline: Deadline) -> Optional[Speculation]:
+        """Submit retrieval of the top-K posts; None when there is nothing to do or a cap applies"""
+        urls = [post.url for post in posts if post.url][: self.k]
+        if not urls:
+            return None
+        refused = self._admit()
+        if refused:
+            metrics.inc("reddit_speculations_total", outcome=refused)
+            return None
+
+        future = self.submit(urls, *options, deadline=deadline)
+        future.add_done_callback(self._done)
+        metrics.inc("reddit_speculations_total", outcome="started")
+        log(f"🔮 Speculatively retrieving the top {len(urls)} Reddit posts")
+        return Speculation(urls, future, self)
+
+    def record(self, hits: int, wasted: int, missed: int):
+        with self._lock:
+            self._outcomes.extend([True] * hits + [False] * wasted)
+            ratio = 1 - self._waste_ratio()
+        metrics.inc("reddit_speculated_urls_total", hits, outcome="hit")
+        metrics.inc("reddit_speculated_urls_total", wasted, outcome="wasted")
+        metrics.inc("reddit_speculation_missed_urls_total", missed)
+        metrics.set("reddit_speculation_hit_ratio", ratio)
+        log(f"🔮 Speculation: {hits} hit, {wasted} wasted, {missed} not guessed (hit ratio {ratio:.0%})")
+
+
+metrics.describe("reddit_speculations_total", "Speculative post retrievals started or skipped, by outcome")
+metrics.describe("reddit_speculated_urls_total", "Speculatively retrieved post URLs the selector confirmed (hit) or not (wasted)")
+metrics.describe("reddit_speculation_missed_urls_total", "Selected post URLs the speculation did not cover")
+metrics.describe("reddit_speculation_hit_ratio", "Share of recently speculated post URLs that were used")
@@ -0,0 +1,153 @@
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional, falls back to a chars/4 estimate
+    tiktoken = None
+
+# Token budget per source payload rendered into a prompt,
+# overridable with PROMPT_BUDGET_<SOURCE>=tokens
+DEFAULT_TOKEN_BUDGETS = {
+    "google": 1200,
+    "bing": 1200,
+    "reddit_posts": 600,
+    "reddit_comments": 1800,
+}
+
+# Longest snippet/comment kept before the budget is even considered
+MAX_TEXT_CHARS = 400
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o / gpt-4o-mini
+        except Exception:
+            _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when available, ~4 chars per token otherwise"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Input tokens of a chat message list (content plus a small per-message overhead)"""
+    return sum(count_tokens(str(message.get("content", ""))) + 4 for message in messages)
+
+
+def token_budget(source: str) -> int:
+    value = os.getenv(f"PROMPT_BUDGET_{source.upper()}")
+    return int(value) if value else DEFAULT_TOKEN_BUDGETS[source]
+
+
+def _clip(text: Any, limit: int = MAX_TEXT_CHARS) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def _fit(header: Optional[str], lines: List[str], budget: int) -> str:
+    """Join lines in order until the token budget is spent; lines must already be ranked"""
+    out = [header] if header else []
+    used = count_tokens(header or "")
+    for kept, line in enumerate(lines):
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            out.append(f"[{len(lines) - kept} more omitted]")
+            break
+        out.append(line)
+        used += cost
+    return "\n".join(out)
+
+
+def _fallback(payload: Any, budget: int) -> str:
+    """Anything we don't know the shape of: compact JSON cut to the budget"""
+    text = payload if isinstance(payload, str) else json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str)
+    if count_tokens(text) <= budget:
+        return text
+    return text[: budget * 4]
+
+
+def serialize_serp(payload: Any, budget: int) -> str:
+    """Knowledge panel plus organic results in rank order, one compact line each"""
+    if not isinstance(payload, dict) or "organic" not in payload:
+        return _fallback(payload, budget)
+
+    header = None
+    knowledge = payload.get("knowledge") or {}
+    if isinstance(knowledge, dict):
+        summary = " — ".join(_clip(knowledge.get(field)) for field in ("name", "title", "description") if knowledge.get(field))
+        facts = "; ".join(
+            f"{fact.get('key')}: {_clip(fact.get('value'), 80)}"
+            for fact in knowledge.get("facts", []) or []
+            if isinstance(fact, dict) and fact.get("key")
+        )
+        parts = [part for part in (summary, facts) if part]
+        if parts:
+            header = "Knowledge: " + " | ".join(parts)
+
+    organic = [item for item in payload.get("organic") or [] if isinstance(item, dict)]
+    organic.sort(key=lambda item: item.get("rank") or item.get("global_rank") or 0)
+    lines = []
+    for position, item in enumerate(organic, 1):
+        line = f"{position}. {_clip(item.get('title'), 150)} ({item.get('link') or item.get('url') or ''})"
+        if item.get("description"):
+            line += f"\n   {_clip(item.get('description'))}"
+        lines.append(line)
+    if not lines and not header:
+        return "No results"
+    return _fit(header, lines, budget)
+
+
+def serialize_reddit_posts(payload: Any, budget: int) -> str:
+    """Reddit search hits, highest engagement first, keeping the URL for selection"""
+    if not isinstance(payload, dict) or "parsed_data" not in payload:
+        return _fallback(payload, budget)
+
+    posts = sorted(payload.get("parsed_data") or [], key=lambda post: post.engagement, reverse=True)
+    lines = []
+    for post in posts:
+        subreddit = f"r/{post.subreddit} " if post.subreddit else ""
+        lines.append(
+            f"- {subreddit}{_clip(post.title, 150)} "
+            f"[{post.score} pts, {post.num_comments} comments] {post.url or ''}"
+        )
+    return _fit(None, lines, budget) if lines else "No posts"
+
+
+def serialize_reddit_comments(payload: Any, budget: int) -> str:
+    """Retrieved comments, highest score first"""
+    if not isinstance(payload, dict) or "parsed_comments" not in payload:
+        return _fallback(payload, budget) if payload else "No comments"
+
+    comments = sorted(payload.get("parsed_comments") or [], key=lambda comment: comment.score, reverse=True)
+    lines = [
+        f"- [{comment.score} pts] {_clip(comment.content)}"
+        for comment in comments
+        if comment.content
+    ]
+    return _fit(None, lines, budget) if lines else "No comments"
+
+
+SERIALIZERS: Dict[str, Callable[[Any, int], str]] = {
+    "google": serialize_serp,
+    "bing": serialize_serp,
+    "reddit_posts": serialize_reddit_posts,
+    "reddit_comments": serialize_reddit_comments,
+}
+
+
+def serialize(source: str, payload: Any, budget: Optional[int] = None) -> str:
+    """Render one source's payload as compact prompt text within its token budget"""
+    return SERIALIZERS[source](payload, token_budget(source) if budget is None else budget)
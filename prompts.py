@@ -131,6 +131,29 @@ Reddit Community Analysis: {reddit_analysis}
 
 Please synthesize these analyses into a comprehensive answer that addresses the question from multiple perspectives."""
 
+    @staticmethod
+    def synthesis_update_system() -> str:
+        """System prompt for updating an answer with a source that arrived late."""
+        return """You are an expert research synthesizer. An answer to the user's question has already been given from some of the sources. A further source has now been analyzed.
+
+Write a short addendum to the existing answer:
+- Only include findings from the new source that add to, confirm or contradict the answer
+- Do not repeat what the answer already says
+- Point out clearly where the new source disagrees with the answer
+
+Keep the addendum brief and well-structured."""
+
+    @staticmethod
+    def synthesis_update_user(user_question: str, answer: str, source: str, analysis: str) -> str:
+        """User prompt for updating an answer with a late source."""
+        return f"""Question: {user_question}
+
+Answer so far: {answer}
+
+New {source} Analysis: {analysis}
+
+Please write the addendum with what the {source} analysis adds to the answer."""
+
 
 def create_message_pair(system_prompt: str, user_prompt: str) -> list[Dict[str, Any]]:
     """
@@ -201,4 +224,13 @@ def get_synthesis_messages(
         PromptTemplates.synthesis_user(
             user_question, google_analysis, bing_analysis, reddit_analysis
         ),
-    )
\ No newline at end of file
+    )
+
+def get_synthesis_update_messages(
+    user_question: str, answer: str, source: str, analysis: str
+) -> list[Dict[str, Any]]:
+    """Get messages for appending a late source to an answer."""
+    return create_message_pair(
+        PromptTemplates.synthesis_update_system(),
+        PromptTemplates.synthesis_update_user(user_question, answer, source, analysis),
+    )
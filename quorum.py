@@ -0,0 +1,74 @@
+"""Quorum synthesis: start answering once the sources that matter most are in.
+
+With SYNTHESIS_QUORUM=google,bing the synthesis starts as soon as those branches
+have finished (or been dropped at the deadline), instead of waiting for the
+slowest one. Sources outside the quorum that are still running then are "late";
+SYNTHESIS_LATE_SOURCES decides what happens to them:
+
+  - ``update`` (default): they keep running, and an update pass after the
+    synthesis appends what they add to the answer
+  - ``drop``: the answer goes out without them, with a note saying so
+
+Without SYNTHESIS_QUORUM (or when it names every source) synthesis waits for all
+branches, as before.
+"""
+import concurrent.futures
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+
+class Quorum:
+    """Per-research record of which branches synthesis still waits for"""
+
+    def __init__(self, required: Iterable[str], late_policy: str = "update"):
+        self.required = set(required)
+        self.late_policy = late_policy
+        self._pending = set(self.required)
+        self._lock = threading.Lock()
+        # Resolved once every required source finished or was dropped
+        self.reached: concurrent.futures.Future = concurrent.futures.Future()
+        # Final branch state of each late source, for the update pass
+        self.late: Dict[str, concurrent.futures.Future] = {}
+        # Tasks of late branches on the event loop, kept referenced until they finish
+        self._handles: list = []
+        if not self._pending:
+            self.reached.set_result(True)
+
+    def optional(self, source: str) -> bool:
+        return source not in self.required
+
+    def resolve(self, source: str):
+        """A branch finished or was dropped: the quorum no longer waits for it"""
+        with self._lock:
+            self._pending.discard(source)
+            done = not self._pending and not self.reached.done()
+        if done:
+            self.reached.set_result(True)
+
+    def mark_late(self, source: str, result: concurrent.futures.Future, handle: Any = None):
+        self.late[source] = result
+        if handle is not None:
+            self._handles.append(handle)
+
+
+def late_policy() -> str:
+    policy = os.getenv("SYNTHESIS_LATE_SOURCES", "update").lower()
+    return policy if policy in ("update", "drop") else "update"
+
+
+def quorum_from_env(sources: Iterable[str]) -> Optional[Quorum]:
+    """The configured quorum, or None when synthesis should wait for every source"""
+    sources = list(sources)
+    required = [name.strip().lower() for name in os.getenv("SYNTHESIS_QUORUM", "").split(",") if name.strip()]
+    unknown = set(required) - set(sources)
+    if unknown:
+        raise ValueError(f"SYNTHESIS_QUORUM names unknown sources: {', '.join(sorted(unknown))}")
+    if not required or set(required) == set(sources):
+        return None
+    return Quorum(required, late_policy())
+
+
+def quorum_of(config: Optional[Dict[str, Any]]) -> Optional[Quorum]:
+    """The quorum a research run was started with (see main.stream_research)"""
+    return ((config or {}).get("configurable") or {}).get("quorum")
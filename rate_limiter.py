@@ -0,0 +1,375 @@
+"""Token-bucket rate limits for every provider call, shared by all sessions in the process.
+
+Each provider endpoint has its own limiter, keyed by dotted name:
+
+  - ``brightdata.serp.<zone>``: SERP searches of one zone
+  - ``brightdata.trigger.<dataset_id>``: dataset triggers
+  - ``brightdata.progress``, ``brightdata.snapshot``: snapshot polls and downloads
+  - ``openai.<model>``: chat model calls, in requests and tokens per minute
+    (``offline.<model>`` for the offline backend's models, unlimited by default)
+
+A limiter refills a requests-per-minute bucket (and a tokens-per-minute one for
+models) holding BURST_SECONDS worth of its rate. Callers that find it empty queue
+by priority: synthesis before analysis before retrieval before speculative work,
+first come first served within a priority, and SYNTHESIS_RESERVE request slots
+of each bucket are kept for synthesis alone. The priority comes from the context
+(``request_priority``), like the research deadline, so it follows a node into the
+HTTP client and the snapshot manager without being passed down.
+
+Limits come from RATE_LIMIT_<KEY>=rpm[,tpm] (dots and dashes as underscores),
+looked up from the full key down to its first part, so RATE_LIMIT_OPENAI covers
+every model and RATE_LIMIT_OPENAI_GPT_4O just one; ``0`` means unlimited. A 429
+from the provider empties the limiter for its Retry-After, so every waiter backs
+off together instead of each one finding out on its own.
+"""
+import asyncio
+import contextlib
+import contextvars
+import email.utils
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from telemetry import metrics
+
+# Highest first
+PRIORITIES = {"synthesis": 0, "analysis": 1, "retrieval": 2, "speculative": 3}
+DEFAULT_PRIORITY = "retrieval"
+
+# (requests per minute, tokens per minute) by key prefix; the longest matching prefix wins
+DEFAULT_LIMITS: Dict[str, Tuple[float, Optional[float]]] = {
+    "brightdata.serp": (1200, None),
+    "brightdata.trigger": (300, None),
+    "brightdata.progress": (1200, None),
+    "brightdata.snapshot": (600, None),
+    "openai": (500, 200_000),
+}
+# Bucket size, in seconds of the refill rate
+BURST_SECONDS = 10
+# Request slots on top of the burst that only synthesis may take: a research whose
+# analyses ran a model bucket dry still gets its answer written
+SYNTHESIS_RESERVE = 1
+# How often a caller queued behind others re-checks its budget (it is woken when its turn comes)
+QUEUED_RECHECK = 0.5
+# Retries of a throttled (429) or unavailable (5xx) call, with jittered exponential backoff
+MAX_RETRIES = 3
+RETRY_BASE = 0.5
+RETRY_CAP = 8.0
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("rate_limit_priority", default=DEFAULT_PRIORITY)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def set_current_priority(name: str):
+    """Set the context's priority for good, e.g. the default in a context copied for shared work"""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown priority {name!r}, expected one of {', '.join(PRIORITIES)}")
+    _priority.set(name)
+
+
+@contextlib.contextmanager
+def request_priority(name: str) -> Iterator[str]:
+    """Queue every provider call made inside the block at ``name`` priority"""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown priority {name!r}, expected one of {', '.join(PRIORITIES)}")
+    token = _priority.set(name)
+    try:
+        yield name
+    finally:
+        try:
+            _priority.reset(token)
+        except ValueError:
+            # Exited in another context (an abandoned generator); nothing to restore there
+            pass
+
+
+class RateLimitExceeded(Exception):
+    """The wait for a slot would outlast the caller's timeout"""
+
+    def __init__(self, key: str, wait: float):
+        super().__init__(f"rate limit {key}: next slot in {wait:.1f}s, past the call's budget")
+        self.key = key
+        self.wait = wait
+
+
+class TokenBucket:
+    """``per_minute`` units refilled continuously, up to BURST_SECONDS worth plus ``reserve``
+    units that only callers asking for them (``reserved=True``) may use"""
+
+    def __init__(self, per_minute: float, reserve: float = 0):
+        self.rate = per_minute / 60
+        self.reserve = reserve
+        self.capacity = max(1.0, self.rate * BURST_SECONDS) + reserve
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float, now: float, reserved: bool = False) -> float:
+        """Seconds until ``cost`` units are available (a cost above capacity waits for a full bucket)"""
+        self._refill(now)
+        floor = 0 if reserved else self.reserve
+        missing = min(cost, self.capacity - floor) - (self.tokens - floor)
+        return max(0.0, missing / self.rate)
+
+    def take(self, cost: float):
+        """Spend units; may go negative when charging for what a call turned out to use"""
+        self.tokens -= cost
+
+
+class _Waiter:
+    __slots__ = ("priority", "tokens", "wake")
+
+    def __init__(self, priority: int, tokens: float, wake):
+        self.priority = priority
+        self.tokens = tokens
+        self.wake = wake
+
+
+class RateLimiter:
+    """Request and token buckets for one provider endpoint, with a priority queue of waiters.
+
+    Thread-safe and loop-agnostic: sync callers block on an event, async callers
+    await one on their own loop, and each is woken when it reaches the head of the
+    queue or when its bucket estimate runs out.
+    """
+
+    def __init__(self, key: str, rpm: Optional[float], tpm: Optional[float] = None):
+        self.key = key
+        self.requests = TokenBucket(rpm, reserve=SYNTHESIS_RESERVE) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._blocked_until = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def _enqueue(self, tokens: float, priority: Optional[str], wake) -> _Waiter:
+        waiter = _Waiter(PRIORITIES[priority or current_priority()], tokens, wake)
+        with self._lock:
+            heapq.heappush(self._queue, (waiter.priority, next(self._seq), waiter))
+            self._publish()
+        return waiter
+
+    def _head_wait(self, now: float, head: _Waiter) -> float:
+        wait = self._blocked_until - now
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now, reserved=head.priority == PRIORITIES["synthesis"]))
+        if self.tokens is not None and head.tokens:
+            wait = max(wait, self.tokens.wait_time(head.tokens, now))
+        return max(0.0, wait)
+
+    def _grant(self, waiter: _Waiter) -> Tuple[float, float]:
+        """With the lock held: (0, 0) once ``waiter`` got its slot, else (least wait left, time to sleep)"""
+        now = time.monotonic()
+        head = self._queue[0][2]
+        wait = self._head_wait(now, head)
+        if head is not waiter:
+            # Queued behind others: the head wakes us when it goes, the timer only re-checks our budget
+            return wait, max(wait, QUEUED_RECHECK)
+        if wait > 0:
+            return wait, wait
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None and waiter.tokens:
+            self.tokens.take(min(waiter.tokens, self.tokens.capacity))
+        heapq.heappop(self._queue)
+        self._wake_head()
+        self._publish()
+        return 0.0, 0.0
+
+    def _wake_head(self):
+        if self._queue:
+            self._queue[0][2].wake()
+
+    def _leave(self, waiter: _Waiter):
+        """Drop a waiter that gave up (timeout, cancellation)"""
+        with self._lock:
+            for index, entry in enumerate(self._queue):
+                if entry[2] is waiter:
+                    self._queue.pop(index)
+                    heapq.heapify(self._queue)
+                    self._wake_head()
+                    self._publish()
+                    return
+
+    def _granted(self, waiter: _Waiter, waited: float) -> float:
+        priority = next(name for name, rank in PRIORITIES.items() if rank == waiter.priority)
+        metrics.observe("rate_limit_wait_seconds", waited, limit=self.key, priority=priority)
+        return waited
+
+    def _check_budget(self, waiter: _Waiter, wait: float, started: float, timeout: Optional[float]):
+        if timeout is not None and time.monotonic() - started + wait > timeout:
+            self._leave(waiter)
+            metrics.inc("rate_limit_rejected_total", limit=self.key)
+            raise RateLimitExceeded(self.key, wait)
+
+    def acquire(self, tokens: float = 0, timeout: Optional[float] = None, priority: Optional[str] = None) -> float:
+        """Block until a request (costing ``tokens``) may go; returns the seconds waited.
+
+        Raises RateLimitExceeded as soon as the wait would pass ``timeout``.
+        """
+        event = threading.Event()
+        waiter = self._enqueue(tokens, priority, event.set)
+        started = time.monotonic()
+        try:
+            while True:
+                event.clear()
+                with self._lock:
+                    wait, sleep = self._grant(waiter)
+                if not sleep:
+                    return self._granted(waiter, time.monotonic() - started)
+                self._check_budget(waiter, wait, started, timeout)
+                event.wait(sleep)
+        except BaseException:
+            self._leave(waiter)
+            raise
+
+    async def aacquire(self, tokens: float = 0, timeout: Optional[float] = None, priority: Optional[str] = None) -> float:
+        """Async ``acquire``: waits on the event loop"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = self._enqueue(tokens, priority, lambda: loop.call_soon_threadsafe(event.set))
+        started = time.monotonic()
+        try:
+            while True:
+                event.clear()
+                with self._lock:
+                    wait, sleep = self._grant(waiter)
+                if not sleep:
+                    return self._granted(waiter, time.monotonic() - started)
+                self._check_budget(waiter, wait, started, timeout)
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(event.wait(), sleep)
+        except BaseException:
+            self._leave(waiter)
+            raise
+
+    def charge(self, tokens: float):
+        """Bill tokens a call used beyond what it reserved (e.g. its output)"""
+        if self.tokens is not None and tokens > 0:
+            with self._lock:
+                self.tokens.take(tokens)
+
+    def throttled(self, retry_after: Optional[float], attempt: int) -> float:
+        """The provider answered 429: hold every caller until its Retry-After; returns our own delay"""
+        delay = retry_delay(attempt, retry_after)
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + (retry_after or delay))
+        metrics.inc("rate_limit_throttled_total", limit=self.key)
+        return delay
+
+    def _publish(self):
+        metrics.set("rate_limit_queue_depth", len(self._queue), limit=self.key)
+
+
+def retry_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff; never shorter than the provider's Retry-After"""
+    jitter = random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2 ** attempt))
+    if retry_after is not None:
+        # Spread out the callers released by the same Retry-After
+        return retry_after + jitter / 2
+    return jitter
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _env_key(key: str) -> str:
+    return "RATE_LIMIT_" + re.sub(r"[^A-Z0-9]+", "_", key.upper()).strip("_")
+
+
+def _parse_limit(value: str) -> Tuple[float, Optional[float]]:
+    rpm, _, tpm = value.partition(",")
+    return float(rpm), float(tpm) if tpm else None
+
+
+def limits_for(key: str) -> Tuple[Optional[float], Optional[float]]:
+    """(rpm, tpm) for a limiter key: the most specific RATE_LIMIT_* variable, else DEFAULT_LIMITS"""
+    parts = key.split(".")
+    for size in range(len(parts), 0, -1):
+        value = os.getenv(_env_key(".".join(parts[:size])))
+        if value:
+            return _parse_limit(value)
+    for size in range(len(parts), 0, -1):
+        default = DEFAULT_LIMITS.get(".".join(parts[:size]))
+        if default is not None:
+            return default
+    return None, None
+
+
+def rate_limits_enabled() -> bool:
+    return os.getenv("RATE_LIMITS_DISABLED", "").lower() not in ("1", "true", "yes")
+
+
+class RateLimitScheduler:
+    """The process's limiters, created on first use from their configured limits"""
+
+    def __init__(self):
+        self._limiters: Dict[str, Optional[RateLimiter]] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, key: str) -> Optional[RateLimiter]:
+        """None for an unlimited key"""
+        limiter = self._limiters.get(key, False)
+        if limiter is False:
+            with self._lock:
+                if key not in self._limiters:
+                    rpm, tpm = limits_for(key)
+                    self._limiters[key] = RateLimiter(key, rpm, tpm) if rpm or tpm else None
+                limiter = self._limiters[key]
+        return limiter
+
+    def stats(self) -> Dict[str, Any]:
+        return {key: limiter.depth for key, limiter in self._limiters.items() if limiter is not None}
+
+
+_scheduler: Optional[RateLimitScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RateLimitScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RateLimitScheduler()
+    return _scheduler
+
+
+def limiter_for(key: str) -> Optional[RateLimiter]:
+    """The limiter for ``key``, or None when rate limiting is off or the key is unlimited"""
+    if not rate_limits_enabled():
+        return None
+    return get_scheduler().limiter(key)
+
+
+metrics.describe("rate_limit_queue_depth", "Calls waiting for a provider rate limit, per limiter")
+metrics.describe("rate_limit_wait_seconds", "Time calls waited for a provider rate limit, by limiter and priority")
+metrics.describe("rate_limit_throttled_total", "429 responses from a provider, per limiter")
+metrics.describe("rate_limit_rejected_total", "Calls that gave up because the rate-limit wait outlasted their budget")
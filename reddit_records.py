@@ -0,0 +1,67 @@
+"""Compact records for parsed Reddit data.
+
+Every research in flight keeps its Reddit posts and comments in the graph state
+until synthesis is done, and a Streamlit worker holds many researches at once, so
+they are ``__slots__`` dataclasses rather than dicts: no per-record hash table,
+64 bytes for a comment against 184 for the same dict (``benchmarks/memory_benchmark.py``
+measures whole sessions).
+``to_dict``/``from_dict`` convert at the JSON boundaries (result cache, recorded
+benchmark cases); the dict layout is the one those stored before.
+"""
+import heapq
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class RedditPost:
+    title: Optional[str]
+    url: Optional[str]
+    score: int = 0
+    num_comments: int = 0
+    subreddit: str = ""
+
+    @property
+    def engagement(self) -> int:
+        return self.score + self.num_comments
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RedditPost":
+        return cls(
+            data.get("title"),
+            data.get("url"),
+            data.get("score") or 0,
+            data.get("num_comments") or 0,
+            data.get("subreddit") or "",
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "url": self.url,
+            "score": self.score,
+            "num_comments": self.num_comments,
+            "subreddit": self.subreddit,
+        }
+
+
+@dataclass(slots=True)
+class RedditComment:
+    comment_id: Optional[str]
+    content: Optional[str]
+    date: Optional[str]
+    score: int = 0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RedditComment":
+        return cls(data.get("comment_id"), data.get("content"), data.get("date"), data.get("score") or 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"comment_id": self.comment_id, "content": self.content, "date": self.date, "score": self.score}
+
+
+def top_k(items: Iterable[T], k: int, key: Callable[[T], Any]) -> List[T]:
+    """The ``k`` largest items by ``key``, largest first: a k-sized heap instead of a full sort"""
+    return heapq.nlargest(k, items, key=key)
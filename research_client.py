@@ -0,0 +1,105 @@
+"""Thin client of the research server, used by the Streamlit app and the CLI.
+
+With RESEARCH_SERVER_URL set it talks to that server; otherwise it starts one
+embedded server per process on a free local port, so a single Streamlit worker
+still shares one graph, one set of pools and one admission queue across all of
+its browser sessions.
+
+``stream_research`` yields the same events as ``main.stream_research``, except
+that errors arrive as exceptions rebuilt from the server's message and the final
+state carries only ``research_server.FINAL_STATE_FIELDS``.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+
+from environment import load_env
+
+DEFAULT_TIMEOUT = 180.0
+
+_server_url: Optional[str] = None
+_server_lock = threading.Lock()
+_nodes: Optional[List[str]] = None
+
+
+class ResearchRejected(Exception):
+    """The server turned the research away (429/503); ``retry_after`` is in seconds"""
+
+    def __init__(self, reason: str, retry_after: Optional[int] = None):
+        super().__init__(f"research server busy ({reason}), retry in {retry_after}s" if retry_after else f"research server busy ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ResearchFailed(Exception):
+    """A research that failed on the server"""
+
+
+def server_url() -> str:
+    """RESEARCH_SERVER_URL, or the embedded server (started on first use)"""
+    global _server_url
+    if _server_url is None:
+        with _server_lock:
+            if _server_url is None:
+                load_env()
+                configured = os.getenv("RESEARCH_SERVER_URL")
+                if configured:
+                    _server_url = configured.rstrip("/")
+                else:
+                    from research_server import start_background_server
+
+                    _server_url, _ = start_background_server()
+    return _server_url
+
+
+def graph_nodes() -> List[str]:
+    """Names of the graph's nodes, for progress bars"""
+    global _nodes
+    if _nodes is None:
+        response = requests.get(f"{server_url()}/health", timeout=10)
+        response.raise_for_status()
+        _nodes = response.json()["nodes"]
+    return _nodes
+
+
+def stream_research(
+    question: str,
+    stream_analyses: bool = False,
+    deadline: Optional[float] = None,
+    use_cache: bool = True,
+    tenant: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Run a research on the server and yield its events as they arrive"""
+    body = {"question": question, "stream_analyses": stream_analyses, "deadline": deadline, "use_cache": use_cache}
+    if tenant:
+        body["tenant"] = tenant
+    try:
+        response = requests.post(
+            f"{server_url()}/research",
+            json=body,
+            stream=True,
+            timeout=(10, float(os.getenv("RESEARCH_CLIENT_TIMEOUT", DEFAULT_TIMEOUT))),
+        )
+    except requests.RequestException as e:
+        yield {"type": "error", "error": ResearchFailed(f"research server unreachable: {e}")}
+        return
+
+    with response:
+        if response.status_code in (429, 503):
+            retry_after = response.headers.get("Retry-After")
+            reason = response.json().get("error", "busy")
+            yield {"type": "error", "error": ResearchRejected(reason, int(retry_after) if retry_after else None)}
+            return
+        if response.status_code != 200:
+            yield {"type": "error", "error": ResearchFailed(f"research server returned {response.status_code}: {response.text}")}
+            return
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["type"] == "error":
+                event["error"] = ResearchFailed(event["error"])
+            yield event
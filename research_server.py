@@ -0,0 +1,336 @@
+"""Long-running research service: many sessions, one graph and one set of pools.
+
+    python -m research_server --port 8765
+
+Every admitted research runs ``main.astream_research`` on the server's event
+loop, so all sessions share the BrightData connection pools, the chat model
+clients, the snapshot manager and the caches. The Streamlit app and the CLI are
+thin clients of it (see research_client).
+
+API, JSON over HTTP:
+
+  - ``POST /research`` with ``{"question", "tenant"?, "stream_analyses"?,
+    "deadline"?, "use_cache"?}`` (the tenant may also come as an ``X-Tenant``
+    header). Answers 200 with ``application/x-ndjson``: one event per line, the
+    events of ``main.stream_research`` plus a first ``queue_wait`` metric. Errors
+    are sent as their message and the final state is cut to FINAL_STATE_FIELDS.
+  - ``GET /health``: running and queued sessions, and the graph's node names
+  - ``GET /metrics``: Prometheus text
+
+Admission control: at most RESEARCH_SERVER_MAX_SESSIONS researches run at once
+and RESEARCH_SERVER_TENANT_LIMIT per tenant. Requests over those limits wait in
+per-tenant queues served round-robin, so one busy tenant cannot starve the
+others. Backpressure is explicit: a tenant with RESEARCH_SERVER_TENANT_QUEUE
+requests waiting gets 429, a full server queue (RESEARCH_SERVER_MAX_QUEUE) or a
+wait longer than RESEARCH_SERVER_QUEUE_TIMEOUT gets 503, both with a Retry-After
+estimated from recent session durations. A client that disconnects cancels its
+research.
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from aiohttp import web
+
+from environment import load_env
+from telemetry import configure_from_env, log, metrics
+
+DEFAULT_MAX_SESSIONS = 64
+DEFAULT_MAX_QUEUE = 256
+DEFAULT_TENANT_LIMIT = 8
+DEFAULT_TENANT_QUEUE = 32
+DEFAULT_QUEUE_TIMEOUT = 30.0
+DEFAULT_PORT = 8765
+
+# What of the final graph state goes back to clients (the rest is not JSON, or is internal)
+FINAL_STATE_FIELDS = ("user_question", "final_answer", "timings", "input_tokens", "source_status", "source_errors", "synthesis_status", "answer_cache")
+
+
+class Rejected(Exception):
+    """A request the server will not queue: ``status`` 429/503 with a Retry-After hint"""
+
+    def __init__(self, status: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Global and per-tenant concurrency limits with bounded, fair queues (event-loop only)"""
+
+    def __init__(
+        self,
+        max_sessions: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        tenant_limit: Optional[int] = None,
+        tenant_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+    ):
+        self.max_sessions = max_sessions or int(os.getenv("RESEARCH_SERVER_MAX_SESSIONS", DEFAULT_MAX_SESSIONS))
+        self.max_queue = int(os.getenv("RESEARCH_SERVER_MAX_QUEUE", DEFAULT_MAX_QUEUE)) if max_queue is None else max_queue
+        self.tenant_limit = tenant_limit or int(os.getenv("RESEARCH_SERVER_TENANT_LIMIT", DEFAULT_TENANT_LIMIT))
+        self.tenant_queue = (
+            int(os.getenv("RESEARCH_SERVER_TENANT_QUEUE", DEFAULT_TENANT_QUEUE)) if tenant_queue is None else tenant_queue
+        )
+        self.queue_timeout = queue_timeout or float(os.getenv("RESEARCH_SERVER_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT))
+        self.running: Dict[str, int] = collections.Counter()
+        self.total_running = 0
+        # Tenants with waiting requests, in round-robin order
+        self.queues: "collections.OrderedDict[str, Deque[asyncio.Future]]" = collections.OrderedDict()
+        self.total_queued = 0
+        self._session_seconds = 10.0  # moving average, for Retry-After
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.total_running,
+            "queued": self.total_queued,
+            "tenants": {tenant: count for tenant, count in self.running.items() if count},
+        }
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: queue ahead of a new request times average session length"""
+        return max(1, round(self._session_seconds * (self.total_queued + 1) / self.max_sessions))
+
+    def _can_start(self, tenant: str) -> bool:
+        return self.total_running < self.max_sessions and self.running[tenant] < self.tenant_limit
+
+    def _start(self, tenant: str):
+        self.running[tenant] += 1
+        self.total_running += 1
+
+    def _reject(self, status: int, reason: str) -> Rejected:
+        metrics.inc("research_server_rejected_total", reason=reason)
+        return Rejected(status, reason, self.retry_after())
+
+    async def acquire(self, tenant: str) -> float:
+        """Wait for a slot; returns the seconds spent queued, or raises Rejected"""
+        if self._can_start(tenant) and not self.queues.get(tenant):
+            self._start(tenant)
+            self._publish()
+            return 0.0
+        if self.total_queued >= self.max_queue:
+            raise self._reject(503, "server_queue_full")
+        queue = self.queues.setdefault(tenant, collections.deque())
+        if len(queue) >= self.tenant_queue:
+            if not queue:
+                del self.queues[tenant]
+            raise self._reject(429, "tenant_queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        self.total_queued += 1
+        self._publish()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._forget(tenant, future)
+            raise self._reject(503, "queue_timeout")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(tenant)  # granted just as the client went away
+            else:
+                self._forget(tenant, future)
+            raise
+        waited = time.monotonic() - started
+        metrics.observe("research_server_queue_wait_seconds", waited)
+        return waited
+
+    def release(self, tenant: str, elapsed: Optional[float] = None):
+        self.running[tenant] -= 1
+        self.total_running -= 1
+        if elapsed is not None:
+            self._session_seconds = 0.9 * self._session_seconds + 0.1 * elapsed
+        self._dispatch()
+        self._publish()
+
+    def _forget(self, tenant: str, future: asyncio.Future):
+        queue = self.queues.get(tenant)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            self.total_queued -= 1
+            if not queue:
+                del self.queues[tenant]
+        self._publish()
+
+    def _dispatch(self):
+        """Hand free slots to waiting requests, one tenant at a time in rotation"""
+        while self.total_queued and self.total_running < self.max_sessions:
+            tenant = next((tenant for tenant in self.queues if self.running[tenant] < self.tenant_limit), None)
+            if tenant is None:
+                return  # every waiting tenant is at its own limit
+            queue = self.queues[tenant]
+            future = queue.popleft()
+            self.total_queued -= 1
+            if queue:
+                self.queues.move_to_end(tenant)
+            else:
+                del self.queues[tenant]
+            if future.done():
+                continue  # its waiter timed out or disconnected
+            self._start(tenant)
+            future.set_result(None)
+
+    def _publish(self):
+        metrics.set("research_server_sessions_running", self.total_running)
+        metrics.set("research_server_sessions_queued", self.total_queued)
+
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    """One NDJSON line for a research event"""
+    if event["type"] == "error":
+        event = {"type": "error", "error": str(event["error"])}
+    elif event["type"] == "final":
+        state = event["state"]
+        event = {"type": "final", "state": {field: state[field] for field in FINAL_STATE_FIELDS if field in state}}
+    return (json.dumps(event, default=str) + "\n").encode()
+
+
+async def handle_research(request: web.Request) -> web.StreamResponse:
+    try:
+        body = await request.json()
+    except ValueError:
+        return web.json_response({"error": "body must be JSON"}, status=400)
+    question = str(body.get("question") or "").strip()
+    if not question:
+        return web.json_response({"error": "question is required"}, status=400)
+    tenant = request.headers.get("X-Tenant") or str(body.get("tenant") or "default")
+
+    admission: AdmissionController = request.app["admission"]
+    try:
+        waited = await admission.acquire(tenant)
+    except Rejected as rejected:
+        log(f"🚦 Rejected research for tenant {tenant}: {rejected.reason}", level="warning")
+        return web.json_response(
+            {"error": rejected.reason, "retry_after": rejected.retry_after},
+            status=rejected.status,
+            headers={"Retry-After": str(rejected.retry_after)},
+        )
+
+    from main import astream_research
+
+    started = time.monotonic()
+    outcome = "completed"
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    try:
+        await response.prepare(request)
+        await response.write(encode_event({"type": "metric", "name": "queue_wait", "value": waited}))
+        events = astream_research(
+            question,
+            stream_analyses=bool(body.get("stream_analyses")),
+            deadline=body.get("deadline"),
+            use_cache=body.get("use_cache", True),
+        )
+        async with contextlib.aclosing(events):
+            async for event in events:
+                # Waits while the client's socket is full: a slow reader slows only its own research
+                await response.write(encode_event(event))
+        await response.write_eof()
+    except ConnectionResetError:
+        outcome = "disconnected"  # leaving the generator cancelled the research
+    except asyncio.CancelledError:
+        outcome = "disconnected"
+        raise
+    finally:
+        admission.release(tenant, time.monotonic() - started)
+        metrics.inc("research_server_sessions_total", outcome=outcome)
+    return response
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    from main import NODES
+
+    return web.json_response({"status": "ok", **request.app["admission"].stats(), "nodes": list(NODES)})
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
+
+
+async def _warm_up(app: web.Application):
+    """Build the graph and models on a worker thread while the server already accepts requests"""
+    from main import get_graph
+
+    def report(future):
+        if not future.cancelled() and future.exception() is not None:
+            log(f"⚠️ Research graph not ready: {future.exception()}", level="warning")
+
+    asyncio.get_running_loop().run_in_executor(None, get_graph).add_done_callback(report)
+
+
+async def _close_clients(app: web.Application):
+    from http_client import get_client
+
+    await get_client().aclose()
+
+
+def create_app(admission: Optional[AdmissionController] = None) -> web.Application:
+    app = web.Application()
+    app["admission"] = admission or AdmissionController()
+    app.router.add_post("/research", handle_research)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.on_startup.append(_warm_up)
+    app.on_cleanup.append(_close_clients)
+    return app
+
+
+def start_background_server(
+    host: str = "127.0.0.1", port: int = 0, admission: Optional[AdmissionController] = None
+) -> Tuple[str, threading.Thread]:
+    """Run the server on a daemon thread with its own event loop; returns (base URL, thread).
+
+    ``port=0`` picks a free port. Used by research_client when no RESEARCH_SERVER_URL
+    is configured, and by the load test.
+    """
+    started = threading.Event()
+    address = {}
+
+    async def serve():
+        runner = web.AppRunner(create_app(admission))
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        address["port"] = runner.addresses[0][1]
+        started.set()
+        await asyncio.Event().wait()  # until the process exits
+
+    thread = threading.Thread(target=asyncio.run, args=(serve(),), name="research-server", daemon=True)
+    thread.start()
+    if not started.wait(30):
+        raise RuntimeError("research server did not start")
+    return f"http://{host}:{address['port']}", thread
+
+
+metrics.describe("research_server_sessions_running", "Researches running on the research server")
+metrics.describe("research_server_sessions_queued", "Research requests waiting for a slot")
+metrics.describe("research_server_queue_wait_seconds", "Time admitted requests spent queued")
+metrics.describe("research_server_rejected_total", "Requests turned away, by reason (tenant_queue_full, server_queue_full, queue_timeout)")
+metrics.describe("research_server_sessions_total", "Researches served, by outcome (completed, disconnected)")
+
+
+def main():
+    load_env()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("RESEARCH_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("RESEARCH_SERVER_PORT", DEFAULT_PORT)))
+    args = parser.parse_args()
+
+    configure_from_env()
+    admission = AdmissionController()
+    log(
+        f"🛰️ Research server on http://{args.host}:{args.port} "
+        f"({admission.max_sessions} sessions, {admission.tenant_limit} per tenant, queue {admission.max_queue})"
+    )
+    web.run_app(create_app(admission), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from environment import load_env
+from telemetry import log
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "results.sqlite3")
+
+# Seconds each source's results stay fresh, overridable with RESULT_CACHE_TTL_<NAMESPACE>
+DEFAULT_TTLS = {
+    "serp": 6 * 3600,
+    "reddit_search": 12 * 3600,
+    "reddit_comments": 6 * 3600,
+    "llm": 24 * 3600,
+    "answers": 6 * 3600,
+    "answers_lsh": 6 * 3600,
+}
+FALLBACK_TTL = 3600
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 50_000
+
+# Optional per-namespace entry caps, overridable with RESULT_CACHE_MAX_ENTRIES_<NAMESPACE>
+DEFAULT_NAMESPACE_MAX_ENTRIES = {
+    "llm": 10_000,
+    "reddit_comments": 5_000,
+    "answers": 2_000,
+    "answers_lsh": 20_000,
+}
+
+# Expired and over-budget rows are evicted at most this often per process
+# (RESULT_CACHE_EVICT_INTERVAL seconds), not on every write
+DEFAULT_EVICT_INTERVAL = 30.0
+# Reads only record their last_access and hit/miss counters in memory; the batch is
+# written when this old or this large, so a lookup never takes the write lock
+FLUSH_INTERVAL = 5.0
+FLUSH_MAX_PENDING = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS counters (
+    namespace TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (namespace, name)
+);
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a search query"""
+    query = re.sub(r"\s+", " ", (query or "").strip().lower())
+    return query.rstrip("?!. ")
+
+
+def make_key(*parts: Any, **params: Any) -> str:
+    """Stable hash of the positional parts plus keyword parameters"""
+    raw = json.dumps([parts, params], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResultCache:
+    """Disk-backed TTL cache shared by every process on the machine.
+
+    Entries live in one SQLite file in WAL mode, so the Streamlit app and the
+    ``run_chatbot`` CLI can read and write it concurrently. Each thread gets its own
+    connection. Size is bounded in bytes and entries, evicting least recently used
+    rows first; hit/miss/byte counters are stored alongside so they add up across
+    processes. Cache failures are logged and treated as misses, never raised.
+
+    Lookups are plain reads: access times and counters are buffered and flushed in
+    batches, and eviction runs every ``evict_interval`` seconds, so the bounds can be
+    overshot by that much writing in between. The calls still block on SQLite;
+    async callers run them in a thread (``asyncio.to_thread``).
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        evict_interval: Optional[float] = None,
+    ):
+        self.path = path or os.getenv("RESULT_CACHE_PATH") or DEFAULT_CACHE_PATH
+        self.max_bytes = max_bytes or int(os.getenv("RESULT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.max_entries = max_entries or int(os.getenv("RESULT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.evict_interval = (
+            evict_interval if evict_interval is not None
+            else float(os.getenv("RESULT_CACHE_EVICT_INTERVAL", DEFAULT_EVICT_INTERVAL))
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Buffered since the last flush: {(namespace, key): last access}, {(namespace, counter): amount}
+        self._accesses: Dict[Tuple[str, str], float] = {}
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._flushed_at = time.monotonic()
+        self._evicted_at = float("-inf")
+        self._written: Set[str] = set()
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+        atexit.register(self.flush)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def max_entries_for(self, namespace: str) -> Optional[int]:
+        override = os.getenv(f"RESULT_CACHE_MAX_ENTRIES_{namespace.upper()}")
+        if override:
+            return int(override)
+        return DEFAULT_NAMESPACE_MAX_ENTRIES.get(namespace)
+
+    def ttl_for(self, namespace: str) -> float:
+        override = os.getenv(f"RESULT_CACHE_TTL_{namespace.upper()}")
+        if override:
+            return float(override)
+        return self.ttls.get(namespace, FALLBACK_TTL)
+
+    def _count(self, namespace: str, name: str, amount: int = 1):
+        """Buffer a counter increment until the next flush"""
+        with self._lock:
+            self._counters[(namespace, name)] = self._counters.get((namespace, name), 0) + amount
+
+    def _flush_due(self) -> bool:
+        with self._lock:
+            pending = len(self._accesses) + len(self._counters)
+            return pending >= FLUSH_MAX_PENDING or (pending and time.monotonic() - self._flushed_at >= FLUSH_INTERVAL)
+
+    def _flush(self, conn: sqlite3.Connection):
+        with self._lock:
+            accesses, self._accesses = self._accesses, {}
+            counters, self._counters = self._counters, {}
+            self._flushed_at = time.monotonic()
+        if accesses:
+            conn.executemany(
+                "UPDATE entries SET last_access = MAX(last_access, ?) WHERE namespace = ? AND key = ?",
+                [(accessed, namespace, key) for (namespace, key), accessed in accesses.items()],
+            )
+        if counters:
+            conn.executemany(
+                "INSERT INTO counters (namespace, name, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (namespace, name) DO UPDATE SET value = value + excluded.value",
+                [(namespace, name, amount) for (namespace, name), amount in counters.items()],
+            )
+
+    def flush(self):
+        """Write buffered access times and counters now"""
+        try:
+            with self._connection() as conn:
+                self._flush(conn)
+        except Exception as e:
+            log(f"⚠️ Cache flush failed: {e}", level="warning")
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        now = time.time()
+        try:
+            row = self._connection().execute(
+                "SELECT value, size FROM entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, now),
+            ).fetchone()
+            if row is None:
+                self._count(namespace, "misses")
+                return None
+
+            with self._lock:
+                self._accesses[(namespace, key)] = now
+            self._count(namespace, "hits")
+            self._count(namespace, "bytes_read", row[1])
+            return json.loads(row[0])
+        except Exception as e:
+            log(f"⚠️ Cache read failed ({namespace}): {e}", level="warning")
+            return None
+        finally:
+            if self._flush_due():
+                self.flush()
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        ttl = self.ttl_for(namespace) if ttl is None else ttl
+        try:
+            encoded = json.dumps(value, default=str)
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries "
+                    "(namespace, key, value, size, created_at, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (namespace, key, encoded, len(encoded), now, now + ttl, now),
+                )
+                self._count(namespace, "bytes_written", len(encoded))
+                with self._lock:
+                    self._written.add(namespace)
+                    evict = time.monotonic() - self._evicted_at >= self.evict_interval
+                    if evict:
+                        self._evicted_at = time.monotonic()
+                        written, self._written = self._written, set()
+                if evict or self._flush_due():
+                    # Eviction goes by last_access, so the buffered accesses go in first
+                    self._flush(conn)
+                if evict:
+                    for written_namespace in written:
+                        self._evict_namespace(conn, written_namespace)
+                    self._evict(conn, now)
+                    self._flush(conn)
+        except Exception as e:
+            log(f"⚠️ Cache write failed ({namespace}): {e}", level="warning")
+
+    def _evict_namespace(self, conn: sqlite3.Connection, namespace: str):
+        """Keep a namespace under its own entry cap, if it has one"""
+        limit = self.max_entries_for(namespace)
+        if limit is None:
+            return
+        (count,) = conn.execute("SELECT COUNT(*) FROM entries WHERE namespace = ?", (namespace,)).fetchone()
+        if count <= limit:
+            return
+        evicted = conn.execute(
+            "DELETE FROM entries WHERE rowid IN ("
+            "SELECT rowid FROM entries WHERE namespace = ? ORDER BY last_access LIMIT ?)",
+            (namespace, count - limit),
+        ).rowcount
+        self._count(namespace, "evictions", evicted)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drop expired rows, then least recently used rows until under the size bounds"""
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        total_bytes, total_entries = conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries").fetchone()
+
+        while total_bytes > self.max_bytes or total_entries > self.max_entries:
+            batch = max(1, total_entries // 20)
+            victims = conn.execute(
+                "SELECT namespace, key, size FROM entries ORDER BY last_access LIMIT ?", (batch,)
+            ).fetchall()
+            if not victims:
+                break
+            conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", [v[:2] for v in victims])
+            for namespace, _, size in victims:
+                self._count(namespace, "evictions")
+                total_bytes -= size
+            total_entries -= len(victims)
+
+    def delete(self, namespace: str, key: str):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace: Optional[str] = None):
+        with self._lock:
+            self._accesses = {k: v for k, v in self._accesses.items() if namespace is not None and k[0] != namespace}
+            self._counters = {k: v for k, v in self._counters.items() if namespace is not None and k[0] != namespace}
+        with self._connection() as conn:
+            if namespace is None:
+                conn.execute("DELETE FROM entries")
+                conn.execute("DELETE FROM counters")
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+                conn.execute("DELETE FROM counters WHERE namespace = ?", (namespace,))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-namespace counters plus current entry count and stored bytes"""
+        self.flush()
+        conn = self._connection()
+        stats: Dict[str, Dict[str, int]] = {}
+        for namespace, name, value in conn.execute("SELECT namespace, name, value FROM counters"):
+            stats.setdefault(namespace, {})[name] = value
+        for namespace, entries, size in conn.execute(
+            "SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace"
+        ):
+            stats.setdefault(namespace, {}).update({"entries": entries, "bytes": size})
+        return stats
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def cache_enabled() -> bool:
+    return os.getenv("RESULT_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+
+
+def get_cache() -> Optional[ResultCache]:
+    """Process-wide result cache, or None when disabled (RESULT_CACHE_DISABLED=1)"""
+    global _cache
+    load_env()
+    if not cache_enabled():
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache()
+    return _cache
@@ -1,74 +1,266 @@
 import os
 import time
-import requests
-from dotenv import load_dotenv
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Dict, Any, Optional, Sequence
+from deadline import Deadline, current_deadline
+from http_client import STREAM_CHUNK_SIZE, get_client
+from snapshot_stream import RecordAccumulator, RecordParser, RecordReducer
+from telemetry import log, metrics, span
 
-load_dotenv()
+# Poll intervals in seconds: snapshots that finish quickly are picked up quickly,
+# slow ones are not hammered. The last interval repeats until the deadline.
+BACKOFF_SCHEDULE = (0.5, 1, 1, 2, 2, 3, 5)
+
+
+class SnapshotState(str, Enum):
+    READY = "ready"
+    FAILED = "failed"
+    TIMEOUT = "timeout"
+
+
+@dataclass
+class SnapshotWaitResult:
+    snapshot_id: str
+    state: SnapshotState
+    attempts: int
+    elapsed: float
+    error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state is SnapshotState.READY
+
+    def __bool__(self) -> bool:
+        return self.ready
+
+
+def check_snapshot_progress(snapshot_id: str, timeout: Optional[float] = None) -> Optional[str]:
+    """One progress request; returns the snapshot status ("ready", "running", "failed", ...)"""
+    response = get_client().get("progress", timeout=timeout, snapshot_id=snapshot_id)
+    response.raise_for_status()
+    return response.json().get("status")
+
+
+async def acheck_snapshot_progress(snapshot_id: str, timeout: Optional[float] = None) -> Optional[str]:
+    response = await get_client().aget("progress", timeout=timeout, snapshot_id=snapshot_id)
+    response.raise_for_status()
+    return response.json().get("status")
+
+
+def _backoff_interval(attempts: int, schedule: Sequence[float], max_interval: Optional[float]) -> float:
+    interval = schedule[min(attempts - 1, len(schedule) - 1)]
+    if max_interval is not None:
+        interval = min(interval, max_interval)
+    return interval
+
+
+def _settled_result(snapshot_id: str, status: Optional[str], attempts: int, start_time: float) -> Optional[SnapshotWaitResult]:
+    """Typed result once the snapshot is ready or failed, None while it is still running"""
+    if status == "ready":
+        log("✅ Snapshot completed!", snapshot_id=snapshot_id, attempts=attempts)
+        return SnapshotWaitResult(snapshot_id, SnapshotState.READY, attempts, time.time() - start_time)
+    elif status == "failed":
+        log("❌ Snapshot failed", level="error", snapshot_id=snapshot_id, attempts=attempts)
+        return SnapshotWaitResult(snapshot_id, SnapshotState.FAILED, attempts, time.time() - start_time)
+    elif status != "running":
+        log(f"❓ Unknown status: {status}", level="warning", snapshot_id=snapshot_id)
+    return None
+
+
+def _poll_failed(error: Exception):
+    """A progress check that errored; the next tick retries it"""
+    metrics.inc("retries_total", operation="snapshot_progress")
+    log(f"⚠️ Error checking progress: {error}", level="warning")
+
+
+def _finish_wait(current, result: SnapshotWaitResult) -> SnapshotWaitResult:
+    current.set_attribute("snapshot.state", result.state.value)
+    current.set_attribute("snapshot.attempts", result.attempts)
+    metrics.inc("snapshot_waits_total", state=result.state.value)
+    metrics.observe("snapshot_poll_attempts", result.attempts)
+    return result
+
+
+def _timeout_result(snapshot_id: str, attempts: int, start_time: float, last_error: Optional[str]) -> SnapshotWaitResult:
+    metrics.inc("timeouts_total", operation="snapshot_wait")
+    log(f"⏰ Timeout waiting for snapshot {snapshot_id} after {attempts} checks", level="warning")
+    return SnapshotWaitResult(snapshot_id, SnapshotState.TIMEOUT, attempts, time.time() - start_time, last_error)
+
+
+def wait_for_snapshot(
+    snapshot_id: str,
+    deadline: Deadline,
+    schedule: Sequence[float] = BACKOFF_SCHEDULE,
+    max_interval: Optional[float] = None,
+) -> SnapshotWaitResult:
+    """Poll a snapshot until it is ready, failed, or the shared deadline runs out.
+
+    Makes exactly one progress request per tick and never sleeps past the deadline.
+    """
+    start_time = time.time()
+    attempts = 0
+    last_error = None
+
+    with span("snapshot.wait", snapshot_id=snapshot_id, budget=deadline.remaining()) as current:
+        while not deadline.expired():
+            attempts += 1
+            with span("snapshot.poll", attempt=attempts) as tick:
+                try:
+                    status = check_snapshot_progress(snapshot_id, timeout=deadline.remaining())
+                    tick.set_attribute("snapshot.status", status)
+                    result = _settled_result(snapshot_id, status, attempts, start_time)
+                    if result is not None:
+                        return _finish_wait(current, result)
+                except Exception as e:
+                    last_error = str(e)
+                    tick.set_error(last_error)
+                    _poll_failed(e)
+
+            if not deadline.sleep(_backoff_interval(attempts, schedule, max_interval)):
+                break
+
+        return _finish_wait(current, _timeout_result(snapshot_id, attempts, start_time, last_error))
+
+
+async def await_for_snapshot(
+    snapshot_id: str,
+    deadline: Deadline,
+    schedule: Sequence[float] = BACKOFF_SCHEDULE,
+    max_interval: Optional[float] = None,
+) -> SnapshotWaitResult:
+    """Async ``wait_for_snapshot``: sleeps on the event loop instead of blocking a thread"""
+    start_time = time.time()
+    attempts = 0
+    last_error = None
+
+    with span("snapshot.wait", snapshot_id=snapshot_id, budget=deadline.remaining()) as current:
+        while not deadline.expired():
+            attempts += 1
+            with span("snapshot.poll", attempt=attempts) as tick:
+                try:
+                    status = await acheck_snapshot_progress(snapshot_id, timeout=deadline.remaining())
+                    tick.set_attribute("snapshot.status", status)
+                    result = _settled_result(snapshot_id, status, attempts, start_time)
+                    if result is not None:
+                        return _finish_wait(current, result)
+                except Exception as e:
+                    last_error = str(e)
+                    tick.set_error(last_error)
+                    _poll_failed(e)
+
+            if not await deadline.asleep(_backoff_interval(attempts, schedule, max_interval)):
+                break
+
+        return _finish_wait(current, _timeout_result(snapshot_id, attempts, start_time, last_error))
 
 
 def poll_snapshot_status(
     snapshot_id: str, max_attempts: int = 60, delay: int = 5
-) -> bool:
-    api_key = os.getenv("BRIGHTDATA_API_KEY")
-    progress_url = f"https://api.brightdata.com/datasets/v3/progress/{snapshot_id}"
-    headers = {"Authorization": f"Bearer {api_key}"}
-
-    for attempt in range(max_attempts):
-        try:
-            print(
-                f"⏳ Checking snapshot progress... (attempt {attempt + 1}/{max_attempts})"
-            )
+) -> SnapshotWaitResult:
+    """Wait up to max_attempts * delay seconds for a snapshot (truthy once ready)"""
+    return wait_for_snapshot(snapshot_id, Deadline(max_attempts * delay), max_interval=delay)
+
 
-            response = requests.get(progress_url, headers=headers)
-            response.raise_for_status()
+def snapshot_format() -> str:
+    """Download format: NDJSON by default, so records can be parsed as they arrive"""
+    return os.getenv("SNAPSHOT_FORMAT", "ndjson").lower()
 
-            progress_data = response.json()
-            status = progress_data.get("status")
 
-            if status == "ready":
-                print("✅ Snapshot completed!")
-                return True
-            elif status == "failed":
-                print("❌ Snapshot failed")
-                return False
-            elif status == "running":
-                print("🔄 Still processing...")
-                time.sleep(delay)
-            else:
-                print(f"❓ Unknown status: {status}")
-                time.sleep(delay)
+def _download_budget(timeout: Optional[float]) -> Optional[Deadline]:
+    """Total time a download may take: ``timeout`` capped by the research deadline.
 
-        except Exception as e:
-            print(f"⚠️ Error checking progress: {e}")
-            time.sleep(delay)
+    The HTTP read timeout only bounds each read, so a body trickling in keeps a
+    download going past it; the chunk loop checks this instead.
+    """
+    deadline = current_deadline()
+    timeout = timeout if deadline is None else deadline.cap(timeout)
+    return Deadline(timeout) if timeout is not None else None
 
-    print("⏰ Timeout waiting for snapshot completion")
-    return False
+
+def _check_budget(budget: Optional[Deadline], size: int):
+    if budget is not None and budget.expired():
+        metrics.inc("timeouts_total", operation="snapshot_download")
+        raise TimeoutError(f"download still running after {budget.budget:.1f}s ({size} bytes read), giving up")
+
+
+def _downloaded(current, accumulator: RecordAccumulator, size: int) -> List[Any]:
+    data = accumulator.result()
+    current.set_attribute("snapshot.records", accumulator.seen)
+    current.set_attribute("snapshot.kept", len(data))
+    current.set_attribute("snapshot.bytes", size)
+    metrics.inc("snapshot_records_total", len(data), outcome="kept")
+    metrics.inc("snapshot_records_total", accumulator.seen - len(data), outcome="discarded")
+    if accumulator.reducer is None:
+        log(f"🎉 Successfully downloaded {len(data)} items")
+    else:
+        log(f"🎉 Successfully downloaded {accumulator.seen} items, kept {len(data)}")
+    return data
 
 
 def download_snapshot(
-    snapshot_id: str, format: str = "json"
+    snapshot_id: str, format: Optional[str] = None, timeout: Optional[float] = None, reducer: Optional[RecordReducer] = None
 ) -> Optional[List[Dict[Any, Any]]]:
-    api_key = os.getenv("BRIGHTDATA_API_KEY")
-    download_url = (
-        f"https://api.brightdata.com/datasets/v3/snapshot/{snapshot_id}?format={format}"
-    )
-    headers = {"Authorization": f"Bearer {api_key}"}
+    """Stream a snapshot's records, keeping what ``reducer`` selects (all of them without one).
 
+    Records are parsed chunk by chunk while the body downloads, so peak memory is
+    the kept records plus one chunk rather than the whole payload and a copy.
+    """
     try:
-        print("📥 Downloading snapshot data...")
+        log("📥 Downloading snapshot data...")
+        budget = _download_budget(timeout)
+        with span("snapshot.download", snapshot_id=snapshot_id) as current:
+            response = get_client().get(
+                "snapshot", timeout=timeout, snapshot_id=snapshot_id,
+                params={"format": format or snapshot_format()}, stream=True,
+            )
+            try:
+                response.raise_for_status()
+                parser, accumulator, size = RecordParser(), RecordAccumulator(reducer), 0
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    size += len(chunk)
+                    _check_budget(budget, size)
+                    for record in parser.feed(chunk):
+                        accumulator.add(record)
+                for record in parser.close():
+                    accumulator.add(record)
+            finally:
+                response.close()
+            return _downloaded(current, accumulator, size)
 
-        response = requests.get(download_url, headers=headers)
-        response.raise_for_status()
+    except Exception as e:
+        log(f"❌ Error downloading snapshot: {e}", level="error")
+        return None
 
-        data = response.json()
-        print(
-            f"🎉 Successfully downloaded {len(data) if isinstance(data, list) else 1} items"
-        )
 
-        return data
+async def adownload_snapshot(
+    snapshot_id: str, format: Optional[str] = None, timeout: Optional[float] = None, reducer: Optional[RecordReducer] = None
+) -> Optional[List[Dict[Any, Any]]]:
+    try:
+        log("📥 Downloading snapshot data...")
+        budget = _download_budget(timeout)
+        with span("snapshot.download", snapshot_id=snapshot_id) as current:
+            response = await get_client().aget(
+                "snapshot", timeout=timeout, snapshot_id=snapshot_id,
+                params={"format": format or snapshot_format()}, stream=True,
+            )
+            try:
+                response.raise_for_status()
+                parser, accumulator, size = RecordParser(), RecordAccumulator(reducer), 0
+                async for chunk in response.aiter_content(STREAM_CHUNK_SIZE):
+                    size += len(chunk)
+                    _check_budget(budget, size)
+                    for record in parser.feed(chunk):
+                        accumulator.add(record)
+                for record in parser.close():
+                    accumulator.add(record)
+            finally:
+                response.close()
+            return _downloaded(current, accumulator, size)
 
     except Exception as e:
-        print(f"❌ Error downloading snapshot: {e}")
-        return None
\ No newline at end of file
+        log(f"❌ Error downloading snapshot: {e}", level="error")
+        return None
+
+
+metrics.describe("snapshot_records_total", "Records parsed from snapshot downloads, kept or discarded by the reducer")
@@ -0,0 +1,297 @@
+"""One scheduler for every outstanding BrightData snapshot in the process.
+
+Instead of each research request running its own trigger -> poll -> download loop,
+callers hand their dataset trigger to the ``SnapshotManager`` and wait on a future:
+
+  - identical in-flight triggers (same dataset params and inputs) share one snapshot
+  - a single scheduler thread polls all outstanding snapshot IDs, each on its own
+    backoff schedule, never issuing more than SNAPSHOT_POLL_RATE progress requests
+    per second in total, on SNAPSHOT_POLL_WORKERS threads of their own so they never
+    wait behind a long download
+  - downloads start as soon as a snapshot is ready, and every waiter's future is
+    resolved with the same raw data
+
+Each waiter keeps its own deadline; a shared job lives until the last waiter's
+deadline. Set SNAPSHOT_MANAGER_DISABLED=1 to go back to one loop per request.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from deadline import Deadline, set_current_deadline
+from http_client import get_client
+from rate_limiter import DEFAULT_PRIORITY, set_current_priority
+from snapshot_Operations import BACKOFF_SCHEDULE, _backoff_interval, check_snapshot_progress, download_snapshot
+from snapshot_stream import RecordReducer
+from telemetry import log, metrics
+
+# Progress requests per second across all snapshots
+DEFAULT_POLL_RATE = 10
+# Threads doing the trigger/download HTTP calls for the scheduler
+DEFAULT_WORKERS = 8
+# Threads doing its progress requests: short calls, kept apart from downloads of up to 30s
+DEFAULT_POLL_WORKERS = 2
+# Longest gap between two checks of the same snapshot
+DEFAULT_MAX_INTERVAL = 2
+
+
+def job_key(params: Dict[str, Any], data: Any) -> str:
+    """Identity of a trigger: same dataset params and inputs -> same snapshot"""
+    raw = json.dumps([params, data], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class SnapshotJob:
+    """One triggered snapshot and everyone waiting for it"""
+
+    def __init__(
+        self, key: str, params: Dict[str, Any], data: Any, operation_name: str, expires_at: float,
+        reducer: Optional[RecordReducer] = None,
+    ):
+        self.key = key
+        self.params = params
+        self.data = data
+        # Identical triggers are for the same dataset, so every waiter wants the same reduction
+        self.reducer = reducer
+        self.operation_name = operation_name
+        self.expires_at = expires_at
+        # Trigger/poll/download run in the first requester's context so their spans
+        # land in that research's trace; a job's steps never overlap. The requester's
+        # research deadline is dropped there: the job lives until its last waiter's.
+        # So is its rate-limit priority: confirmed requesters may join a job a
+        # speculative retrieval started, and must not queue at its priority.
+        self.context = contextvars.copy_context()
+        self.context.run(set_current_deadline, None)
+        self.context.run(set_current_priority, DEFAULT_PRIORITY)
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+        self.snapshot_id: Optional[str] = None
+        self.attempts = 0
+        self.next_check = 0.0
+        self.busy = True  # the trigger is in flight
+        self.waiters = 1
+        self.started = time.monotonic()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+class SnapshotManager:
+    def __init__(
+        self,
+        poll_rate: Optional[float] = None,
+        workers: Optional[int] = None,
+        poll_workers: Optional[int] = None,
+        schedule: Sequence[float] = BACKOFF_SCHEDULE,
+        max_interval: Optional[float] = DEFAULT_MAX_INTERVAL,
+    ):
+        self.poll_rate = poll_rate or float(os.getenv("SNAPSHOT_POLL_RATE", DEFAULT_POLL_RATE))
+        self.schedule = schedule
+        self.max_interval = max_interval
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers or int(os.getenv("SNAPSHOT_MANAGER_WORKERS", DEFAULT_WORKERS)),
+            thread_name_prefix="snapshot-manager",
+        )
+        self._poll_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=poll_workers or int(os.getenv("SNAPSHOT_POLL_WORKERS", DEFAULT_POLL_WORKERS)),
+            thread_name_prefix="snapshot-poller",
+        )
+        self._jobs: Dict[str, SnapshotJob] = {}
+        self._recent_polls: collections.deque = collections.deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def outstanding(self) -> int:
+        with self._cond:
+            return len(self._jobs)
+
+    def submit(
+        self, params: Dict[str, Any], data: Any, deadline: Deadline, operation_name: str = "operation",
+        reducer: Optional[RecordReducer] = None,
+    ) -> concurrent.futures.Future:
+        """Future of the snapshot's records (None on failure/timeout), shared with identical in-flight triggers.
+
+        ``reducer`` picks what is kept of the records while they download (see snapshot_stream).
+        """
+        key = job_key(params, data)
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is not None and not job.future.done():
+                job.waiters += 1
+                job.expires_at = max(job.expires_at, deadline.expires_at)
+                metrics.inc("snapshot_manager_deduplicated_total")
+                log(f"🔗 {operation_name}: joined in-flight snapshot ({job.waiters} waiters)")
+                return job.future
+
+            job = SnapshotJob(key, params, data, operation_name, deadline.expires_at, reducer)
+            self._jobs[key] = job
+            metrics.set("snapshot_manager_outstanding", len(self._jobs))
+            self._ensure_scheduler()
+
+        self._executor.submit(job.context.run, self._trigger, job)
+        return job.future
+
+    def fetch(
+        self, params: Dict[str, Any], data: Any, deadline: Deadline, operation_name: str = "operation",
+        reducer: Optional[RecordReducer] = None,
+    ) -> Optional[Any]:
+        """Blocking wait for the snapshot's records within the caller's deadline"""
+        future = self.submit(params, data, deadline, operation_name, reducer)
+        try:
+            return future.result(timeout=deadline.remaining())
+        except concurrent.futures.TimeoutError:
+            log(f"⏰ {operation_name} snapshot not ready within {deadline.budget:.0f}s", level="warning")
+            return None
+
+    async def afetch(
+        self, params: Dict[str, Any], data: Any, deadline: Deadline, operation_name: str = "operation",
+        reducer: Optional[RecordReducer] = None,
+    ) -> Optional[Any]:
+        """``fetch`` for the event loop: waits on the shared future without blocking it"""
+        future = self.submit(params, data, deadline, operation_name, reducer)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), deadline.remaining())
+        except asyncio.TimeoutError:
+            log(f"⏰ {operation_name} snapshot not ready within {deadline.budget:.0f}s", level="warning")
+            return None
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._executor.shutdown(wait=False)
+        self._poll_executor.shutdown(wait=False)
+
+    def _ensure_scheduler(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="snapshot-scheduler", daemon=True)
+            self._thread.start()
+
+    def _resolve(self, job: SnapshotJob, result: Optional[Any], outcome: str):
+        with self._cond:
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+            metrics.set("snapshot_manager_outstanding", len(self._jobs))
+            self._cond.notify_all()
+        metrics.inc("snapshot_manager_jobs_total", outcome=outcome)
+        metrics.observe("snapshot_manager_job_seconds", time.monotonic() - job.started, outcome=outcome)
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def _reschedule(self, job: SnapshotJob):
+        with self._cond:
+            job.next_check = time.monotonic() + _backoff_interval(max(job.attempts, 1), self.schedule, self.max_interval)
+            job.busy = False
+            self._cond.notify_all()
+
+    def _trigger(self, job: SnapshotJob):
+        try:
+            response = get_client().post("trigger", timeout=job.remaining(), params=job.params, json=job.data)
+            response.raise_for_status()
+            snapshot_id = response.json().get("snapshot_id")
+        except Exception as e:
+            log(f"❌ {job.operation_name} trigger failed: {e}", level="error")
+            self._resolve(job, None, "trigger_failed")
+            return
+
+        if not snapshot_id:
+            log(f"❌ No snapshot ID for {job.operation_name}", level="error")
+            self._resolve(job, None, "trigger_failed")
+            return
+
+        job.snapshot_id = snapshot_id
+        self._reschedule(job)
+
+    def _check(self, job: SnapshotJob):
+        """Poll on a poller thread, then hand a ready snapshot's download to the main workers"""
+        if job.context.run(self._poll, job):
+            self._executor.submit(job.context.run, self._download, job)
+
+    def _poll(self, job: SnapshotJob) -> bool:
+        """True when the snapshot is ready to download"""
+        job.attempts += 1
+        try:
+            status = check_snapshot_progress(job.snapshot_id, timeout=job.remaining())
+        except Exception as e:
+            metrics.inc("retries_total", operation="snapshot_progress")
+            log(f"⚠️ Error checking progress: {e}", level="warning")
+            self._reschedule(job)
+            return False
+
+        if status == "ready":
+            log(f"✅ Snapshot {job.snapshot_id} ready after {job.attempts} checks")
+            return True
+        if status == "failed":
+            log(f"❌ Snapshot {job.snapshot_id} failed", level="error")
+            self._resolve(job, None, "failed")
+        else:
+            self._reschedule(job)
+        return False
+
+    def _download(self, job: SnapshotJob):
+        if job.remaining() <= 0:
+            self._resolve(job, None, "timeout")
+            return
+        data = download_snapshot(job.snapshot_id, timeout=job.remaining(), reducer=job.reducer)
+        self._resolve(job, data, "ready" if data is not None else "download_failed")
+
+    def _run(self):
+        """Scheduler loop: expire jobs, dispatch due polls within the rate limit, sleep until the next one"""
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = time.monotonic()
+
+                for job in [job for job in self._jobs.values() if not job.busy and job.remaining() <= 0]:
+                    metrics.inc("timeouts_total", operation="snapshot_wait")
+                    log(f"⏰ Timeout waiting for snapshot {job.snapshot_id} after {job.attempts} checks", level="warning")
+                    job.busy = True
+                    self._executor.submit(self._resolve, job, None, "timeout")
+
+                while self._recent_polls and now - self._recent_polls[0] >= 1.0:
+                    self._recent_polls.popleft()
+                allowed = max(0, int(self.poll_rate) - len(self._recent_polls))
+
+                due = sorted(
+                    (job for job in self._jobs.values() if not job.busy and job.next_check <= now),
+                    key=lambda job: job.next_check,
+                )
+                for job in due[:allowed]:
+                    job.busy = True
+                    self._recent_polls.append(now)
+                    self._poll_executor.submit(self._check, job)
+
+                waits = [1.0]
+                pending = [job for job in self._jobs.values() if not job.busy]
+                if len(due) > allowed and self._recent_polls:
+                    # Rate limited: wake when the oldest poll leaves the 1s window
+                    waits.append(1.0 - (now - self._recent_polls[0]))
+                waits += [job.next_check - now for job in pending]
+                waits += [job.remaining() for job in pending]
+                self._cond.wait(max(0.01, min(waits)))
+
+
+_manager: Optional[SnapshotManager] = None
+_manager_lock = threading.Lock()
+
+
+def snapshot_manager_enabled() -> bool:
+    return os.getenv("SNAPSHOT_MANAGER_DISABLED", "").lower() not in ("1", "true", "yes")
+
+
+def get_snapshot_manager() -> SnapshotManager:
+    """Process-wide snapshot manager, created on first use"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = SnapshotManager()
+    return _manager
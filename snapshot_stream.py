@@ -0,0 +1,163 @@
+"""Incremental parsing of snapshot downloads.
+
+Snapshots are read in chunks as they arrive instead of as one ``response.json()``:
+``RecordParser`` turns bytes into records for NDJSON/JSONL bodies (one record per
+line) and for plain JSON arrays alike, so the parser works whichever format the
+server sent. A ``RecordReducer`` then keeps only what the caller will use: each
+record is cut down to a few fields on arrival and a bounded heap holds the top N
+by score (per group, e.g. per post), so memory stays O(N) however large the
+snapshot is, and parsing overlaps with the transfer.
+"""
+import heapq
+import itertools
+import json
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = b" \t\r\n"
+
+
+class RecordParser:
+    """Feed it chunks of a snapshot body; get back the records completed so far"""
+
+    def __init__(self):
+        self._buffer = b""
+        self._array: Optional[bool] = None  # None until the first byte tells JSON array from NDJSON
+        self._text = ""  # undecoded tail of a JSON array body
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        if self._array is None:
+            self._buffer += chunk
+            start = self._buffer.lstrip(_WHITESPACE)
+            if not start:
+                return []
+            self._array = start.startswith(b"[")
+            chunk, self._buffer = self._buffer, b""
+            if self._array:
+                chunk = start[1:]
+        return self._feed_array(chunk) if self._array else self._feed_lines(chunk)
+
+    def close(self) -> List[Any]:
+        """Records left at the end of the body (a last line without a newline)"""
+        if self._array:
+            if self._text.strip(" \t\r\n,]"):
+                raise ValueError("snapshot body ended inside a JSON record")
+            return []
+        tail, self._buffer = self._buffer, b""
+        return [json.loads(tail)] if tail.strip() else []
+
+    def _feed_lines(self, chunk: bytes) -> List[Any]:
+        lines = (self._buffer + chunk).split(b"\n")
+        self._buffer = lines.pop()
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def _feed_array(self, chunk: bytes) -> List[Any]:
+        # A multi-byte character may straddle two chunks: keep incomplete bytes back
+        data = self._buffer + chunk
+        try:
+            self._text += data.decode()
+            self._buffer = b""
+        except UnicodeDecodeError as e:
+            self._text += data[:e.start].decode()
+            self._buffer = data[e.start:]
+
+        records, position, text = [], 0, self._text
+        while True:
+            while position < len(text) and text[position] in " \t\r\n,":
+                position += 1
+            if position >= len(text) or text[position] == "]":
+                break
+            try:
+                record, position = _decoder.raw_decode(text, position)
+            except json.JSONDecodeError:
+                break  # record not complete yet
+            records.append(record)
+        self._text = text[position:]
+        return records
+
+
+class TopN:
+    """Bounded min-heap keeping the ``n`` highest-scoring items seen"""
+
+    def __init__(self, n: int, score: Callable[[Any], float]):
+        self.n = n
+        self.score = score
+        self._heap: list = []
+        self._order = itertools.count()  # ties keep arrival order and never compare items
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, item: Any) -> bool:
+        """Offer an item; False if it did not make the top N"""
+        entry = (self.score(item), -next(self._order), item)
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, entry)
+            return True
+        if entry[:2] <= self._heap[0][:2]:
+            return False
+        heapq.heapreplace(self._heap, entry)
+        return True
+
+    def items(self) -> List[Any]:
+        """Kept items, highest score first"""
+        return [item for _, _, item in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+class RecordReducer:
+    """What to keep of a snapshot's records.
+
+    ``extract`` cuts a record down to the fields callers read (records it returns
+    None for are skipped); with ``top_n`` only the best ``score`` ones are kept, per
+    ``group`` when given. The reducer itself is stateless: every download gets its
+    own ``accumulator()``.
+    """
+
+    def __init__(
+        self,
+        extract: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+        score: Optional[Callable[[Dict[str, Any]], float]] = None,
+        top_n: Optional[int] = None,
+        group: Optional[Callable[[Dict[str, Any]], Hashable]] = None,
+    ):
+        self.extract = extract
+        self.score = score
+        self.top_n = top_n
+        self.group = group
+
+    def accumulator(self) -> "RecordAccumulator":
+        return RecordAccumulator(self)
+
+
+class RecordAccumulator:
+    def __init__(self, reducer: Optional[RecordReducer] = None):
+        self.reducer = reducer
+        self.seen = 0
+        self._records: List[Any] = []
+        self._groups: Dict[Hashable, TopN] = {}
+
+    def add(self, record: Any):
+        self.seen += 1
+        reducer = self.reducer
+        if reducer is None:
+            self._records.append(record)
+            return
+        if not isinstance(record, dict):
+            return
+        record = reducer.extract(record)
+        if record is None:
+            return
+        if reducer.top_n is None:
+            self._records.append(record)
+            return
+        key = reducer.group(record) if reducer.group else None
+        top = self._groups.get(key)
+        if top is None:
+            top = self._groups[key] = TopN(reducer.top_n, reducer.score or (lambda _: 0))
+        top.push(record)
+
+    def result(self) -> List[Any]:
+        """Kept records: groups in order of first appearance, best first within each"""
+        if self._groups:
+            return [record for top in self._groups.values() for record in top.items()]
+        return self._records
@@ -2,23 +2,25 @@ import streamlit as st
 import asyncio
 import threading
 import time
+import uuid
 from typing import Dict, Any
 
-# Add error handling for the import
+# The app is a client of the research server (an embedded one unless RESEARCH_SERVER_URL is set)
 try:
-    from main import graph
+    from research_client import graph_nodes, stream_research
+    NODES = graph_nodes()
     GRAPH_AVAILABLE = True
 except ImportError as e:
-    st.error(f"❌ Failed to import main.py: {e}")
-    st.error("Make sure main.py exists and has no syntax errors")
+    st.error(f"❌ Failed to import the research client: {e}")
+    st.error("Make sure main.py and research_server.py exist and have no syntax errors")
     GRAPH_AVAILABLE = False
 except Exception as e:
-    st.error(f"❌ Error importing main.py: {e}")
+    st.error(f"❌ Error connecting to the research server: {e}")
     GRAPH_AVAILABLE = False
 
 # Stop execution if import failed
 if not GRAPH_AVAILABLE:
-    st.error("Cannot proceed without main.py. Please fix the import error.")
+    st.error("Cannot proceed without the research server. Please fix the error above.")
     st.stop()
 
 # Configure page
@@ -99,6 +101,10 @@ if "messages" not in st.session_state:
 if "research_history" not in st.session_state:
     st.session_state.research_history = []
 
+# Each browser session is its own tenant for the server's per-tenant limits
+if "tenant" not in st.session_state:
+    st.session_state.tenant = f"streamlit-{uuid.uuid4().hex[:12]}"
+
 # Sidebar
 with st.sidebar:
     st.markdown("## 🔍 AI Research Agent")
@@ -120,6 +126,7 @@ with st.sidebar:
     
     st.markdown("### ⚙️ Settings")
     show_progress = st.checkbox("Show detailed progress", value=True)
+    stream_analyses = st.checkbox("Stream per-source analyses", value=False)
     max_history = st.slider("Max chat history", 5, 50, 20)
     
     st.markdown("### 📈 Statistics")
@@ -127,6 +134,20 @@ with st.sidebar:
         st.metric("Total Researches", len(st.session_state.research_history))
         avg_time = sum([r.get("duration", 0) for r in st.session_state.research_history]) / len(st.session_state.research_history)
         st.metric("Avg Research Time", f"{avg_time:.1f}s")
+        ttfts = [r["time_to_first_token"] for r in st.session_state.research_history if r.get("time_to_first_token")]
+        if ttfts:
+            st.metric("Avg Time to First Token", f"{sum(ttfts) / len(ttfts):.1f}s")
+        first_answers = [r["time_to_first_answer"] for r in st.session_state.research_history if r.get("time_to_first_answer")]
+        if first_answers:
+            st.metric("Avg Time to First Answer", f"{sum(first_answers) / len(first_answers):.1f}s")
+
+        last_nodes = st.session_state.research_history[-1].get("nodes")
+        if last_nodes:
+            with st.expander("⏱️ Last research by node"):
+                st.table([
+                    {"node": node, "seconds": round(info["elapsed"], 2), "KB": round(info["payload_bytes"] / 1024, 1)}
+                    for node, info in last_nodes.items()
+                ])
     
     if st.button("🗑️ Clear History"):
         st.session_state.messages = []
@@ -164,65 +185,122 @@ with chat_container:
             </div>
             """, unsafe_allow_html=True)
 
+def render_assistant_message(placeholder, content: str, streaming: bool = False):
+    """Render (or re-render) an assistant bubble; a cursor marks a still-streaming answer"""
+    cursor = " ▌" if streaming else ""
+    placeholder.markdown(f"""
+    <div class="chat-message assistant-message">
+        <strong>🤖 AI Research Agent:</strong><br>
+        <span style="color: #7b1fa2 !important;">{content}{cursor}</span>
+    </div>
+    """, unsafe_allow_html=True)
+
+NODE_LABELS = {
+    "google_search": "🌐 Searching Google",
+    "bing_search": "🔎 Searching Bing",
+    "reddit_search": "💬 Searching Reddit",
+    "analyze_reddit_posts": "🔍 Selecting Reddit posts",
+    "retrieve_reddit_posts": "📥 Retrieving detailed content",
+    "analyze_google_results": "🧠 Analyzing Google results",
+    "analyze_bing_results": "🧠 Analyzing Bing results",
+    "analyze_reddit_results": "🧠 Analyzing Reddit discussions",
+    "synthesize_results_fast": "🎯 Synthesizing final answer",
+    "update_synthesis": "🔄 Adding late sources",
+}
+
+def render_progress(progress_placeholder, status_placeholder, running: dict, finished: dict, skipped: dict = None):
+    """Progress bar and status from real node start/finish events"""
+    progress_placeholder.progress(min(1.0, len(finished) / len(NODES)))
+    lines = [
+        f"{NODE_LABELS.get(node, node)}... ({time.time() - started:.1f}s)"
+        for node, started in running.items()
+    ]
+    lines += [
+        f"✅ {NODE_LABELS.get(node, node)}: {info['elapsed']:.1f}s, {info['payload_bytes'] / 1024:.1f} KB"
+        for node, info in finished.items()
+    ]
+    lines += [
+        f"⏰ {branch.replace('_branch', '').capitalize()} dropped at the research deadline" if status == "dropped"
+        else f"🐢 {branch.replace('_branch', '').capitalize()} still running, will follow as an update"
+        for branch, status in (skipped or {}).items()
+    ]
+    status_placeholder.markdown(f"""
+    <div class="status-info">
+        {"<br>".join(lines)}
+    </div>
+    """, unsafe_allow_html=True)
+
 # Research function
-def perform_research(question: str, progress_placeholder, status_placeholder):
-    """Perform research using the graph"""
+def perform_research(question: str, progress_placeholder, status_placeholder, answer_placeholder):
+    """Perform research using the graph, rendering progress and the answer as they happen"""
     start_time = time.time()
     
     try:
-        # Create initial state
-        state = {
-            "messages": [{"role": "user", "content": question}],
-            "user_question": question,
-            "google_results": None,
-            "bing_results": None,
-            "reddit_results": None,
-            "selected_reddit_urls": None,
-            "reddit_post_data": None,
-            "google_analysis": None,
-            "bing_analysis": None,
-            "reddit_analysis": None,
-            "final_answer": None
-        }
-        
-        if show_progress:
-            # Show progress steps
-            progress_steps = [
-                "🌐 Searching Google...",
-                "🔎 Searching Bing...", 
-                "💬 Searching Reddit...",
-                "🔍 Analyzing Reddit posts...",
-                "📥 Retrieving detailed content...",
-                "🧠 Analyzing Google results...",
-                "🧠 Analyzing Bing results...",
-                "🧠 Analyzing Reddit discussions...",
-                "🎯 Synthesizing final answer..."
-            ]
-            
-            for i, step in enumerate(progress_steps):
-                progress_placeholder.progress((i + 1) / len(progress_steps))
-                status_placeholder.markdown(f"""
-                <div class="status-info">
-                    <strong>{step}</strong>
-                </div>
-                """, unsafe_allow_html=True)
-                time.sleep(0.5)  # Simulate processing time
-        
-        # Execute the research
-        progress_placeholder.progress(0.9)
         status_placeholder.markdown("""
         <div class="status-info">
-            <strong>🎯 Generating comprehensive answer...</strong>
+            <strong>🔍 Starting research...</strong>
         </div>
         """, unsafe_allow_html=True)
         
-        final_state = graph.invoke(state)
+        final_state = None
+        trace_id = None
+        time_to_first_token = None
+        time_to_first_answer = None
+        answer_parts = []
+        analysis_parts = {}
+        running_nodes = {}
+        finished_nodes = {}
+        skipped_branches = {}
+
+        for event in stream_research(question, stream_analyses=stream_analyses, tenant=st.session_state.tenant):
+            if event["type"] == "progress":
+                if event["status"] == "start":
+                    running_nodes[event["node"]] = time.time()
+                elif event["status"] == "dropped":
+                    # The dropped branch's running nodes will not report back; other branches' still will
+                    skipped_branches[event["node"]] = "dropped"
+                    source = event["node"].replace("_branch", "")
+                    for node in [node for node in running_nodes if source in node.split("_")]:
+                        del running_nodes[node]
+                elif event["status"] == "late":
+                    skipped_branches[event["node"]] = "late"
+                else:
+                    running_nodes.pop(event["node"], None)
+                    finished_nodes[event["node"]] = {
+                        "elapsed": event.get("elapsed", 0.0),
+                        "payload_bytes": event.get("payload_bytes", 0),
+                    }
+                if show_progress:
+                    render_progress(progress_placeholder, status_placeholder, running_nodes, finished_nodes, skipped_branches)
+            elif event["type"] == "metric" and event["name"] == "time_to_first_token":
+                time_to_first_token = event["value"]
+            elif event["type"] == "metric" and event["name"] == "time_to_first_answer":
+                time_to_first_answer = event["value"]
+            elif event["type"] == "token" and event["source"] == "synthesis":
+                # 🚀 Render the answer incrementally as tokens arrive
+                answer_parts.append(event["text"])
+                render_assistant_message(answer_placeholder, "".join(answer_parts), streaming=True)
+            elif event["type"] == "token":
+                analysis_parts.setdefault(event["source"], []).append(event["text"])
+                status_placeholder.markdown(f"""
+                <div class="status-info">
+                    <strong>🧠 {event["source"].capitalize()} analysis:</strong> {"".join(analysis_parts[event["source"]])}
+                </div>
+                """, unsafe_allow_html=True)
+            elif event["type"] == "trace":
+                trace_id = event["trace_id"]
+            elif event["type"] == "final":
+                final_state = event["state"]
+            elif event["type"] == "error":
+                raise event["error"]
         
         # Complete progress
         progress_placeholder.progress(1.0)
-        status_placeholder.markdown("""
+        cached = (final_state or {}).get("answer_cache")
+        completed = f"💾 Answered from cache ({cached['match']} match)" if cached else "✅ Research completed successfully!"
+        status_placeholder.markdown(f"""
         <div class="status-info">
-            <strong>✅ Research completed successfully!</strong>
+            <strong>{completed}</strong>
         </div>
         """, unsafe_allow_html=True)
         
@@ -232,6 +310,10 @@ def perform_research(question: str, progress_placeholder, status_placeholder):
         st.session_state.research_history.append({
             "question": question,
             "duration": duration,
+            "time_to_first_token": time_to_first_token,
+            "time_to_first_answer": time_to_first_answer,
+            "trace_id": trace_id,
+            "nodes": finished_nodes,
             "timestamp": time.time()
         })
         
@@ -265,13 +347,14 @@ if submit_button and user_input:
     if len(st.session_state.messages) > max_history * 2:
         st.session_state.messages = st.session_state.messages[-max_history * 2:]
     
-    # Create placeholders for progress and status
+    # Create placeholders for progress, status and the streaming answer
     progress_placeholder = st.progress(0)
     status_placeholder = st.empty()
+    answer_placeholder = st.empty()
     
     # Perform research
     with st.spinner("🔍 Researching your question..."):
-        answer, duration = perform_research(user_input, progress_placeholder, status_placeholder)
+        answer, duration = perform_research(user_input, progress_placeholder, status_placeholder, answer_placeholder)
     
     # Clear progress indicators
     progress_placeholder.empty()
@@ -317,9 +400,10 @@ if not st.session_state.messages:
         
         progress_placeholder = st.progress(0)
         status_placeholder = st.empty()
+        answer_placeholder = st.empty()
         
         with st.spinner("🔍 Researching your question..."):
-            answer, duration = perform_research(user_input, progress_placeholder, status_placeholder)
+            answer, duration = perform_research(user_input, progress_placeholder, status_placeholder, answer_placeholder)
         
         progress_placeholder.empty()
         status_placeholder.empty()
@@ -0,0 +1,413 @@
+"""Tracing and metrics for the research pipeline.
+
+Spans form one trace per research session (``new_trace``) and nest through
+``span(...)`` context managers around graph nodes, LLM calls, snapshot poll ticks and
+HTTP calls. The current span lives in a ``ContextVar``, so it follows asyncio tasks
+and LangGraph's worker threads. Finished spans go to the configured exporters:
+
+  - TELEMETRY_TRACES_FILE=path: OTLP/JSON lines (one ``resourceSpans`` document per
+    span), readable by the OpenTelemetry collector's file receiver
+  - ``InMemorySpanExporter`` for benchmarks and ad-hoc analysis
+
+Counters and histograms (request/timeout/retry counts, span durations) are kept in
+``metrics`` and rendered in the Prometheus text format, either on demand
+(``metrics.render_prometheus()``) or by a local endpoint started with
+TELEMETRY_METRICS_PORT=9464 (``GET /metrics``).
+
+``log(...)`` replaces bare prints: the message becomes an event on the current span
+and is printed prefixed with the short trace ID (TELEMETRY_CONSOLE=0 silences it).
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import math
+import os
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SERVICE_NAME = "ai-research-agent"
+
+# Seconds; covers fast cache hits up to the slowest snapshot waits
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, kind: str = "internal", **attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = {key: value for key, value in attributes.items() if value is not None}
+        self.events: List[Tuple[int, str, Dict[str, Any]]] = []
+        self.status = "ok"
+        self.status_message: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        self.events.append((time.time_ns(), name, attributes))
+
+    def set_error(self, message: str):
+        self.status = "error"
+        self.status_message = message
+
+    def record_exception(self, error: BaseException):
+        self.add_event("exception", **{"exception.type": type(error).__name__, "exception.message": str(error)})
+        self.set_error(str(error))
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _OTLP_KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "events": [
+                {"timeUnixNano": str(ts), "name": name, "attributes": _otlp_attributes(attrs)}
+                for ts, name, attrs in self.events
+            ],
+            "status": {"code": 2 if self.status == "error" else 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+    def __repr__(self) -> str:
+        return f"Span({self.name!r}, trace={self.trace_id[:8]}, {self.duration:.3f}s, {self.status})"
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+class JsonlSpanExporter:
+    """Appends each finished span to a file as an OTLP/JSON ``resourceSpans`` line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Span):
+        document = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{"scope": {"name": "research-agent"}, "spans": [span.to_otlp()]}],
+            }]
+        }
+        line = json.dumps(document, ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class InMemorySpanExporter:
+    """Keeps finished spans in a list"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms with Prometheus text rendering"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._gauges: Dict[str, Dict[Tuple, float]] = {}
+        self._histograms: Dict[str, Dict[Tuple, List[float]]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # [count per bucket..., +Inf count, sum]
+            state = series.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[len(self.buckets)] += 1
+            state[-1] += value
+
+    def value(self, name: str, **labels) -> float:
+        """Current value of a counter or gauge series (0 if never touched)"""
+        key = _label_key(labels)
+        with self._lock:
+            if name in self._gauges:
+                return self._gauges[name].get(key, 0)
+            return self._counters.get(name, {}).get(key, 0)
+
+    def total(self, name: str) -> float:
+        """Sum of a counter across all label sets"""
+        with self._lock:
+            return sum(self._counters.get(name, {}).values())
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(metrics):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for labels, value in sorted(metrics[name].items()):
+                        lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+            for name in sorted(self._histograms):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, state in sorted(self._histograms[name].items()):
+                    for index, bound in enumerate(self.buckets):
+                        lines.append(f"{name}_bucket{_format_labels(labels, (('le', _format_number(bound)),))} {state[index]}")
+                    count = state[len(self.buckets)]
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(state[-1])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("research_span_duration_seconds", "Duration of traced operations by span name and status")
+metrics.describe("brightdata_requests_total", "BrightData HTTP calls by endpoint and outcome")
+metrics.describe("timeouts_total", "Operations that ran out of time")
+metrics.describe("retries_total", "Operations repeated after a failure")
+metrics.describe("llm_calls_total", "Chat model calls by model, node and cache outcome")
+metrics.describe("llm_input_tokens_total", "Prompt tokens sent per graph node")
+
+_exporters: List[Any] = []
+_exporters_lock = threading.Lock()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def add_exporter(exporter):
+    with _exporters_lock:
+        _exporters.append(exporter)
+    return exporter
+
+
+def remove_exporter(exporter):
+    with _exporters_lock:
+        if exporter in _exporters:
+            _exporters.remove(exporter)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def _finish(span: Span):
+    span.end_ns = time.time_ns()
+    metrics.observe("research_span_duration_seconds", span.duration, span=span.name, status=span.status)
+    with _exporters_lock:
+        exporters = list(_exporters)
+    for exporter in exporters:
+        try:
+            exporter.export(span)
+        except Exception as e:
+            print(f"⚠️ Span export failed: {e}")
+
+
+@contextlib.contextmanager
+def span(name: str, kind: str = "internal", **attributes) -> Iterator[Span]:
+    """Time a block as a child of the current span (or as the root of a new trace)"""
+    parent = _current_span.get()
+    current = Span(
+        name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        parent_id=parent.span_id if parent else None,
+        kind=kind,
+        **attributes,
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # A generator closed from another context (e.g. abandoned stream)
+            _current_span.set(parent)
+        _finish(current)
+
+
+@contextlib.contextmanager
+def new_trace(name: str, **attributes) -> Iterator[Span]:
+    """Start a fresh trace, detached from whatever span is current"""
+    token = _current_span.set(None)
+    try:
+        with span(name, **attributes) as root:
+            yield root
+    finally:
+        _current_span.reset(token)
+
+
+def traced(name: str, **attributes):
+    """Decorator running a sync or async function inside ``span(name)``"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _console_enabled() -> bool:
+    return os.getenv("TELEMETRY_CONSOLE", "1").lower() not in ("0", "false", "no")
+
+
+def log(message: str, level: str = "info", **attributes):
+    """Record a message on the current span and echo it with its trace ID"""
+    current = _current_span.get()
+    if current is not None:
+        current.add_event(message, level=level, **attributes)
+        if level == "error":
+            current.set_error(message)
+    if _console_enabled():
+        prefix = f"[{current.trace_id[:8]}] " if current is not None else ""
+        print(f"{prefix}{message}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``GET /metrics`` in Prometheus text format from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
+    print(f"📈 Metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def configure_from_env():
+    """Set up exporters from TELEMETRY_TRACES_FILE / TELEMETRY_METRICS_PORT once per process"""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        _configured = True
+        traces_file = os.getenv("TELEMETRY_TRACES_FILE")
+        if traces_file:
+            add_exporter(JsonlSpanExporter(traces_file))
+        port = os.getenv("TELEMETRY_METRICS_PORT")
+        if port:
+            try:
+                serve_metrics(int(port))
+            except OSError as e:
+                print(f"⚠️ Metrics exporter not started on port {port}: {e}")
@@ -1,47 +1,100 @@
-from dotenv import load_dotenv
-import os 
+import asyncio
+import os
 import requests
 from urllib.parse import quote
 import time
 import concurrent.futures
-load_dotenv()
-from snapshot_Operations import poll_snapshot_status, download_snapshot
-
-def _make_api_request(url, timeout=20, **kwargs):
-    """Optimized API request with timeout and retry logic"""
-    api_key = os.getenv("BRIGHTDATA_API_KEY")
+import contextvars
+import threading
+from deadline import stage_deadline
+from http_client import get_client
+from result_cache import get_cache, make_key, normalize_query
+from telemetry import log, metrics, traced
+from post_batcher import PostBatcher, normalize_post_url, post_batching_enabled, post_url_of
+from post_speculation import PostSpeculator
+from rate_limiter import request_priority
+from snapshot_manager import get_snapshot_manager, snapshot_manager_enabled
+from snapshot_Operations import wait_for_snapshot, await_for_snapshot, download_snapshot, adownload_snapshot
+from snapshot_stream import RecordReducer
+from reddit_records import RedditComment, RedditPost, top_k
+
+class ApiRequestError(Exception):
+    """A BrightData call that failed for good (after retries); the message says why"""
+
+def _request_error(e, timeout):
+    """What went wrong, in words that can go in front of the user"""
+    if isinstance(e, (requests.exceptions.Timeout, asyncio.TimeoutError)):
+        return ApiRequestError(f"timed out after {timeout:.0f}s" if timeout else "timed out")
+    response = getattr(e, "response", None)
+    if response is not None and response.status_code == 429:
+        return ApiRequestError("rate limited by BrightData after retries")
+    if response is not None:
+        return ApiRequestError(f"BrightData returned HTTP {response.status_code}")
+    return ApiRequestError(f"request failed ({e})")
+
+def _make_api_request(endpoint, timeout=20, **kwargs):
+    """Optimized API request over the shared keep-alive BrightData session.
+
+    The client already waits for the endpoint's rate limit and retries throttled or
+    unavailable calls; what still fails raises ApiRequestError instead of turning
+    into an empty result nobody can tell apart from "nothing found".
+    """
+    try:
+        response = get_client().post(endpoint, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        error = _request_error(e, timeout)
+        log(f"❌ API request failed: {error}", level="error")
+        raise error from e
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+async def _amake_api_request(endpoint, timeout=20, **kwargs):
+    """Async API request over the shared BrightData client"""
+    import aiohttp  # loaded by the client's first async call; kept off the import path
 
     try:
-        response = requests.post(url, headers=headers, timeout=timeout, **kwargs)
+        response = await get_client().apost(endpoint, timeout=timeout, **kwargs)
         response.raise_for_status()
         return response.json()
-    except requests.exceptions.Timeout:
-        print(f"⏰ API request timed out after {timeout}s")
-        return None
-    except requests.exceptions.RequestException as e:
-        print(f"❌ API request error: {e}")
+    except (asyncio.TimeoutError, aiohttp.ClientError, requests.exceptions.RequestException, ValueError) as e:
+        error = _request_error(e, timeout)
+        log(f"❌ API request failed: {error}", level="error")
+        raise error from e
+
+def _cached(namespace, key):
+    """Look up a cached result, printing hits so they show up next to the timing lines"""
+    cache = get_cache()
+    if cache is None:
         return None
-    except Exception as e:
-        print(f"❌ Unexpected error: {e}")
-        return None
-
-def serp_search(query, engine="google", timeout=15):
-    """Optimized SERP search with timeout"""
-    start_time = time.time()
-    
+    cached = cache.get(namespace, key)
+    metrics.inc("result_cache_lookups_total", namespace=namespace, outcome="hit" if cached is not None else "miss")
+    if cached is not None:
+        log(f"💾 {namespace} cache hit")
+    return cached
+
+def _store(namespace, key, value, ttl=None):
+    cache = get_cache()
+    if cache is not None:
+        cache.set(namespace, key, value, ttl=ttl)
+
+# The cache blocks on SQLite (and its lock); async callers keep it off the event loop
+async def _acached(namespace, key):
+    return await asyncio.to_thread(_cached, namespace, key)
+
+async def _astore(namespace, key, value, ttl=None):
+    await asyncio.to_thread(_store, namespace, key, value, ttl)
+
+def _serp_request(query, engine):
+    """Cache key and BrightData payload for a SERP search"""
     if engine == "google":
         base_url = "https://www.google.com/search"
     elif engine == "bing":
         base_url = "https://www.bing.com/search"
     else:
         raise ValueError("Unsupported search engine")
-    
-    url = "https://api.brightdata.com/request"
+
+    # 💾 Same normalized query on the same engine -> reuse the stored result
+    cache_key = make_key(normalize_query(query), engine=engine, num=10)
 
     # 🚀 Optimized payload - reduce data size
     payload = {
@@ -49,67 +102,165 @@ def serp_search(query, engine="google", timeout=15):
         "url": f"{base_url}?q={quote(query)}&brd_json=1&num=10",  # Limit to 10 results
         "format": "raw"
     }
+    return cache_key, payload
 
-    full_response = _make_api_request(url, timeout=timeout, json=payload)
-    
-    elapsed = time.time() - start_time
-    print(f"🔍 {engine.capitalize()} search: {elapsed:.1f}s")
-
+def _extract_serp(full_response, error=None):
+    if error is not None:
+        # ⚠️ Say why there are no results, so the answer can say it too
+        return {"knowledge": {}, "organic": [], "error": str(error)}
     if not full_response:
         return {"knowledge": {}, "organic": [], "timeout": True}
-    
+
     # 🚀 Extract only essential data to reduce processing time
-    extracted_data = {
+    return {
         "knowledge": full_response.get("knowledge", {}),
         "organic": full_response.get("organic", [])[:8],  # Limit to top 8 results
     }
 
+@traced("serp_search")
+def serp_search(query, engine="google", timeout=None):
+    """Optimized SERP search within the research deadline (15s when called on its own)"""
+    start_time = time.time()
+    cache_key, payload = _serp_request(query, engine)
+
+    cached = _cached("serp", cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        full_response, error = _make_api_request("request", timeout=stage_deadline(15).cap(timeout), json=payload), None
+    except ApiRequestError as e:
+        full_response, error = None, e
+
+    elapsed = time.time() - start_time
+    log(f"🔍 {engine.capitalize()} search: {elapsed:.1f}s")
+
+    extracted_data = _extract_serp(full_response, error)
+    if full_response:
+        _store("serp", cache_key, extracted_data)
+    return extracted_data
+
+@traced("serp_search")
+async def aserp_search(query, engine="google", timeout=None):
+    """Async SERP search within the research deadline"""
+    start_time = time.time()
+    cache_key, payload = _serp_request(query, engine)
+
+    cached = await _acached("serp", cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        full_response, error = await _amake_api_request("request", timeout=stage_deadline(15).cap(timeout), json=payload), None
+    except ApiRequestError as e:
+        full_response, error = None, e
+
+    elapsed = time.time() - start_time
+    log(f"🔍 {engine.capitalize()} search: {elapsed:.1f}s")
+
+    extracted_data = _extract_serp(full_response, error)
+    if full_response:
+        await _astore("serp", cache_key, extracted_data)
     return extracted_data
 
-def _trigger_and_download_snapshot_fast(trigger_url, params, data, operation_name="operation", timeout=25):
-    """Fast snapshot handling with timeout"""
+@traced("snapshot_job")
+def _trigger_and_download_snapshot_fast(params, data, operation_name="operation", timeout=25, deadline=None, reducer=None):
+    """Fast snapshot handling: trigger, poll and download all share one deadline.
+
+    By default the process-wide snapshot manager does the work, so identical
+    in-flight triggers share one snapshot and one scheduler polls them all.
+    The download is parsed as it streams in, keeping only what ``reducer`` selects.
+    """
     start_time = time.time()
-    
-    # 🚀 Trigger with timeout
-    trigger_result = _make_api_request(trigger_url, timeout=timeout, params=params, json=data)
-    if not trigger_result:
-        print(f"❌ {operation_name} trigger failed")
-        return None 
-    
+    deadline = deadline or stage_deadline(timeout)
+
+    if snapshot_manager_enabled():
+        raw_data = get_snapshot_manager().fetch(params, data, deadline, operation_name, reducer)
+        if raw_data is not None:
+            log(f"⚡ {operation_name} completed: {time.time() - start_time:.1f}s")
+        return raw_data
+
+    # 🚀 Trigger with whatever budget is left
+    try:
+        trigger_result = _make_api_request("trigger", timeout=deadline.remaining(), params=params, json=data)
+    except ApiRequestError as e:
+        log(f"❌ {operation_name} trigger failed: {e}", level="error")
+        return None
+
     snapshot_id = trigger_result.get("snapshot_id")
     if not snapshot_id:
-        print(f"❌ No snapshot ID for {operation_name}")
+        log(f"❌ No snapshot ID for {operation_name}", level="error")
+        return None
+
+    # 🚀 Fast polling with adaptive backoff, bounded by the same deadline
+    wait_result = poll_snapshot_status_fast(snapshot_id, deadline=deadline)
+    if not wait_result:
+        log(f"⏰ {operation_name} snapshot {wait_result.state.value} after {wait_result.elapsed:.1f}s", level="warning")
         return None
-    
-    # 🚀 Fast polling with shorter intervals
-    if not poll_snapshot_status_fast(snapshot_id, max_wait=timeout):
-        print(f"⏰ {operation_name} snapshot timed out")
+
+    if deadline.expired():
+        log(f"⏰ {operation_name} out of budget before download", level="warning")
         return None
 
-    raw_data = download_snapshot(snapshot_id)
-    
+    raw_data = download_snapshot(snapshot_id, timeout=deadline.remaining(), reducer=reducer)
+
     elapsed = time.time() - start_time
-    print(f"⚡ {operation_name} completed: {elapsed:.1f}s")
-    
+    log(f"⚡ {operation_name} completed: {elapsed:.1f}s")
+
     return raw_data
 
-def poll_snapshot_status_fast(snapshot_id, max_wait=25, check_interval=2):
-    """Fast polling with aggressive timeouts"""
+@traced("snapshot_job")
+async def _atrigger_and_download_snapshot_fast(params, data, operation_name="operation", timeout=25, deadline=None, reducer=None):
+    """Async snapshot handling: waits on the snapshot manager's future, or runs its
+    own loop sleeping on the event loop when the manager is disabled"""
     start_time = time.time()
-    
-    while time.time() - start_time < max_wait:
-        status = poll_snapshot_status(snapshot_id)
-        if status:  # Snapshot ready
-            return True
-        time.sleep(check_interval)  # Check every 2 seconds instead of 5
-    
-    print(f"⏰ Snapshot {snapshot_id} timed out after {max_wait}s")
-    return False
+    deadline = deadline or stage_deadline(timeout)
 
-# 🚀 OPTIMIZED: Faster Reddit search with quality focus
-def reddit_search_api(keyword, date="All time", sort_by="Top", num_of_posts=12):
-    """Optimized Reddit search - fewer posts, higher quality"""
-    trigger_url = "https://api.brightdata.com/datasets/v3/trigger"
+    if snapshot_manager_enabled():
+        raw_data = await get_snapshot_manager().afetch(params, data, deadline, operation_name, reducer)
+        if raw_data is not None:
+            log(f"⚡ {operation_name} completed: {time.time() - start_time:.1f}s")
+        return raw_data
+
+    try:
+        trigger_result = await _amake_api_request("trigger", timeout=deadline.remaining(), params=params, json=data)
+    except ApiRequestError as e:
+        log(f"❌ {operation_name} trigger failed: {e}", level="error")
+        return None
+
+    snapshot_id = trigger_result.get("snapshot_id")
+    if not snapshot_id:
+        log(f"❌ No snapshot ID for {operation_name}", level="error")
+        return None
+
+    wait_result = await apoll_snapshot_status_fast(snapshot_id, deadline=deadline)
+    if not wait_result:
+        log(f"⏰ {operation_name} snapshot {wait_result.state.value} after {wait_result.elapsed:.1f}s", level="warning")
+        return None
+
+    if deadline.expired():
+        log(f"⏰ {operation_name} out of budget before download", level="warning")
+        return None
+
+    raw_data = await adownload_snapshot(snapshot_id, timeout=deadline.remaining(), reducer=reducer)
+
+    elapsed = time.time() - start_time
+    log(f"⚡ {operation_name} completed: {elapsed:.1f}s")
+
+    return raw_data
+
+def poll_snapshot_status_fast(snapshot_id, max_wait=25, check_interval=2, deadline=None):
+    """Fast polling: one progress request per tick, never past max_wait (or the caller's deadline)"""
+    deadline = deadline or stage_deadline(max_wait)
+    return wait_for_snapshot(snapshot_id, deadline, max_interval=check_interval)
+
+async def apoll_snapshot_status_fast(snapshot_id, max_wait=25, check_interval=2, deadline=None):
+    deadline = deadline or stage_deadline(max_wait)
+    return await await_for_snapshot(snapshot_id, deadline, max_interval=check_interval)
+
+def _reddit_search_request(keyword, date, sort_by, num_of_posts):
+    """Cache key, trigger params and inputs for a Reddit keyword search"""
+    cache_key = make_key(normalize_query(keyword), date=date, sort_by=sort_by, num_of_posts=num_of_posts)
 
     params = {
         "dataset_id": "gd_lvz8ah06191smkebj4",
@@ -127,45 +278,77 @@ def reddit_search_api(keyword, date="All time", sort_by="Top", num_of_posts=12):
             "num_of_posts": num_of_posts,  # Reduced from 25 to 12
         }
     ]
+    return cache_key, params, data
 
-    raw_data = _trigger_and_download_snapshot_fast(
-        trigger_url, params, data, 
-        operation_name="Reddit search", 
-        timeout=20  # 20s timeout for Reddit search
-    )
+# Posts kept per search, and comments kept per post, while a snapshot downloads
+MAX_POSTS = 50
+MAX_COMMENTS = 50
 
+# 🚀 Posts become compact records (title, url, score, comments, subreddit) and the
+# most engaging are kept as they stream in
+POST_REDUCER = RecordReducer(RedditPost.from_dict, score=lambda post: post.engagement, top_n=MAX_POSTS)
+
+def _parse_reddit_posts(raw_data):
     if not raw_data:
         return {"parsed_data": [], "total_posts": 0}
-    
-    parsed_data = []
-    for post in raw_data:
-        if isinstance(post, dict):
-            parsed_post = {
-                "title": post.get("title"),
-                "url": post.get("url"),
-                "score": post.get("score", 0),  # Add score for quality ranking
-                "num_comments": post.get("num_comments", 0),  # Add comment count
-                "subreddit": post.get("subreddit", ""),  # Add subreddit info
-            }
-            parsed_data.append(parsed_post)
-
-    # 🚀 Sort by engagement (score + comments) for quality
-    parsed_data.sort(key=lambda x: (x.get("score", 0) + x.get("num_comments", 0)), reverse=True)
-    
+
+    posts = (post if isinstance(post, RedditPost) else RedditPost.from_dict(post)
+             for post in raw_data if isinstance(post, (RedditPost, dict)))
+
+    # 🚀 Top posts by engagement (score + comments) for quality
+    parsed_data = top_k(posts, MAX_POSTS, key=lambda post: post.engagement)
+
     return {"parsed_data": parsed_data, "total_posts": len(parsed_data)}
 
-# 🚀 OPTIMIZED: Fast Reddit post retrieval with limits
-def reddit_post_retrieval(urls, days_ago=0, load_all_replies=False, comment_limit=20):
-    """Fast Reddit post retrieval with strict limits"""
-    if not urls:
-        return {"parsed_comments": [], "total_comments": 0}
-    
-    # 🚀 Limit to top 3 URLs for speed
-    limited_urls = urls[:3]
-    print(f"📱 Retrieving {len(limited_urls)} Reddit posts...")
-    
-    trigger_url = "https://api.brightdata.com/datasets/v3/trigger"
+def _posts_from_cache(cached):
+    return {**cached, "parsed_data": [RedditPost.from_dict(post) for post in cached.get("parsed_data") or []]}
+
+def _posts_for_cache(result):
+    return {**result, "parsed_data": [post.to_dict() for post in result["parsed_data"]]}
+
+# 🚀 OPTIMIZED: Faster Reddit search with quality focus
+@traced("reddit_search")
+def reddit_search_api(keyword, date="All time", sort_by="Top", num_of_posts=12):
+    """Optimized Reddit search - fewer posts, higher quality"""
+    cache_key, params, data = _reddit_search_request(keyword, date, sort_by, num_of_posts)
+    cached = _cached("reddit_search", cache_key)
+    if cached is not None:
+        return _posts_from_cache(cached)
+
+    raw_data = _trigger_and_download_snapshot_fast(
+        params, data,
+        operation_name="Reddit search",
+        timeout=20,  # 20s timeout for Reddit search
+        reducer=POST_REDUCER,
+    )
+
+    result = _parse_reddit_posts(raw_data)
+    if result["parsed_data"]:
+        _store("reddit_search", cache_key, _posts_for_cache(result))
+    return result
+
+@traced("reddit_search")
+async def areddit_search_api(keyword, date="All time", sort_by="Top", num_of_posts=12):
+    """Async Reddit search"""
+    cache_key, params, data = _reddit_search_request(keyword, date, sort_by, num_of_posts)
+    cached = await _acached("reddit_search", cache_key)
+    if cached is not None:
+        return _posts_from_cache(cached)
+
+    raw_data = await _atrigger_and_download_snapshot_fast(
+        params, data,
+        operation_name="Reddit search",
+        timeout=20,
+        reducer=POST_REDUCER,
+    )
+
+    result = _parse_reddit_posts(raw_data)
+    if result["parsed_data"]:
+        await _astore("reddit_search", cache_key, _posts_for_cache(result))
+    return result
 
+def _reddit_post_request(urls, days_ago, load_all_replies, comment_limit):
+    """Trigger params and inputs for retrieving comments of the given posts"""
     params = {
         "dataset_id": "gd_lvzdpsdlw09j6t702",
         "include_errors": "true",
@@ -181,91 +364,311 @@ def reddit_post_retrieval(urls, days_ago=0, load_all_replies=False, comment_limi
             "load_all_replies": load_all_replies,
             "comment_limit": comment_limit  # Limit comments per post
         }
-        for url in limited_urls
+        for url in urls
     ]
-
-    raw_data = _trigger_and_download_snapshot_fast(
-        trigger_url, params, data, 
-        operation_name="Reddit posts", 
-        timeout=15  # 15s timeout for post retrieval
+    return params, data
+
+_post_batcher = None
+_post_batcher_lock = threading.Lock()
+
+def _get_post_batcher():
+    """Process-wide batcher merging post retrievals of concurrent sessions"""
+    global _post_batcher
+    if _post_batcher is None:
+        with _post_batcher_lock:
+            if _post_batcher is None:
+                _post_batcher = PostBatcher(_reddit_post_request, reducer=COMMENT_REDUCER)
+    return _post_batcher
+
+def _parse_comment(comment):
+    # 🚀 Extract only essential comment data
+    return RedditComment(
+        comment.get("comment_id"),
+        comment.get("comment"),
+        comment.get("date_posted"),
+        comment.get("score") or 0,  # Add score for quality
     )
 
-    if not raw_data:
+def _compact_comment(comment):
+    """A downloaded comment with only the fields parsing, caching and batching read"""
+    return {
+        "comment_id": comment.get("comment_id"),
+        "comment": comment.get("comment"),
+        "date_posted": comment.get("date_posted"),
+        "score": comment.get("score", 0),
+        "post_url": post_url_of(comment),
+    }
+
+# 🚀 Comments are compacted and only the top ones of each post kept as they stream in
+COMMENT_REDUCER = RecordReducer(
+    _compact_comment, score=lambda comment: comment["score"] or 0, top_n=MAX_COMMENTS, group=lambda comment: comment["post_url"]
+)
+
+def _parse_reddit_comments(raw_data, cached_comments=()):
+    """Parse downloaded comments and merge them with comments already in the cache"""
+    parsed_comments = list(cached_comments)
+    for comment in raw_data or []:
+        if isinstance(comment, dict):
+            parsed_comments.append(_parse_comment(comment))
+
+    if not parsed_comments:
         return {"parsed_comments": [], "total_comments": 0}
-    
-    parsed_comments = []
 
+    # 🚀 Top comments by score, without sorting all of them
+    top_comments = top_k(parsed_comments, MAX_COMMENTS, key=lambda comment: comment.score)
+
+    return {"parsed_comments": top_comments, "total_comments": len(top_comments)}
+
+def _comment_ttl(days_ago):
+    """Seconds a post's cached comments stay fresh.
+
+    Without a window (days_ago=0) that is the namespace TTL; a days_ago window is
+    about recent activity, so entries expire after a slice of it (5% by default:
+    a 1-day window keeps comments for 72 minutes).
+    """
+    cache = get_cache()
+    ttl = cache.ttl_for("reddit_comments") if cache is not None else 0
+    if days_ago and days_ago > 0:
+        fraction = float(os.getenv("REDDIT_COMMENTS_FRESHNESS_FRACTION", 0.05))
+        ttl = min(ttl, days_ago * 86400 * fraction)
+    return ttl
+
+def _comment_cache_key(url, days_ago, load_all_replies, comment_limit):
+    return make_key(normalize_post_url(url), days_ago=days_ago, load_all_replies=load_all_replies, comment_limit=comment_limit)
+
+def _cached_post_comments(urls, days_ago, load_all_replies, comment_limit):
+    """Split posts into (parsed comments already cached, URLs that still need a snapshot)"""
+    cache = get_cache()
+    if cache is None:
+        return [], list(urls)
+
+    cached_comments, missing_urls = [], []
+    for url in urls:
+        comments = cache.get("reddit_comments", _comment_cache_key(url, days_ago, load_all_replies, comment_limit))
+        metrics.inc("result_cache_lookups_total", namespace="reddit_comments", outcome="hit" if comments is not None else "miss")
+        if comments is None:
+            missing_urls.append(url)
+        else:
+            cached_comments.extend(RedditComment.from_dict(comment) for comment in comments)
+    if len(missing_urls) < len(urls):
+        log(f"💾 reddit_comments cache: {len(urls) - len(missing_urls)}/{len(urls)} posts cached")
+    return cached_comments, missing_urls
+
+def _store_post_comments(urls, raw_data, days_ago, load_all_replies, comment_limit):
+    """Cache freshly downloaded comments under each post's own URL"""
+    if get_cache() is None or not raw_data:
+        return
+
+    by_post = {}
     for comment in raw_data:
         if isinstance(comment, dict):
-            # 🚀 Extract only essential comment data
-            parsed_comment = {
-                "comment_id": comment.get("comment_id"),
-                "content": comment.get("comment"),
-                "date": comment.get("date_posted"),
-                "score": comment.get("score", 0),  # Add score for quality
-            }
-            parsed_comments.append(parsed_comment)
-    
-    # 🚀 Sort comments by score and limit to top comments
-    parsed_comments.sort(key=lambda x: x.get("score", 0), reverse=True)
-    top_comments = parsed_comments[:50]  # Limit to top 50 comments
-    
-    return {"parsed_comments": top_comments, "total_comments": len(top_comments)}
+            by_post.setdefault(post_url_of(comment), []).append(_parse_comment(comment).to_dict())
+    if not any(by_post) and len(urls) == 1:
+        # Comments without a post URL can still be attributed when only one post was asked for
+        by_post = {normalize_post_url(urls[0]): by_post.get("", [])}
+
+    ttl = _comment_ttl(days_ago)
+    for url in urls:
+        comments = by_post.get(normalize_post_url(url))
+        if comments:
+            _store("reddit_comments", _comment_cache_key(url, days_ago, load_all_replies, comment_limit), comments, ttl=ttl)
+
+def _submit_post_retrieval(urls, days_ago, load_all_replies, comment_limit, deadline):
+    """Start a post retrieval without waiting for it: future of the raw comments"""
+    if post_batching_enabled():
+        return _get_post_batcher().submit(urls, days_ago, load_all_replies, comment_limit, deadline)
+    params, data = _reddit_post_request(urls, days_ago, load_all_replies, comment_limit)
+    return get_snapshot_manager().submit(params, data, deadline, operation_name="Reddit posts (speculative)", reducer=COMMENT_REDUCER)
+
+_post_speculator = None
+_post_speculator_lock = threading.Lock()
+
+def _get_post_speculator():
+    """Process-wide speculator, so its in-flight cap and hit statistics span every session"""
+    global _post_speculator
+    if _post_speculator is None:
+        with _post_speculator_lock:
+            if _post_speculator is None:
+                _post_speculator = PostSpeculator(_submit_post_retrieval)
+    return _post_speculator
+
+def speculate_post_retrieval(reddit_results, days_ago=0, load_all_replies=False, comment_limit=20):
+    """Start retrieving the top posts by engagement before URL selection is done (see post_speculation)"""
+    if not snapshot_manager_enabled():
+        return None
+    speculator = _get_post_speculator()
+    posts = (reddit_results or {}).get("parsed_data") or []
+    top_urls = [post.url for post in posts[:speculator.k] if post.url]
+    _, missing_urls = _cached_post_comments(top_urls, days_ago, load_all_replies, comment_limit)
+    if not missing_urls:
+        return None
+    missing = {normalize_post_url(url) for url in missing_urls}
+    candidates = [post for post in posts if normalize_post_url(post.url) in missing]
+    # 🔮 Its trigger/polls/download queue behind confirmed work at the rate limits (a
+    # batched retrieval runs at the default priority: it also carries confirmed posts)
+    with request_priority("speculative"):
+        return speculator.start(candidates, days_ago, load_all_replies, comment_limit, deadline=stage_deadline(20))
+
+def _fetch_post_comments(urls, days_ago, load_all_replies, comment_limit, deadline):
+    if post_batching_enabled():
+        # 📦 Share one trigger with other sessions asking for posts right now
+        return _get_post_batcher().fetch(urls, days_ago, load_all_replies, comment_limit, deadline=deadline)
+
+    params, data = _reddit_post_request(urls, days_ago, load_all_replies, comment_limit)
+    return _trigger_and_download_snapshot_fast(params, data, operation_name="Reddit posts", deadline=deadline, reducer=COMMENT_REDUCER)
+
+async def _afetch_post_comments(urls, days_ago, load_all_replies, comment_limit, deadline):
+    if post_batching_enabled():
+        return await _get_post_batcher().afetch(urls, days_ago, load_all_replies, comment_limit, deadline=deadline)
+
+    params, data = _reddit_post_request(urls, days_ago, load_all_replies, comment_limit)
+    return await _atrigger_and_download_snapshot_fast(params, data, operation_name="Reddit posts", deadline=deadline, reducer=COMMENT_REDUCER)
+
+# 🚀 OPTIMIZED: Fast Reddit post retrieval with limits
+@traced("reddit_post_retrieval")
+def reddit_post_retrieval(urls, days_ago=0, load_all_replies=False, comment_limit=20, speculation=None):
+    """Fast Reddit post retrieval with strict limits; only posts missing from the comment cache
+    (and not already speculatively retrieved) are fetched"""
+    # 🚀 Limit to top 3 URLs for speed
+    limited_urls = (urls or [])[:3]
+    if speculation is not None:
+        speculation.settle(limited_urls)
+    if not limited_urls:
+        return {"parsed_comments": [], "total_comments": 0}
+
+    cached_comments, missing_urls = _cached_post_comments(limited_urls, days_ago, load_all_replies, comment_limit)
+    if not missing_urls:
+        return _parse_reddit_comments(None, cached_comments)
+
+    deadline = stage_deadline(15)  # what is left of the research (15s on its own)
+    speculated_urls, missing_urls = speculation.split(missing_urls) if speculation is not None else ([], missing_urls)
+    raw_data = []
+    if missing_urls:
+        log(f"📱 Retrieving {len(missing_urls)} Reddit posts...")
+        raw_data = _fetch_post_comments(missing_urls, days_ago, load_all_replies, comment_limit, deadline) or []
+    if speculated_urls:
+        speculated = speculation.result(speculated_urls, deadline)
+        if speculated is None and not deadline.expired():
+            log(f"📱 Speculation failed, retrieving {len(speculated_urls)} Reddit posts...", level="warning")
+            speculated = _fetch_post_comments(speculated_urls, days_ago, load_all_replies, comment_limit, deadline)
+        raw_data += speculated or []
+
+    _store_post_comments(missing_urls + speculated_urls, raw_data, days_ago, load_all_replies, comment_limit)
+    return _parse_reddit_comments(raw_data, cached_comments)
+
+@traced("reddit_post_retrieval")
+async def areddit_post_retrieval(urls, days_ago=0, load_all_replies=False, comment_limit=20, speculation=None):
+    """Async Reddit post retrieval"""
+    limited_urls = (urls or [])[:3]
+    if speculation is not None:
+        speculation.settle(limited_urls)
+    if not limited_urls:
+        return {"parsed_comments": [], "total_comments": 0}
+
+    cached_comments, missing_urls = await asyncio.to_thread(
+        _cached_post_comments, limited_urls, days_ago, load_all_replies, comment_limit
+    )
+    if not missing_urls:
+        return _parse_reddit_comments(None, cached_comments)
+
+    deadline = stage_deadline(15)
+    speculated_urls, missing_urls = speculation.split(missing_urls) if speculation is not None else ([], missing_urls)
+    raw_data = []
+    if missing_urls:
+        log(f"📱 Retrieving {len(missing_urls)} Reddit posts...")
+        raw_data = await _afetch_post_comments(missing_urls, days_ago, load_all_replies, comment_limit, deadline) or []
+    if speculated_urls:
+        speculated = await speculation.aresult(speculated_urls, deadline)
+        if speculated is None and not deadline.expired():
+            log(f"📱 Speculation failed, retrieving {len(speculated_urls)} Reddit posts...", level="warning")
+            speculated = await _afetch_post_comments(speculated_urls, days_ago, load_all_replies, comment_limit, deadline)
+        raw_data += speculated or []
+
+    await asyncio.to_thread(
+        _store_post_comments, missing_urls + speculated_urls, raw_data, days_ago, load_all_replies, comment_limit
+    )
+    return _parse_reddit_comments(raw_data, cached_comments)
 
 # 🚀 NEW: Parallel search function for maximum speed
-def parallel_search_all_sources(query, timeout_per_search=15):
+def parallel_search_all_sources(query, timeout_per_search=None):
     """Run all searches in parallel for maximum speed"""
-    
+
     def search_google():
         try:
             return ("google", serp_search(query, engine="google", timeout=timeout_per_search))
         except Exception as e:
-            print(f"❌ Google search failed: {e}")
+            log(f"❌ Google search failed: {e}", level="error")
             return ("google", {"knowledge": {}, "organic": [], "error": str(e)})
-    
+
     def search_bing():
         try:
             return ("bing", serp_search(query, engine="bing", timeout=timeout_per_search))
         except Exception as e:
-            print(f"❌ Bing search failed: {e}")
+            log(f"❌ Bing search failed: {e}", level="error")
             return ("bing", {"knowledge": {}, "organic": [], "error": str(e)})
-    
+
     def search_reddit():
         try:
             return ("reddit", reddit_search_api(query))
         except Exception as e:
-            print(f"❌ Reddit search failed: {e}")
+            log(f"❌ Reddit search failed: {e}", level="error")
             return ("reddit", {"parsed_data": [], "total_posts": 0, "error": str(e)})
-    
-    print("🚀 Starting parallel searches...")
+
+    log("🚀 Starting parallel searches...")
     start_time = time.time()
-    
-    # 🚀 Run all searches in parallel
-    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-        futures = [
-            executor.submit(search_google),
-            executor.submit(search_bing),
-            executor.submit(search_reddit)
-        ]
-        
-        results = {}
-        for future in concurrent.futures.as_completed(futures, timeout=25):  # 25s total timeout
+
+    # 🚀 Run all searches in parallel, each in a copy of this context so they share its deadline
+    deadline = stage_deadline(25)
+    # Not a with-block: leaving it would wait for searches still running past the deadline
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=3)
+    futures = [
+        executor.submit(contextvars.copy_context().run, search_google),
+        executor.submit(contextvars.copy_context().run, search_bing),
+        executor.submit(contextvars.copy_context().run, search_reddit)
+    ]
+
+    results = {}
+    try:
+        for future in concurrent.futures.as_completed(futures, timeout=deadline.remaining()):
             try:
                 source, data = future.result()
                 results[f"{source}_results"] = data
             except Exception as e:
-                print(f"❌ Search error: {e}")
-    
-    total_time = time.time() - start_time
-    print(f"⚡ All searches completed in {total_time:.1f}s")
-    
-    return results
-
-
-
+                log(f"❌ Search error: {e}", level="error")
+    except concurrent.futures.TimeoutError:
+        log(f"⏰ Searches still running at the deadline, returning {len(results)} of 3", level="warning")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
+    total_time = time.time() - start_time
+    log(f"⚡ All searches completed in {total_time:.1f}s")
 
+    return results
 
+# 🚀 NEW: Async parallel search - all three searches share one event loop
+async def aparallel_search_all_sources(query, timeout_per_search=None):
+    """Run all searches concurrently on the event loop"""
+    log("🚀 Starting parallel searches...")
+    start_time = time.time()
 
+    searches = {
+        "google": aserp_search(query, engine="google", timeout=timeout_per_search),
+        "bing": aserp_search(query, engine="bing", timeout=timeout_per_search),
+        "reddit": areddit_search_api(query),
+    }
+    outcomes = await asyncio.gather(*searches.values(), return_exceptions=True)
+
+    results = {}
+    for source, outcome in zip(searches, outcomes):
+        if isinstance(outcome, Exception):
+            log(f"❌ {source.capitalize()} search failed: {outcome}", level="error")
+            if source == "reddit":
+                outcome = {"parsed_data": [], "total_posts": 0, "error": str(outcome)}
+            else:
+                outcome = {"knowledge": {}, "organic": [], "error": str(outcome)}
+        results[f"{source}_results"] = outcome
 
+    total_time = time.time() - start_time
+    log(f"⚡ All searches completed in {total_time:.1f}s")
 
+    return results